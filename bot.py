@@ -13,14 +13,42 @@ client = discord.Client(intents=intents)
 tree = app_commands.CommandTree(client)
 
 
+_session: ClientSession | None = None
+
+
 async def setup_custom_dns():
     """
     カスタムDNSリゾルバを設定する非同期関数
     Google Public DNSを使用してDNS解決を行う
+    再接続でon_readyから再度呼ばれた場合は既存のセッションを使い回す
     """
-    gpd = ["8.8.8.8", "8.8.4.4"]
-    resolver = aiodns.DNSResolver(nameservers=gpd)
-    connector = TCPConnector(resolver=resolver)
-    session = ClientSession(connector=connector)
-    client.http.session = session
+    global _session
+    if _session is None or _session.closed:
+        gpd = ["8.8.8.8", "8.8.4.4"]
+        resolver = aiodns.DNSResolver(nameservers=gpd)
+        connector = TCPConnector(
+            resolver=resolver,
+            keepalive_timeout=60,
+            ttl_dns_cache=300,
+        )
+        _session = ClientSession(connector=connector)
+    client.http.session = _session
     print("カスタムDNS設定を適用しました。")
+
+
+async def get_http_session() -> ClientSession:
+    """
+    カスタムDNSを使うaiohttpセッションを取得する
+
+    Returns:
+        ClientSession: keep-alive付きの共有セッション
+    """
+    if _session is None or _session.closed:
+        await setup_custom_dns()
+    return _session
+
+
+async def close_http_session():
+    """共有セッションを閉じる"""
+    if _session is not None and not _session.closed:
+        await _session.close()
@@ -1,12 +1,13 @@
 """
 管理者向けコマンド
-/overload, /sync
+/overload, /sync, /zichiapprove
 """
 
 import discord
 from discord import app_commands, Client
 
-from core.zichi import enforce_zichi_block
+from config import ADMIN_USER_ID
+from core.zichi import enforce_zichi_block, set_zichi_valid, zichi_index
 from core.log import insert_command_log, handle_command_error
 
 
@@ -69,3 +70,32 @@ async def setup_admin_commands(tree: app_commands.CommandTree, client: Client):
             await handle_command_error(
                 ctx, "/sync", e, "コマンド同期中にエラーが発生しました。"
             )
+
+    @tree.command(
+        name="zichiapprove", description="自治申請を承認/取り消します（管理者専用）"
+    )
+    @discord.app_commands.allowed_installs(guilds=True, users=True)
+    async def zichiapprove(ctx: discord.Interaction, zichi_id: int, valid: bool = True):
+        try:
+            if int(getattr(ctx.user, "id", 0) or 0) != ADMIN_USER_ID:
+                await ctx.response.send_message("管理者専用です。", ephemeral=True)
+                insert_command_log(ctx, "/zichiapprove", "DENY")
+                return
+
+            ok = await set_zichi_valid(zichi_id, valid)
+            state = "承認" if valid else "取り消し"
+            if ok:
+                await ctx.response.send_message(
+                    f"自治申請 {zichi_id} を{state}しました。\n"
+                    f"-# index: {zichi_index.stats()}",
+                    ephemeral=True,
+                )
+            else:
+                await ctx.response.send_message(
+                    f"自治申請 {zichi_id} の{state}に失敗しました。", ephemeral=True
+                )
+            insert_command_log(
+                ctx, "/zichiapprove", f"{'OK' if ok else 'NG'}:{zichi_id}"
+            )
+        except Exception as e:
+            await handle_command_error(ctx, "/zichiapprove", e)
@@ -3,28 +3,27 @@
 /mylocate - チャンネル書き込み分布グラフ
 """
 
-import os
-import tempfile
+import asyncio
+import io
+from collections import OrderedDict
 
 import discord
-import matplotlib
 from discord import Client, app_commands
 from discord.app_commands import allowed_installs
-
-matplotlib.use("Agg")
-import matplotlib.font_manager as fm
-import matplotlib.pyplot as plt
-from database.connection import run_statdb_query
-from PIL import Image, ImageDraw, ImageFont
-from pilmoji import Pilmoji
 from spam.protection import is_overload_allowed
 
 from config import debug
+from core.db import run_statdb_query_async
 from core.log import insert_command_log
 from core.zichi import enforce_zichi_block
-from utils.cache import get_reference_data_label
+from render.graphs import create_channel_graph, create_reaction_graph
+from render.pool import render_pool
+from utils.cache import get_reference_data_label_async
 from utils.emoji import emoji_name_to_unicode
 
+# 1つのViewで描画済みのまま持っておくページの数
+GRAPH_PAGE_CACHE_SIZE = 8
+
 
 class GraphPaginationView(discord.ui.View):
     """グラフのページング機能を提供するViewクラス
@@ -55,6 +54,9 @@ class GraphPaginationView(discord.ui.View):
         self.user_id = user_id
         self.offset = 0
         self.show_others = False  # その他の表示フラグ（デフォルト: オフ）
+        # (offset, show_others) -> PNG画像、描画中のページは _rendering に入れる
+        self._pages: OrderedDict[tuple[int, bool], bytes] = OrderedDict()
+        self._rendering: dict[tuple[int, bool], asyncio.Task] = {}
         self.update_buttons()
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
@@ -84,16 +86,22 @@ class GraphPaginationView(discord.ui.View):
             else discord.ButtonStyle.secondary
         )
 
-    def get_current_data(self):
-        """現在のオフセットに基づいてデータを取得"""
-        visible_data = self.all_data[self.offset : self.offset + 10]
+    def get_current_data(
+        self, offset: int | None = None, show_others: bool | None = None
+    ):
+        """オフセットに基づいてデータを取得(省略時は現在の状態)"""
+        if offset is None:
+            offset = self.offset
+        if show_others is None:
+            show_others = self.show_others
+        visible_data = self.all_data[offset : offset + 10]
 
         # その他の表示がオフの場合は10件のみ
-        if not self.show_others:
+        if not show_others:
             return visible_data
 
         # その他の表示がオンの場合
-        other_data = self.all_data[self.offset + 10 :]
+        other_data = self.all_data[offset + 10 :]
 
         # その他の処理
         if other_data:
@@ -109,38 +117,108 @@ class GraphPaginationView(discord.ui.View):
 
         return result
 
-    def get_status_text(self):
-        """現在の状態テキストを取得: '1-10件/50件'"""
+    def get_status_text(self, offset: int | None = None):
+        """状態テキストを取得: '1-10件/50件'(省略時は現在のオフセット)"""
+        if offset is None:
+            offset = self.offset
         total = len(self.all_data)
-        start = self.offset + 1
-        end = min(self.offset + 10, total)
+        start = offset + 1
+        end = min(offset + 10, total)
         return f"{start}-{end}件/{total}件"
 
+    async def _render(self, offset: int, show_others: bool) -> bytes:
+        """指定したページのグラフ画像を描画プロセスプールで生成する"""
+        current_data = self.get_current_data(offset, show_others)
+        status_text = self.get_status_text(offset)
+        if self.graph_type == "channel":
+            return await render_pool.render(
+                create_channel_graph,
+                data=current_data,
+                username=self.username,
+                reference_label=self.reference_label,
+                status_text=status_text,
+            )
+        # 絵文字のUnicode変換はワーカーに辞書を持たせないようここで行う
+        labels = [
+            name if name == "その他" else emoji_name_to_unicode(name)
+            for name, _ in current_data
+        ]
+        return await render_pool.render(
+            create_reaction_graph,
+            data=current_data,
+            labels=labels,
+            username=self.username,
+            reference_label=self.reference_label,
+            status_text=status_text,
+        )
+
+    async def _render_page(self, key: tuple[int, bool]) -> bytes:
+        try:
+            image_bytes = await self._render(*key)
+            self._pages[key] = image_bytes
+            self._pages.move_to_end(key)
+            while len(self._pages) > GRAPH_PAGE_CACHE_SIZE:
+                self._pages.popitem(last=False)
+            return image_bytes
+        finally:
+            self._rendering.pop(key, None)
+
+    async def _page(self, key: tuple[int, bool]) -> bytes:
+        cached = self._pages.get(key)
+        if cached is not None:
+            self._pages.move_to_end(key)
+            return cached
+        # 先読み中のページはその描画を待つ
+        task = self._rendering.get(key)
+        if task is None:
+            task = self._rendering[key] = asyncio.create_task(self._render_page(key))
+            # 待ち手がキャンセルされても描画は続くので、その失敗も回収する
+            task.add_done_callback(_report_prefetch_error)
+        return await asyncio.shield(task)
+
+    def _prefetch(self):
+        """
+        前後のページを裏で描画しておく
+        描画プロセスプールのワーカーが空いていて、受付数(RENDER_QUEUE_MAX)の半分以上が
+        空いている場合のみ(先読みで他のユーザーの描画を RenderBusyError にしない)
+        """
+        started = 0
+        for offset in (self.offset + 10, self.offset - 10):
+            if not 0 <= offset < len(self.all_data):
+                continue
+            key = (offset, self.show_others)
+            if key in self._pages or key in self._rendering:
+                continue
+            # 作ったタスクが描画待ちに数えられるのは動き出してからなので、ここで足しておく
+            pending = render_pool.pending + started
+            if pending >= render_pool.workers or pending >= render_pool.max_queue // 2:
+                return
+            task = self._rendering[key] = asyncio.create_task(self._render_page(key))
+            task.add_done_callback(_report_prefetch_error)
+            started += 1
+
+    async def render_current(self) -> bytes:
+        """
+        現在のページのグラフ画像を取得する
+        描画済みのページはそのまま返し、返した後に前後のページを先読みする
+        """
+        image_bytes = await self._page((self.offset, self.show_others))
+        self._prefetch()
+        return image_bytes
+
     async def update_graph(self, interaction: discord.Interaction):
         """グラフを再生成してメッセージを更新"""
         try:
             await interaction.response.defer()
 
-            # 現在のデータを取得
-            current_data = self.get_current_data()
+            # 現在の状態を取得
             status_text = self.get_status_text()
 
             # グラフ生成
+            image_bytes = await self.render_current()
             if self.graph_type == "channel":
-                image_path = create_channel_graph(
-                    current_data,
-                    self.username,
-                    self.reference_label,
-                    status_text,
-                )
                 message_text = f"{self.username}の書き込み先チャンネル分布\n{self.reference_label} | {status_text}"
             else:  # reaction
-                image_path = create_reaction_graph(
-                    current_data,
-                    self.username,
-                    self.reference_label,
-                    status_text,
-                )
                 message_text = f"{self.username}のもらったリアクション分布\n{self.reference_label} | {status_text}"
 
             # ボタンの状態を更新
@@ -148,7 +226,7 @@ class GraphPaginationView(discord.ui.View):
 
             # メッセージを更新
             file = discord.File(
-                image_path,
+                io.BytesIO(image_bytes),
                 filename=f"{self.graph_type}_distribution.png",
             )
             await interaction.edit_original_response(
@@ -157,12 +235,6 @@ class GraphPaginationView(discord.ui.View):
                 view=self,
             )
 
-            # 一時ファイルを削除
-            try:
-                os.unlink(image_path)
-            except Exception:
-                pass
-
         except Exception as e:
             if debug:
                 print(f"グラフ更新エラー: {e}")
@@ -229,494 +301,21 @@ class GraphPaginationView(discord.ui.View):
         await self.update_graph(interaction)
 
     async def on_timeout(self):
-        """タイムアウト時にボタンを無効化"""
+        """タイムアウト時にボタンを無効化し、先読みと描画済みのページを捨てる"""
         for child in self.children:
             child.disabled = True
+        for task in self._rendering.values():
+            task.cancel()
+        self._pages.clear()
 
 
-def create_channel_graph(
-    data: list,
-    username: str,
-    reference_label: str,
-    status_text: str = "",
-) -> str:
-    """チャンネル統計データから縦棒グラフを生成し、背景画像と合成して画像ファイルを作成する。
-
-    引数:
-      data: [(channel_name, count), ...] のリスト（上位10個 + その他）
-      username: ユーザー名
-      reference_label: 参照データのラベル
-
-    返り値:
-      生成された画像ファイルのパス
-    """
-    try:
-        # フォントパスの設定
-        font_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fonts")
-        normal_font_path = os.path.join(font_dir, "UDShingo2.otf")
-        title_font_path = os.path.join(font_dir, "UDShingoL.otf")
-
-        # 入れ物準備
-        channel_labels = [name for name, count in data]
-        counts = [count for name, count in data]
-
-        # matplotlibでグラフを作成
-        fig, ax = plt.subplots(figsize=(13, 5.5), facecolor="#2C2F33")
-        ax.set_facecolor("#2C2F33")  # 背景
-
-        # 縦棒グラフを描画
-        x_positions = range(len(channel_labels))
-        _bars = ax.bar(x_positions, counts, color="#5865F2", width=0.6)
-
-        # X軸のラベル設定（空白にして後でPillowで描画）
-        ax.set_xticks(x_positions)
-        ax.set_xticklabels([""] * len(channel_labels))
-
-        # フォント設定（Y軸ラベルのみ）
-        try:
-            prop_normal = fm.FontProperties(fname=normal_font_path, size=12)
-            ax.set_ylabel("投稿数", fontproperties=prop_normal, color="white")
-            ax.tick_params(axis="y", colors="white")  # Y軸の目盛りを白に
-        except Exception as e:
-            if debug:
-                print(f"フォント設定エラー: {e}")
-            ax.set_ylabel("投稿数", color="white")
-            ax.tick_params(axis="y", colors="white")
-
-        # グリッド追加
-        ax.grid(axis="y", alpha=0.2, color="white")
-
-        # 枠線を削除
-        ax.spines["top"].set_visible(False)
-        ax.spines["right"].set_visible(False)
-        ax.spines["bottom"].set_visible(False)
-        ax.spines["left"].set_color("white")
-
-        # X軸の下側にスペースを確保（チャンネル名用、余白を増やす）
-        plt.subplots_adjust(bottom=0.25)
-
-        # レイアウト調整
-        plt.tight_layout()
-
-        # 一時ファイルにグラフを保存
-        graph_temp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-        graph_temp_path = graph_temp.name
-        graph_temp.close()
-        plt.savefig(
-            graph_temp_path,
-            dpi=100,
-            bbox_inches="tight",
-            facecolor="#2C2F33",
-            edgecolor="none",
-            transparent=False,
-        )
-        plt.close(fig)
-
-        # 背景画像と合成
-        bg_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "bg/bg_green.png",
-        )
-        if os.path.exists(bg_path):
-            # 背景画像を読み込み
-            bg = Image.open(bg_path).convert("RGBA")
-            graph_img = Image.open(graph_temp_path).convert("RGBA")
-
-            # グラフサイズと背景サイズを取得
-            graph_width, graph_height = graph_img.size
-            bg_width, bg_height = bg.size  # 1280x720
-
-            # グラフが背景より大きい場合はリサイズ
-            # 左右の余白を最小限にして横幅を最大化: 左右各40pxの余白で1200px
-            max_graph_width = bg_width - 80  # 1280 - 80 = 1200px (左右各40px余白)
-            max_graph_height = int(
-                bg_height * 0.70,
-            )  # 背景の70%まで（下部に文字用余白確保）
-
-            if graph_width > max_graph_width or graph_height > max_graph_height:
-                # アスペクト比を維持してリサイズ
-                ratio = min(
-                    max_graph_width / graph_width,
-                    max_graph_height / graph_height,
-                )
-                new_width = int(graph_width * ratio)
-                new_height = int(graph_height * ratio)
-                graph_img = graph_img.resize(
-                    (new_width, new_height),
-                    Image.Resampling.LANCZOS,
-                )
-                graph_width, graph_height = new_width, new_height
-
-            # グラフの配置位置を計算（中央やや上部）
-            x_offset = (bg_width - graph_width) // 2
-            y_offset = 101  # 上部に配置
-
-            # 新しい画像を作成
-            final_img = bg.copy()
-            final_img.paste(graph_img, (x_offset, y_offset), graph_img)
-
-            # テキスト追加（ユーザー名と参照ラベル）
-            _draw = ImageDraw.Draw(final_img)
-
-            try:
-                # フォント読み込み
-                title_font = ImageFont.truetype(title_font_path, 36)
-                label_font = ImageFont.truetype(normal_font_path, 18)
-                channel_label_font = ImageFont.truetype(normal_font_path, 14)
-            except Exception:
-                # フォールバック
-                title_font = ImageFont.load_default()
-                label_font = ImageFont.load_default()
-                channel_label_font = ImageFont.load_default()
-
-            # Pilmojiを使用してテキストを描画
-            with Pilmoji(final_img) as pilmoji:
-                # タイトルを左揃えで描画
-                title_text = f"{username} の書き込み先チャンネル"
-                title_x = 50  # 左端から50px
-                title_y = 40
-                pilmoji.text(
-                    (title_x, title_y),
-                    title_text,
-                    font=title_font,
-                    fill="white",
-                )
-
-                # 参照ラベルを左下に描画
-                clean_label = reference_label.replace("-# ", "").replace("-#", "")
-                label_x = 50  # 左端から50px
-                label_y = bg_height - 60  # 下から60px
-                pilmoji.text(
-                    (label_x, label_y),
-                    clean_label,
-                    font=label_font,
-                    fill="white",
-                )
-
-                # 状態テキストを表示（参照ラベルの一行上）
-                if status_text:
-                    status_x = 50
-                    status_y = label_y - 30  # 参照ラベルの30px上
-                    pilmoji.text(
-                        (status_x, status_y),
-                        status_text,
-                        font=label_font,
-                        fill="#AAAAAA",
-                    )
-
-                # X軸のラベルを描画（チャンネル名）
-                # グラフの目盛り・余白を除外してバー表示領域のみで計算
-                graph_left_margin = 80  # グラフ左側の目盛り余白（固定）
-                graph_right_margin = 20  # グラフ右側の余白（固定）
-                usable_width = (
-                    graph_width - graph_left_margin - graph_right_margin
-                )  # 実際のバー表示領域
-                bar_width = usable_width / len(channel_labels)  # 各バーの幅
-
-                # グラフの下部にラベルを配置（余白を増やす）
-                label_y_pos = (
-                    y_offset + graph_height + 15
-                )  # グラフの下15px（10px→15px）
-
-                for i, label in enumerate(channel_labels):
-                    # 各ラベルの位置を計算（左から右へ、目盛り余白を考慮）
-                    label_x_pos = (
-                        x_offset
-                        + graph_left_margin
-                        + int(i * bar_width + bar_width / 2)
-                    )
-
-                    # チャンネル名を描画（「その他」以外で長い場合は省略）
-                    display_label = label
-                    if label != "その他" and len(label) > 10:
-                        display_label = label[:8] + "..."
-
-                    # 中央揃えのためのオフセット計算
-                    bbox = pilmoji.getsize(display_label, font=channel_label_font)
-                    text_width = bbox[0] if bbox else len(display_label) * 7
-                    label_x_pos -= text_width // 2
-
-                    pilmoji.text(
-                        (label_x_pos, label_y_pos),
-                        display_label,
-                        font=channel_label_font,
-                        fill="white",
-                    )
-
-            # 最終画像を保存
-            final_temp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-            final_temp_path = final_temp.name
-            final_temp.close()
-            final_img.save(final_temp_path, "PNG")
-
-            # グラフの一時ファイルを削除
-            try:
-                os.unlink(graph_temp_path)
-            except Exception:
-                pass
-
-            return final_temp_path
-        # 背景画像がない場合はグラフのみ
-        if debug:
-            print("背景画像が見つかりません。グラフのみを使用します。")
-        return graph_temp_path
-
-    except Exception as e:
-        if debug:
-            print(f"グラフ生成エラー: {e}")
-        raise
-
-
-def create_reaction_graph(
-    data: list,
-    username: str,
-    reference_label: str,
-    status_text: str = "",
-) -> str:
-    """リアクションデータから縦棒グラフを生成し、背景画像と合成して画像ファイルを作成する。
-
-    引数:
-      data: [(emoji_name, count), ...] のリスト（上位10個 + その他）
-      username: ユーザー名
-      reference_label: 参照データのラベル
-      status_text: 状態テキスト（例: "1-10件/50件"）
-
-    返り値:
-      生成された画像ファイルのパス
-    """
-    try:
-        # フォントパスの設定
-        font_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fonts")
-        normal_font_path = os.path.join(font_dir, "UDShingoL.otf")
-
-        # データの準備
-        emoji_labels = []  # 絵文字表示用
-        counts = []
-        for emoji_name, count in data:
-            # "その他"は特別扱い
-            if emoji_name == "その他":
-                emoji_labels.append("その他")
-            else:
-                # 英名をUnicode絵文字に変換
-                emoji_unicode = emoji_name_to_unicode(emoji_name)
-                emoji_labels.append(emoji_unicode)
-            counts.append(count)
-
-        # matplotlibでグラフを作成（縦棒グラフ用の設定）
-        fig, ax = plt.subplots(figsize=(10, 5.5), facecolor="#2C2F33")
-        ax.set_facecolor("#2C2F33")  # グラフエリアの背景色
-
-        # 縦棒グラフを描画
-        x_positions = range(len(emoji_labels))
-        _bars = ax.bar(x_positions, counts, color="#5865F2", width=0.6)
-
-        # X軸のラベル設定（空白にして後でPillowで描画）
-        ax.set_xticks(x_positions)
-        ax.set_xticklabels([""] * len(emoji_labels))
-
-        # フォント設定（Y軸ラベルのみ）
-        try:
-            prop_normal = fm.FontProperties(fname=normal_font_path, size=12)
-            ax.set_ylabel("回数", fontproperties=prop_normal, color="white")
-            ax.tick_params(axis="y", colors="white")  # Y軸の目盛りを白に
-        except Exception as e:
-            if debug:
-                print(f"フォント設定エラー: {e}")
-            ax.set_ylabel("回数", color="white")
-            ax.tick_params(axis="y", colors="white")
-
-        # グリッド追加（暗めに）
-        ax.grid(axis="y", alpha=0.2, color="white")
-
-        # 枠線を削除
-        ax.spines["top"].set_visible(False)
-        ax.spines["right"].set_visible(False)
-        ax.spines["bottom"].set_visible(False)
-        ax.spines["left"].set_color("white")
-
-        # X軸の下側にスペースを確保（絵文字用）
-        plt.subplots_adjust(bottom=0.15)
-
-        # レイアウト調整
-        plt.tight_layout()
-
-        # 一時ファイルにグラフを保存（背景を透明に）
-        graph_temp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-        graph_temp_path = graph_temp.name
-        graph_temp.close()
-        plt.savefig(
-            graph_temp_path,
-            dpi=100,
-            bbox_inches="tight",
-            facecolor="#2C2F33",
-            edgecolor="none",
-            transparent=False,
-        )
-        plt.close(fig)
-
-        # 背景画像と合成
-        bg_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "bg/bg_blue.png",
-        )
-        if os.path.exists(bg_path):
-            # 背景画像を読み込み
-            bg = Image.open(bg_path).convert("RGBA")
-            graph_img = Image.open(graph_temp_path).convert("RGBA")
-
-            # グラフサイズと背景サイズを取得
-            graph_width, graph_height = graph_img.size
-            bg_width, bg_height = bg.size  # 1280x720
-
-            # グラフが背景より大きい場合はリサイズ
-            max_graph_width = int(bg_width * 0.75)  # 背景の75%まで
-            max_graph_height = int(
-                bg_height * 0.75,
-            )  # 背景の75%まで（70%→75%に拡大、さらに36px削る）
-
-            if graph_width > max_graph_width or graph_height > max_graph_height:
-                # アスペクト比を維持してリサイズ
-                ratio = min(
-                    max_graph_width / graph_width,
-                    max_graph_height / graph_height,
-                )
-                new_width = int(graph_width * ratio)
-                new_height = int(graph_height * ratio)
-                graph_img = graph_img.resize(
-                    (new_width, new_height),
-                    Image.Resampling.LANCZOS,
-                )
-                graph_width, graph_height = new_width, new_height
-
-            # グラフの配置位置を計算（中央やや上部）
-            x_offset = (bg_width - graph_width) // 2
-            y_offset = 101  # 上部に配置（161 - 60 = 101に調整）
-
-            # 新しい画像を作成
-            final_img = bg.copy()
-            final_img.paste(graph_img, (x_offset, y_offset), graph_img)
-
-            # テキスト追加（ユーザー名と参照ラベル）
-            _draw = ImageDraw.Draw(final_img)
-
-            try:
-                # フォント読み込み
-                title_font = ImageFont.truetype(normal_font_path, 36)
-                label_font = ImageFont.truetype(normal_font_path, 20)
-                emoji_label_font = ImageFont.truetype(normal_font_path, 28)
-            except Exception:
-                # フォールバック
-                title_font = ImageFont.load_default()
-                label_font = ImageFont.load_default()
-                emoji_label_font = ImageFont.load_default()
-
-            # Pilmojiを使用してテキストを描画
-            with Pilmoji(final_img) as pilmoji:
-                # タイトルを左揃えで描画（枠線なし）
-                title_text = f"{username} のもらったリアクション分布"
-                title_x = 50  # 左端から50px
-                title_y = 40
-                pilmoji.text(
-                    (title_x, title_y),
-                    title_text,
-                    font=title_font,
-                    fill="white",
-                )
-
-                # 参照ラベルを左下に描画（-#を削除、枠線なし）
-                # reference_labelから"-# "を削除
-                clean_label = reference_label.replace("-# ", "").replace("-#", "")
-                label_x = 50  # 左端から50px
-                label_y = bg_height - 60  # 下から60px
-                pilmoji.text(
-                    (label_x, label_y),
-                    clean_label,
-                    font=label_font,
-                    fill="white",
-                )
-
-                # 状態テキストを表示（参照ラベルの一行上）
-                if status_text:
-                    status_x = 50
-                    status_y = label_y - 30  # 参照ラベルの30px上
-                    status_font = ImageFont.truetype(normal_font_path, 18)
-                    pilmoji.text(
-                        (status_x, status_y),
-                        status_text,
-                        font=status_font,
-                        fill="#AAAAAA",
-                    )
-
-                # X軸のラベルを描画（絵文字または"その他"）縦棒グラフ用
-                # グラフの各列の位置を計算してラベルを配置
-                # グラフの左右のマージンを考慮
-                left_margin = graph_width * 0.08  # 左側8%を除外
-                right_margin = graph_width * 0.02  # 右側2%を除外
-                usable_width = graph_width - left_margin - right_margin  # 使用可能な幅
-                bar_width = usable_width / len(emoji_labels)  # 各バーの幅
-
-                # グラフの下部にラベルを配置
-                label_y_pos = y_offset + graph_height + 10  # グラフの下10px
-
-                for i, label in enumerate(emoji_labels):
-                    # 各ラベルの位置を計算（左から右へ）
-                    label_x_pos = x_offset + int(
-                        left_margin + i * bar_width + bar_width / 2 - 16,
-                    )
-
-                    # "その他"の場合は通常フォント、それ以外は絵文字として扱う
-                    if label == "その他":
-                        # 通常フォントで描画
-                        pilmoji.text(
-                            (label_x_pos, label_y_pos),
-                            label,
-                            font=label_font,
-                            fill="white",
-                        )
-                    else:
-                        # 絵文字を描画（Pilmojiが自動的にカラー絵文字として描画）
-                        try:
-                            pilmoji.text(
-                                (label_x_pos, label_y_pos),
-                                label,
-                                font=emoji_label_font,
-                                fill="white",
-                                emoji_scale_factor=1.2,
-                            )
-                        except Exception as e:
-                            if debug:
-                                print(f"Pilmoji絵文字描画エラー ({label}): {e}")
-                            # フォールバック: 英名を表示
-                            original_name = data[i][0]
-                            pilmoji.text(
-                                (label_x_pos, label_y_pos),
-                                original_name,
-                                font=label_font,
-                                fill="white",
-                            )
-
-            # 最終画像を保存
-            final_temp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-            final_temp_path = final_temp.name
-            final_temp.close()
-            final_img.save(final_temp_path, "PNG")
-
-            # グラフの一時ファイルを削除
-            try:
-                os.unlink(graph_temp_path)
-            except Exception:
-                pass
-
-            return final_temp_path
-        # 背景画像がない場合はグラフのみ
-        if debug:
-            print("背景画像が見つかりません。グラフのみを使用します。")
-        return graph_temp_path
-
-    except Exception as e:
-        if debug:
-            print(f"グラフ生成エラー: {e}")
-        raise
+def _report_prefetch_error(task: asyncio.Task):
+    """先読みや待ち手のいなくなった描画の失敗は表示に影響しないので記録だけする"""
+    if task.cancelled():
+        return
+    e = task.exception()
+    if e is not None and debug:
+        print(f"グラフ先読みエラー: {e}")
 
 
 async def setup_graph_commands(tree: app_commands.CommandTree, client: Client):
@@ -763,7 +362,7 @@ async def setup_graph_commands(tree: app_commands.CommandTree, client: Client):
             uid = int(getattr(user, "id", 0) or 0)
 
             # 参照データラベル取得
-            reference_label = get_reference_data_label()
+            reference_label = await get_reference_data_label_async()
 
             # SQLでリアクションデータを取得
             sql = """
@@ -777,7 +376,7 @@ async def setup_graph_commands(tree: app_commands.CommandTree, client: Client):
               ORDER BY total_count DESC
             """
 
-            rows = run_statdb_query(sql, (uid,), fetch="all")
+            rows = await run_statdb_query_async(sql, (uid,), fetch="all")
 
             if not rows or len(rows) == 0:
                 # データがない場合
@@ -813,32 +412,19 @@ async def setup_graph_commands(tree: app_commands.CommandTree, client: Client):
                 uid,
             )
 
-            # 初期データを取得
-            current_data = view.get_current_data()
-            status_text = view.get_status_text()
-
             # 初期グラフを生成
-            image_path = create_reaction_graph(
-                current_data,
-                username,
-                reference_label,
-                status_text,
-            )
+            image_bytes = await view.render_current()
 
             # Discordに送信（Viewを追加）
-            file = discord.File(image_path, filename="reaction_distribution.png")
+            file = discord.File(
+                io.BytesIO(image_bytes), filename="reaction_distribution.png"
+            )
             await ctx.followup.send(
                 f"{username}のもらったリアクション分布\n{reference_label}",
                 file=file,
                 view=view,
             )
 
-            # 一時ファイルを削除
-            try:
-                os.unlink(image_path)
-            except Exception:
-                pass
-
             insert_command_log(ctx, "/myreaction", "OK")
 
         except Exception as e:
@@ -897,7 +483,7 @@ async def setup_graph_commands(tree: app_commands.CommandTree, client: Client):
             uid = int(getattr(user, "id", 0) or 0)
 
             # 参照データラベル取得
-            reference_label = get_reference_data_label()
+            reference_label = await get_reference_data_label_async()
 
             # SQLでチャンネル別投稿数を取得（全件取得）
             sql = """
@@ -911,7 +497,7 @@ async def setup_graph_commands(tree: app_commands.CommandTree, client: Client):
               ORDER BY message_count DESC
             """
 
-            rows = run_statdb_query(sql, (uid,), fetch="all")
+            rows = await run_statdb_query_async(sql, (uid,), fetch="all")
 
             if not rows or len(rows) == 0:
                 # データがない場合
@@ -947,32 +533,19 @@ async def setup_graph_commands(tree: app_commands.CommandTree, client: Client):
                 uid,
             )
 
-            # 初期データを取得
-            current_data = view.get_current_data()
-            status_text = view.get_status_text()
-
             # 初期グラフを生成
-            image_path = create_channel_graph(
-                current_data,
-                username,
-                reference_label,
-                status_text,
-            )
+            image_bytes = await view.render_current()
 
             # Discordに送信（Viewを追加）
-            file = discord.File(image_path, filename="channel_distribution.png")
+            file = discord.File(
+                io.BytesIO(image_bytes), filename="channel_distribution.png"
+            )
             await ctx.followup.send(
                 f"{username}の書き込み先チャンネル分布\n{reference_label}",
                 file=file,
                 view=view,
             )
 
-            # 一時ファイルを削除
-            try:
-                os.unlink(image_path)
-            except Exception:
-                pass
-
             insert_command_log(ctx, "/mylocate", "OK")
 
         except Exception as e:
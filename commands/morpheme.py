@@ -11,20 +11,18 @@ from typing import Literal
 import discord
 from database.connection import run_statdb_query
 from discord import Client, app_commands
-from PIL import Image, ImageDraw, ImageFont
 from spam.protection import is_overload_allowed
 
+from core.db import run_statdb_query_async
 from core.log import insert_command_log
 from core.zichi import enforce_zichi_block
-
-try:
-    from wordcloud import WordCloud
-
-    WORDCLOUD_LIBRARY_AVAILABLE = True
-except ImportError:
-    WORDCLOUD_LIBRARY_AVAILABLE = False
-WORDCLOUD_FONT_PATH = "./fonts/NotoSansCJKjp-Regular.otf"
-WORDCLOUD_FALLBACK_FONT_PATH = "./fonts/NotoSansCJKjp-Regular.otf"
+from render.pool import render_pool
+from render.wordcloud import (
+    WORDCLOUD_LIBRARY_AVAILABLE,
+    render_pillow_wordcloud,
+    render_wordcloud,
+    render_wordcloud_masked,
+)
 
 
 @dataclass
@@ -812,10 +810,10 @@ class ChannelInputModal(discord.ui.Modal, title="チャンネル指定"):
                     pass
             if scope_name is None:
                 try:
-                    from database.connection import run_statdb_query
-
                     sql = "SELECT name FROM channels WHERE id = %s"
-                    result = run_statdb_query(sql, (channel_id,), fetch="one")
+                    result = await run_statdb_query_async(
+                        sql, (channel_id,), fetch="one"
+                    )
                     if result and result[0]:
                         scope_name = f"#{result[0]}"
                 except Exception:
@@ -1370,41 +1368,6 @@ class WordRankPaginationView(discord.ui.View):
             await interaction.response.edit_message(embed=embed, view=self)
 
 
-def _apply_sekam_watermark(
-    image: Image.Image,
-    watermark_path: str = "bg/sekam2logo.png",
-    opacity: float = 0.2,
-    margin: int = 10,
-) -> Image.Image:
-    import os
-
-    try:
-        if not os.path.exists(watermark_path):
-            return image
-        wm = Image.open(watermark_path).convert("RGBA")
-        target_w = int(image.width * 0.18)
-        if target_w <= 0:
-            return image
-        ratio = target_w / wm.width
-        target_h = max(1, int(wm.height * ratio))
-        wm_resized = wm.resize((target_w, target_h), Image.LANCZOS)
-        alpha = wm_resized.split()[3]
-        alpha = alpha.point(lambda p: int(p * opacity))
-        wm_resized.putalpha(alpha)
-        base_was_rgba = image.mode == "RGBA"
-        base = image.convert("RGBA")
-        pos = (
-            base.width - wm_resized.width - margin,
-            base.height - wm_resized.height - margin,
-        )
-        base.paste(wm_resized, pos, wm_resized)
-        if base_was_rgba:
-            return base
-        return base.convert("RGB")
-    except Exception:
-        return image
-
-
 async def get_wordcloud_data(
     user_id: int | None,
     channel_id: int | None,
@@ -1455,7 +1418,7 @@ async def get_wordcloud_data(
         LIMIT %s
     """
     params.append(limit)
-    rows = run_statdb_query(sql, tuple(params), fetch="all")
+    rows = await run_statdb_query_async(sql, tuple(params), fetch="all")
     return [(row[0], row[1]) for row in rows] if rows else []
 
 
@@ -1508,7 +1471,7 @@ async def get_proper_noun_ranking(
         LIMIT %s
     """
     params.append(limit)
-    rows = run_statdb_query(sql, tuple(params), fetch="all")
+    rows = await run_statdb_query_async(sql, tuple(params), fetch="all")
     return [(row[0], row[1]) for row in rows] if rows else []
 
 
@@ -1529,183 +1492,10 @@ async def generate_wordcloud_image_pillow(
     width: int = 1000,
     height: int = 700,
 ) -> bytes:
-    if not word_data:
-        img = Image.new("RGB", (width, height), color="white")
-        draw = ImageDraw.Draw(img)
-        draw.text((width // 2 - 100, height // 2), "データがありません", fill="gray")
-        output = io.BytesIO()
-        img.save(output, format="PNG")
-        output.seek(0)
-        return output.read()
-    img = Image.new("RGB", (width, height), color="white")
-    draw = ImageDraw.Draw(img)
-    try:
-        font_sizes = {
-            "huge": ImageFont.truetype(WORDCLOUD_FONT_PATH, 60),
-            "xlarge": ImageFont.truetype(WORDCLOUD_FONT_PATH, 50),
-            "large": ImageFont.truetype(WORDCLOUD_FONT_PATH, 40),
-            "medium": ImageFont.truetype(WORDCLOUD_FONT_PATH, 32),
-            "small": ImageFont.truetype(WORDCLOUD_FONT_PATH, 24),
-            "xsmall": ImageFont.truetype(WORDCLOUD_FONT_PATH, 18),
-            "tiny": ImageFont.truetype(WORDCLOUD_FONT_PATH, 15),
-        }
-    except Exception:
-        try:
-            font_sizes = {
-                "huge": ImageFont.truetype(WORDCLOUD_FALLBACK_FONT_PATH, 60),
-                "xlarge": ImageFont.truetype(WORDCLOUD_FALLBACK_FONT_PATH, 50),
-                "large": ImageFont.truetype(WORDCLOUD_FALLBACK_FONT_PATH, 40),
-                "medium": ImageFont.truetype(WORDCLOUD_FALLBACK_FONT_PATH, 32),
-                "small": ImageFont.truetype(WORDCLOUD_FALLBACK_FONT_PATH, 24),
-                "xsmall": ImageFont.truetype(WORDCLOUD_FALLBACK_FONT_PATH, 18),
-                "tiny": ImageFont.truetype(WORDCLOUD_FALLBACK_FONT_PATH, 15),
-            }
-        except Exception:
-            default_font = ImageFont.load_default()
-            font_sizes = {
-                "huge": default_font,
-                "xlarge": default_font,
-                "large": default_font,
-                "medium": default_font,
-                "small": default_font,
-                "xsmall": default_font,
-                "tiny": default_font,
-            }
-    colors = [
-        "#ff4d6d",
-        "#ff7b00",
-        "#ffb703",
-        "#ffd166",
-        "#06d6a0",
-        "#118ab2",
-        "#073b4c",
-        "#8338ec",
-        "#ff6b6b",
-        "#3a86ff",
-    ]
-    max_count = float(word_data[0][1]) if word_data else 1.0
-    min_count = float(word_data[-1][1]) if word_data else 1.0
-    count_range = max_count - min_count if max_count > min_count else 1.0
-
-    def get_font_size(count: int, index: int) -> tuple[str, any]:
-        """出現回数とインデックスからフォントサイズを決定"""
-        normalized = (
-            (float(count) - min_count) / count_range if count_range > 0 else 0.5
-        )
-        if index < 5:
-            size_key = "huge" if normalized > 0.7 else "xlarge"
-        elif index < 12:
-            size_key = "xlarge" if normalized > 0.6 else "large"
-        elif index < 25:
-            size_key = "large" if normalized > 0.5 else "medium"
-        elif index < 45:
-            size_key = "medium" if normalized > 0.4 else "small"
-        elif index < 70:
-            size_key = "small" if normalized > 0.3 else "xsmall"
-        else:
-            size_key = "xsmall" if normalized > 0.2 else "tiny"
-        return size_key, font_sizes[size_key]
-
-    GRID_COLS = 12
-    GRID_ROWS = 8
-    cell_width = (width - 60) // GRID_COLS
-    cell_height = (height - 60) // GRID_ROWS
-    occupied_cells = set()
-    placed_rects = []
-
-    def check_cell_available(
-        col: int,
-        row: int,
-        cols_needed: int = 1,
-        rows_needed: int = 1,
-    ) -> bool:
-        """指定されたセル範囲が利用可能かチェック"""
-        for c in range(col, min(col + cols_needed, GRID_COLS)):
-            for r in range(row, min(row + rows_needed, GRID_ROWS)):
-                if (c, r) in occupied_cells:
-                    return False
-        return True
-
-    def mark_cells_occupied(
-        col: int,
-        row: int,
-        cols_needed: int = 1,
-        rows_needed: int = 1,
-    ):
-        """指定されたセル範囲を使用済みにマーク"""
-        for c in range(col, min(col + cols_needed, GRID_COLS)):
-            for r in range(row, min(row + rows_needed, GRID_ROWS)):
-                occupied_cells.add((c, r))
-
-    def check_rect_overlap(x: int, y: int, w: int, h: int, margin: int = 5) -> bool:
-        """既存の配置と重なるかチェック（微調整用）"""
-        new_rect = (x - margin, y - margin, x + w + margin, y + h + margin)
-        for rect in placed_rects:
-            if not (
-                new_rect[2] < rect[0]
-                or new_rect[0] > rect[2]
-                or new_rect[3] < rect[1]
-                or new_rect[1] > rect[3]
-            ):
-                return True
-        return False
-
-    def find_grid_position(
-        text: str,
-        font: any,
-        size_key: str,
-    ) -> tuple[int, int] | None:
-        """グリッドベースで配置位置を探す（高速版）"""
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        cols_needed = max(1, (text_width + cell_width - 1) // cell_width)
-        rows_needed = max(1, (text_height + cell_height - 1) // cell_height)
-        if size_key in ["huge", "xlarge"]:
-            search_order = [
-                (col, row)
-                for row in range(GRID_ROWS // 2 - 2, GRID_ROWS // 2 + 3)
-                for col in range(GRID_COLS // 2 - 3, GRID_COLS // 2 + 4)
-                if 0 <= row < GRID_ROWS and 0 <= col < GRID_COLS
-            ]
-        else:
-            search_order = [
-                (col, row) for row in range(GRID_ROWS) for col in range(GRID_COLS)
-            ]
-            random.shuffle(search_order)
-        for col, row in search_order:
-            if check_cell_available(col, row, cols_needed, rows_needed):
-                offset_x = random.randint(-15, 15)
-                offset_y = random.randint(-15, 15)
-                x = 30 + col * cell_width + offset_x
-                y = 30 + row * cell_height + offset_y
-                x = max(30, min(x, width - text_width - 30))
-                y = max(30, min(y, height - text_height - 30))
-                if not check_rect_overlap(x, y, text_width, text_height):
-                    mark_cells_occupied(col, row, cols_needed, rows_needed)
-                    return x, y
-        return None
-
-    placed_count = 0
-    max_words = min(100, len(word_data))
-    for idx in range(max_words):
-        word, count = word_data[idx]
-        size_key, font = get_font_size(count, idx)
-        color = colors[idx % len(colors)]
-        position = find_grid_position(word, font, size_key)
-        if position:
-            x, y = position
-            draw.text((x, y), word, fill=color, font=font)
-            bbox = draw.textbbox((x, y), word, font=font)
-            placed_rects.append((bbox[0], bbox[1], bbox[2], bbox[3]))
-            placed_count += 1
-        if placed_count >= 80:
-            break
-    img = _apply_sekam_watermark(img)
-    output = io.BytesIO()
-    img.save(output, format="PNG")
-    output.seek(0)
-    return output.read()
+    """ワードクラウド画像を生成（Pillowのみ、描画プロセスプールで実行）"""
+    return await render_pool.render(
+        render_pillow_wordcloud, word_data=word_data, width=width, height=height
+    )
 
 
 async def generate_wordcloud_image_wordcloud(
@@ -1714,74 +1504,14 @@ async def generate_wordcloud_image_wordcloud(
     height: int = 700,
     max_words: int = 200,
 ) -> bytes:
-    """ワードクラウド画像を生成（wordcloudライブラリ使用）
-    「ぎっちり」スタイル：
-    wordcloudライブラリを使用して高密度で単語を配置。
-    カラフルな色合いと日本語フォントに対応。
-    Args:
-        word_data: [(単語, 出現回数), ...] のリスト
-        width: 画像幅
-        height: 画像高さ
-        max_words: 最大単語数（デフォルト200、もっとぎっちりで増加）
-    Returns:
-        PNG画像のバイト列
-    """
-    if not WORDCLOUD_LIBRARY_AVAILABLE:
-        raise ImportError("wordcloudライブラリがインストールされていません")
-    if not word_data:
-        img = Image.new("RGB", (width, height), color="white")
-        draw = ImageDraw.Draw(img)
-        draw.text((width // 2 - 100, height // 2), "データがありません", fill="gray")
-        output = io.BytesIO()
-        img.save(output, format="PNG")
-        output.seek(0)
-        return output.read()
-    word_freq = {word: float(count) for word, count in word_data}
-    import os
-
-    font_path = None
-    if os.path.exists(WORDCLOUD_FONT_PATH):
-        font_path = WORDCLOUD_FONT_PATH
-    elif os.path.exists(WORDCLOUD_FALLBACK_FONT_PATH):
-        font_path = WORDCLOUD_FALLBACK_FONT_PATH
-
-    def custom_color_func(
-        word,
-        font_size,
-        position,
-        orientation,
-        random_state=None,
-        **kwargs,
-    ):
-        """カラフルな色を生成"""
-        if random_state is None:
-            random_state = random.Random()
-        hue = random_state.randint(0, 360)
-        saturation = random_state.randint(70, 90)
-        lightness = random_state.randint(35, 55)
-        return f"hsl({hue}, {saturation}%, {lightness}%)"
-
-    wc = WordCloud(
+    """ワードクラウド画像を生成（wordcloudライブラリ使用、描画プロセスプールで実行）"""
+    return await render_pool.render(
+        render_wordcloud,
+        word_data=word_data,
         width=width,
         height=height,
-        background_color="white",
         max_words=max_words,
-        font_path=font_path,
-        min_font_size=10,
-        max_font_size=100,
-        relative_scaling=0.5,
-        color_func=custom_color_func,
-        margin=10,
-        prefer_horizontal=0.7,
-        random_state=42,
     )
-    wc.generate_from_frequencies(word_freq)
-    img = wc.to_image()
-    img = _apply_sekam_watermark(img)
-    output = io.BytesIO()
-    img.save(output, format="PNG")
-    output.seek(0)
-    return output.read()
 
 
 async def generate_wordcloud_image_wordcloud_masked(
@@ -1791,72 +1521,12 @@ async def generate_wordcloud_image_wordcloud_masked(
     width: int = 1000,
     height: int = 700,
 ) -> bytes:
-    """マスク画像を使用したワードクラウド生成（破壊モード専用）
-    Args:
-        word_data: [(単語, 出現回数), ...] のリスト
-        mask_path: マスク画像のパス（黒い部分に単語を配置）
-        cover_path: カバー画像のパス（最後に合成）
-        width: 画像幅
-        height: 画像高さ
-    Returns:
-        PNG画像のバイト列
-    """
-    if not WORDCLOUD_LIBRARY_AVAILABLE:
-        raise ImportError("wordcloudライブラリがインストールされていません")
-    import numpy as np
-
-    mask_image = Image.open(mask_path)
-    mask_array = np.array(mask_image)
-    cover_image = Image.open(cover_path).convert("RGBA")
-    word_freq = {word: float(count) for word, count in word_data}
-    import os
-
-    font_path = None
-    if os.path.exists(WORDCLOUD_FONT_PATH):
-        font_path = WORDCLOUD_FONT_PATH
-    elif os.path.exists(WORDCLOUD_FALLBACK_FONT_PATH):
-        font_path = WORDCLOUD_FALLBACK_FONT_PATH
-
-    def destroy_color_func(
-        word,
-        font_size,
-        position,
-        orientation,
-        random_state=None,
-        **kwargs,
-    ):
-        """赤・オレンジ系の破壊的な色を生成"""
-        if random_state is None:
-            random_state = random.Random()
-        hue = random_state.randint(0, 60)
-        saturation = random_state.randint(80, 100)
-        lightness = random_state.randint(40, 60)
-        return f"hsl({hue}, {saturation}%, {lightness}%)"
-
-    wc = WordCloud(
-        width=mask_array.shape[1],
-        height=mask_array.shape[0],
-        background_color=None,
-        mode="RGBA",
-        mask=mask_array,
-        max_words=1600,
-        font_path=font_path,
-        min_font_size=8,
-        max_font_size=80,
-        relative_scaling=0.5,
-        color_func=destroy_color_func,
-        margin=2,
-        prefer_horizontal=0.6,
-        random_state=42,
-        contour_width=0,
-        contour_color="red",
+    """マスク画像を使用したワードクラウド生成（破壊モード専用、描画プロセスプールで実行）"""
+    return await render_pool.render(
+        render_wordcloud_masked,
+        word_data=word_data,
+        mask_path=mask_path,
+        cover_path=cover_path,
+        width=width,
+        height=height,
     )
-    wc.generate_from_frequencies(word_freq)
-    wordcloud_img = wc.to_image().convert("RGBA")
-    cover_resized = cover_image.resize(wordcloud_img.size, Image.LANCZOS)
-    final_image = Image.alpha_composite(wordcloud_img, cover_resized)
-    final_image = _apply_sekam_watermark(final_image)
-    output = io.BytesIO()
-    final_image.save(output, format="PNG")
-    output.seek(0)
-    return output.read()
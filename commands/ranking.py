@@ -4,14 +4,16 @@ from datetime import datetime, timedelta
 from urllib.parse import quote
 
 import discord
-from database.connection import run_aidb_query, run_statdb_query
 from discord import Client, app_commands
 from spam.protection import is_overload_allowed
 
 import config
+from core.airank import get_airank_window
 from core.log import insert_command_log
+from core.topmessages import get_top_message
+from core.userstats import get_message_content, get_user_stats
 from core.zichi import enforce_zichi_block
-from utils.cache import get_reference_data_label, load_json_cache, save_json_cache
+from utils.cache import get_reference_data_label_async
 from utils.emoji import normalize_emoji_and_variants
 
 
@@ -41,55 +43,11 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
                 str(user),
             )
             uid = int(getattr(user, "id", 0) or 0)
-            reference_label = get_reference_data_label()
+            reference_label = await get_reference_data_label_async()
 
-            grin_rows = load_json_cache("grinrank.json", [])
+            stats = await get_user_stats(uid)
 
-            if not grin_rows:
-                sql = (
-                    "SELECT m.author_id, SUM(r.count) as grincount "
-                    "FROM reactions r JOIN messages m ON r.message_id = m.id "
-                    "WHERE r.emoji_name = 'grin' "
-                    "GROUP BY m.author_id ORDER BY grincount DESC"
-                )
-                grin_rows = run_statdb_query(sql, (), fetch="all") or []
-                try:
-                    grin_rows = [
-                        [
-                            int(r[0]) if r and r[0] is not None else 0,
-                            int(r[1]) if r and r[1] is not None else 0,
-                        ]
-                        for r in grin_rows
-                    ]
-                except Exception:
-                    grin_rows = []
-                save_json_cache("grinrank.json", grin_rows)
-
-            total = len(grin_rows)
-            grincount = 0
-            has_user = False
-            for r in grin_rows:
-                try:
-                    aid = int(str(r[0])) if r[0] is not None else 0
-                    cnt = int(r[1]) if r[1] is not None else 0
-                except Exception:
-                    continue
-                if aid == uid:
-                    grincount = cnt
-                    has_user = True
-                    break
-
-            if total > 0 and has_user:
-                outrank = sum(
-                    1
-                    for r in grin_rows
-                    if (int(r[1]) if r[1] is not None else 0) < grincount
-                )
-                percent = int(outrank * 100 / total)
-            else:
-                percent = 0
-
-            if total == 0 or not has_user:
+            if stats.grin_rank == 0:
                 embed = discord.Embed(title="ランク外、0個の:grin:")
                 embed.description = "対象期間内にデータがありませんでした。\nある意味、人生としてはユーザーの100%を上回っています。"
                 embed.set_footer(
@@ -102,12 +60,7 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
                 )
                 return
 
-            greater = sum(
-                1
-                for r in grin_rows
-                if (int(r[1]) if r[1] is not None else 0) > grincount
-            )
-            rank = greater + 1
+            grincount, rank, percent = stats.grin, stats.grin_rank, stats.grin_percent
 
             if rank == 37:
                 embed = discord.Embed(
@@ -174,56 +127,11 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
                 str(user),
             )
             uid = int(getattr(user, "id", 0) or 0)
-            reference_label = get_reference_data_label()
-
-            # キャッシュ読込
-            all_rows = load_json_cache("allrank.json", [])
-
-            if not all_rows:
-                sql = (
-                    "SELECT m.author_id, SUM(r.count) as total_count "
-                    "FROM reactions r JOIN messages m ON r.message_id = m.id "
-                    "GROUP BY m.author_id ORDER BY total_count DESC"
-                )
-                all_rows = run_statdb_query(sql, (), fetch="all") or []
-                # JSON シリアライズ可能形式へ
-                try:
-                    all_rows = [
-                        [
-                            int(r[0]) if r and r[0] is not None else 0,
-                            int(r[1]) if r and r[1] is not None else 0,
-                        ]
-                        for r in all_rows
-                    ]
-                except Exception:
-                    all_rows = []
-                save_json_cache("allrank.json", all_rows)
+            reference_label = await get_reference_data_label_async()
 
-            total = len(all_rows)
-            mycount = 0
-            has_user = False
-            for r in all_rows:
-                try:
-                    aid = int(str(r[0])) if r[0] is not None else 0
-                    cnt = int(r[1]) if r[1] is not None else 0
-                except Exception:
-                    continue
-                if aid == uid:
-                    mycount = cnt
-                    has_user = True
-                    break
-
-            if total > 0 and has_user:
-                outrank = sum(
-                    1
-                    for r in all_rows
-                    if (int(r[1]) if r[1] is not None else 0) < mycount
-                )
-                percent = int(outrank * 100 / total)
-            else:
-                percent = 0
+            stats = await get_user_stats(uid)
 
-            if total == 0 or not has_user:
+            if stats.all_rank == 0:
                 embed = discord.Embed(title="ランク外、0個のリアクション")
                 embed.description = (
                     "対象期間内にデータがありませんでした。\n無味乾燥なメッセージ。"
@@ -239,10 +147,11 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
                 return
 
             # 標準競技順位（同率で飛び番）: 自分より大きい件数 + 1
-            greater = sum(
-                1 for r in all_rows if (int(r[1]) if r[1] is not None else 0) > mycount
+            mycount, rank, percent = (
+                stats.all_reactions,
+                stats.all_rank,
+                stats.all_percent,
             )
-            rank = greater + 1
 
             if rank == 37:
                 embed = discord.Embed(
@@ -309,121 +218,32 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
                 str(user),
             )
             uid = int(getattr(user, "id", 0) or 0)
-            reference_label = get_reference_data_label()
-
-            # truthgrinrank キャッシュ読込
-            truth_rows = load_json_cache("truthgrinrank.json", [])
-
-            if not truth_rows:
-                sql_truth = (
-                    "SELECT m.author_id, SUM(r.count) as grincount "
-                    "FROM reactions r JOIN messages m ON r.message_id = m.id "
-                    "WHERE r.emoji_name = 'grin' "
-                    "  AND m.content NOT LIKE '%%http%%' "
-                    "  AND m.content NOT LIKE '%%https%%' "
-                    "GROUP BY m.author_id ORDER BY grincount DESC"
-                )
-                truth_rows = run_statdb_query(sql_truth, (), fetch="all") or []
-                # JSON化
-                try:
-                    truth_rows = [
-                        [
-                            int(r[0]) if r and r[0] is not None else 0,
-                            int(r[1]) if r and r[1] is not None else 0,
-                        ]
-                        for r in truth_rows
-                    ]
-                except Exception:
-                    truth_rows = []
-                save_json_cache("truthgrinrank.json", truth_rows)
+            reference_label = await get_reference_data_label_async()
+
+            stats = await get_user_stats(uid)
 
             # 自分のtruth数と順位・割合
-            total_truth = len(truth_rows)
-            truth_count = 0
-            has_truth_user = False
-            for r in truth_rows:
-                try:
-                    aid = int(str(r[0])) if r[0] is not None else 0
-                    cnt = int(r[1]) if r[1] is not None else 0
-                except Exception:
-                    continue
-                if aid == uid:
-                    truth_count = cnt
-                    has_truth_user = True
-                    break
-            if total_truth > 0 and has_truth_user:
-                outrank = sum(
-                    1
-                    for r in truth_rows
-                    if (int(r[1]) if r[1] is not None else 0) < truth_count
-                )
-                truth_percent = int(outrank * 100 / total_truth)
-            else:
-                truth_percent = 0
-            truth_rank = (
-                sum(
-                    1
-                    for r in truth_rows
-                    if (int(r[1]) if r[1] is not None else 0) > truth_count
-                )
-            ) + 1
-
-            # grin集計（受け取り側）をキャッシュ/参照
-            grin_rows = load_json_cache("grinrank.json", [])
-            if not grin_rows:
-                sql_grin = (
-                    "SELECT m.author_id, SUM(r.count) as grincount "
-                    "FROM reactions r JOIN messages m ON r.message_id = m.id "
-                    "WHERE r.emoji_name = 'grin' "
-                    "GROUP BY m.author_id ORDER BY grincount DESC"
-                )
-                grin_rows = run_statdb_query(sql_grin, (), fetch="all") or []
-                try:
-                    grin_rows = [
-                        [
-                            int(r[0]) if r and r[0] is not None else 0,
-                            int(r[1]) if r and r[1] is not None else 0,
-                        ]
-                        for r in grin_rows
-                    ]
-                except Exception:
-                    grin_rows = []
-                save_json_cache("grinrank.json", grin_rows)
-            grin_count = 0
-            for r in grin_rows:
-                try:
-                    aid = int(str(r[0])) if r[0] is not None else 0
-                    cnt = int(r[1]) if r[1] is not None else 0
-                except Exception:
-                    continue
-                if aid == uid:
-                    grin_count = cnt
-                    break
+            truth_count = stats.truth
+            truth_rank = stats.truth_rank
+            truth_percent = stats.truth_percent
+
+            # grin集計（受け取り側）
+            grin_count = stats.grin
 
             # truth / grin の比率（0割りを避ける）
             ratio_percent = (
                 int((truth_count * 100) / grin_count) if grin_count > 0 else 0
             )
 
-            # モノホン最多メッセージ（URLやwww.を含むものは除外）
-            sql = (
-                "SELECT "
-                "    m.id as message_id, "
-                "    m.author_id, "
-                "    m.channel_id, "
-                "    m.content, "
-                "    SUM(r.count) as total_grin_count "
-                "FROM messages m "
-                "JOIN reactions r ON m.id = r.message_id "
-                "WHERE m.author_id = %s AND r.emoji_name = 'grin' "
-                "  AND m.content NOT LIKE '%%http://%%' "
-                "  AND m.content NOT LIKE '%%https://%%' "
-                "  AND m.content NOT LIKE '%%www.%%' "
-                "GROUP BY m.id, m.author_id, m.channel_id, m.content "
-                "ORDER BY total_grin_count DESC "
-                "LIMIT 1"
-            )
-            top_truth_row = run_statdb_query(sql, (uid,), fetch="one")
+            # モノホン最多メッセージ（URLやwww.を含むものは除外）は統計に記録済みなので本文だけ取得
+            top_truth_row = None
+            if stats.top_truth_message_id:
+                top_truth_row = (
+                    stats.top_truth_message_id,
+                    uid,
+                    stats.top_truth_channel_id,
+                    await get_message_content(stats.top_truth_message_id),
+                )
 
             if truth_rank == 37:
                 # エンベッド構築
@@ -559,45 +379,21 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
                 str(user),
             )
             uid = int(getattr(user, "id", 0) or 0)
-            reference_label = get_reference_data_label()
-
-            sql = (
-                "SELECT "
-                "    m.id as message_id, "
-                "    m.author_id, "
-                "    m.channel_id, "
-                "    m.content, "
-                "    SUM(r.count) as total_grin_count "
-                "FROM messages m "
-                "JOIN reactions r ON m.id = r.message_id "
-                "WHERE m.author_id = %s AND r.emoji_name = 'grin' "
-                "GROUP BY m.id, m.author_id, m.channel_id, m.content "
-                "ORDER BY total_grin_count DESC "
-                "LIMIT 1"
-            )
-            row = run_statdb_query(sql, (uid,), fetch="one")
+            reference_label = await get_reference_data_label_async()
+
+            top = await get_top_message(uid, "grin", ["grin"])
 
-            if not row:
+            if top is None:
                 await ctx.followup.send(
                     "対象のメッセージが見つかりませんでした。",
                     ephemeral=True,
                 )
                 return
 
-            message_id = row[0]
-            channel_id = row[2]
-            content = row[3] if row[3] is not None else ""
-
-            # 画像を取得（attachmentsテーブルから）
-            attachment_sql = "SELECT url FROM attachments WHERE message_id = %s LIMIT 1"
-            attachment_row = run_statdb_query(
-                attachment_sql,
-                (message_id,),
-                fetch="one",
-            )
-            image_url = (
-                attachment_row[0] if attachment_row and attachment_row[0] else None
-            )
+            message_id = top.message_id
+            channel_id = top.channel_id
+            content = await get_message_content(message_id)
+            image_url = top.image_url
 
             # 表示文言（Twitter/Xリンクが含まれる場合は表題を変更）
             base_title = f"{username}の最多:grin:獲得メッセージ"
@@ -662,27 +458,11 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
             )
             uid = int(getattr(user, "id", 0) or 0)
 
-            # 総メッセージ数
-            sql_total = (
-                "SELECT author_id, COUNT(*) as total_messages "
-                "FROM messages WHERE author_id = %s GROUP BY author_id"
-            )
-            row_total = run_statdb_query(sql_total, (uid,), fetch="one")
-            total_messages = (
-                int(row_total[1]) if row_total and row_total[1] is not None else 0
-            )
+            stats = await get_user_stats(uid)
 
-            # grinが付いたメッセージ数（重複message_idを除外）
-            sql_grin = (
-                "SELECT m.author_id, COUNT(DISTINCT r.message_id) as message_count_with_grin "
-                "FROM reactions r JOIN messages m ON r.message_id = m.id "
-                "WHERE r.emoji_name = 'grin' AND m.author_id = %s "
-                "GROUP BY m.author_id"
-            )
-            row_grin = run_statdb_query(sql_grin, (uid,), fetch="one")
-            message_count_with_grin = (
-                int(row_grin[1]) if row_grin and row_grin[1] is not None else 0
-            )
+            # 総メッセージ数と、grinが付いたメッセージ数（重複message_idを除外）
+            total_messages = stats.messages
+            message_count_with_grin = stats.grin_messages
 
             percent = (
                 (message_count_with_grin * 100.0 / total_messages)
@@ -697,7 +477,7 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
                 icon_url="https://example.com/sekam2logo.png",
             )
             await ctx.followup.send(
-                f"{username}の:grin:打率\n{get_reference_data_label()}",
+                f"{username}の:grin:打率\n{await get_reference_data_label_async()}",
                 embed=embed,
             )
             insert_command_log(ctx, "/grinper", "OK")
@@ -745,7 +525,7 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
                 str(user),
             )
             uid = int(getattr(user, "id", 0) or 0)
-            reference_label = get_reference_data_label()
+            reference_label = await get_reference_data_label_async()
 
             base_name, tone_variants = normalize_emoji_and_variants(reaction)
             if not base_name or not tone_variants:
@@ -756,26 +536,10 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
                 insert_command_log(ctx, "/maxreaction", "INVALID_EMOJI")
                 return
 
-            # 指定した絵文字を最も多く受け取ったメッセージを検索
-            placeholders = ", ".join(["%s"] * len(tone_variants))
-            sql = (
-                "SELECT "
-                "    m.id as message_id, "
-                "    m.author_id, "
-                "    m.channel_id, "
-                "    m.content, "
-                "    SUM(r.count) as total_reaction_count "
-                "FROM messages m "
-                "JOIN reactions r ON m.id = r.message_id "
-                f"WHERE m.author_id = %s AND r.emoji_name IN ({placeholders}) "
-                "GROUP BY m.id, m.author_id, m.channel_id, m.content "
-                "ORDER BY total_reaction_count DESC "
-                "LIMIT 1"
-            )
-            params = (uid,) + tuple(tone_variants)
-            row = run_statdb_query(sql, params, fetch="one")
+            # 指定した絵文字を最も多く受け取ったメッセージ
+            top = await get_top_message(uid, base_name, tone_variants)
 
-            if not row:
+            if top is None:
                 await ctx.followup.send(
                     f":{base_name}:を受け取ったメッセージが見つかりませんでした。",
                     ephemeral=True,
@@ -783,21 +547,11 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
                 insert_command_log(ctx, "/maxreaction", "NO_DATA")
                 return
 
-            message_id = row[0]
-            channel_id = row[2]
-            content = row[3] if row[3] is not None else ""
-            total_count = int(row[4]) if row[4] is not None else 0
-
-            # 画像を取得（attachmentsテーブルから）
-            attachment_sql = "SELECT url FROM attachments WHERE message_id = %s LIMIT 1"
-            attachment_row = run_statdb_query(
-                attachment_sql,
-                (message_id,),
-                fetch="one",
-            )
-            image_url = (
-                attachment_row[0] if attachment_row and attachment_row[0] else None
-            )
+            message_id = top.message_id
+            channel_id = top.channel_id
+            content = await get_message_content(message_id)
+            total_count = top.count
+            image_url = top.image_url
 
             base_title = (
                 f"{username}の最多:{base_name}:獲得メッセージ ({total_count}個)"
@@ -910,53 +664,12 @@ async def setup_ranking_commands(tree: app_commands.CommandTree, client: Client)
             # ページ番号のバリデーション
             page = max(page, 1)
 
-            # SQLクエリの構築
-            # emoji_nameで絞り込み + before/after条件 + 添付ファイルまたはsora.chatgpt.com含有チェック
-            placeholders = ", ".join(["%s"] * len(tone_variants))
-            params = list(tone_variants)
-
-            where_conditions = [f"r.emoji_name IN ({placeholders})"]
-
-            # before条件（before日付を含まない: < before）
-            if before_date:
-                where_conditions.append("m.timestamp < %s")
-                params.append(before_date)
-
-            # after条件（after日付を含まない: > after）
-            if after_date:
-                where_conditions.append("m.timestamp > %s")
-                params.append(after_date)
-
-            # 添付ファイルが動画であるメッセージのみ
-            where_conditions.append(
-                "EXISTS (SELECT 1 FROM attachments a WHERE a.message_id = m.id AND ("
-                "a.filename LIKE '%%.mp4' OR a.filename LIKE '%%.mov' OR "
-                "a.filename LIKE '%%.avi' OR a.filename LIKE '%%.webm' OR "
-                "a.filename LIKE '%%.mkv' OR a.filename LIKE '%%.flv' OR "
-                "a.filename LIKE '%%.wmv' OR a.filename LIKE '%%.m4v'))",
+            # 条件ごとの並び順は1回だけ集計してキャッシュし、ページはその切り出し
+            window = await get_airank_window(
+                base_name, tone_variants, before_date, after_date
             )
-
-            where_clause = " AND ".join(where_conditions)
-
-            # ページネーション: LIMIT 5 OFFSET (page-1)*5
             offset = (page - 1) * 5
-
-            sql = f"""
-                SELECT
-                    m.id as message_id,
-                    m.channel_id,
-                    m.content,
-                    SUM(r.count) as total_reaction_count
-                FROM messages m
-                JOIN reactions r ON m.id = r.message_id
-                WHERE {where_clause}
-                GROUP BY m.id, m.channel_id, m.content
-                ORDER BY total_reaction_count DESC
-                LIMIT 5 OFFSET %s
-            """
-            params.append(offset)
-
-            rows = run_aidb_query(sql, tuple(params), fetch="all")
+            rows = window.page(page, 5)
 
             if not rows:
                 await ctx.followup.send(
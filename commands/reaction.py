@@ -1,14 +1,16 @@
 """リアクション統計関連のコマンド群"""
 
 import discord
-from database.connection import run_statdb_query, run_testdb_query
 from discord import app_commands
 from spam.protection import is_overload_allowed
 
 import config
+from core.giverank import get_give_tables
 from core.log import insert_command_log
+from core.rankings import get_reaction_table
+from core.userstats import get_user_stats
 from core.zichi import enforce_zichi_block
-from utils.cache import get_reference_data_label, load_json_cache, save_json_cache
+from utils.cache import get_reference_data_label_async
 from utils.emoji import normalize_emoji_and_variants
 
 
@@ -49,67 +51,22 @@ async def setup_reaction_commands(
                 )
                 return
 
-            cache = load_json_cache("reaction.json", {})
+            table = await get_reaction_table(base_name, tone_variants)
+            entry = table.lookup(uid)
 
-            rows = cache.get(base_name) if isinstance(cache, dict) else None
-            if not rows:
-                placeholders = ", ".join(["%s"] * len(tone_variants))
-                sql = (
-                    "SELECT m.author_id, SUM(r.count) as total_reactions "
-                    "FROM reactions r "
-                    "JOIN messages m ON r.message_id = m.id "
-                    f"WHERE r.emoji_name IN ({placeholders}) "
-                    "GROUP BY m.author_id "
-                    "ORDER BY total_reactions DESC"
-                )
-                rows = run_statdb_query(sql, tuple(tone_variants), fetch="all") or []
-                try:
-                    serial_rows = [
-                        [
-                            int(r[0]) if r and r[0] is not None else 0,
-                            int(r[1]) if r and r[1] is not None else 0,
-                        ]
-                        for r in rows
-                    ]
-                except Exception:
-                    serial_rows = []
-                cache[base_name] = serial_rows
-                save_json_cache("reaction.json", cache)
-                rows = serial_rows
-
-            my_total = 0
-            has_user = False
-            for r in rows:
-                try:
-                    author_id, total = int(r[0]), int(r[1]) if r[1] is not None else 0
-                except Exception:
-                    continue
-                if author_id == uid:
-                    my_total = total
-                    has_user = True
-                    break
-
-            if not has_user or my_total <= 0:
+            if entry is None or entry.count <= 0:
                 embed = discord.Embed(title=f"ランク外、0個の:{base_name}:")
                 embed.set_footer(
                     text="SEKAM2 - SEKAMの2",
                     icon_url="https://example.com/sekam2logo.png",
                 )
                 await ctx.followup.send(
-                    f"{username}の:{base_name}:ランキング\n{get_reference_data_label()}",
+                    f"{username}の:{base_name}:ランキング\n{await get_reference_data_label_async()}",
                     embed=embed,
                 )
                 return
 
-            greater = 0
-            for r in rows:
-                try:
-                    total = int(r[1]) if r[1] is not None else 0
-                except Exception:
-                    total = 0
-                if total > my_total:
-                    greater += 1
-            rank = greater + 1
+            my_total, rank = entry.count, entry.rank
 
             if rank == 37:
                 embed = discord.Embed(
@@ -121,7 +78,7 @@ async def setup_reaction_commands(
                     icon_url="https://example.com/sekam2logo.png",
                 )
                 await ctx.followup.send(
-                    f"{username}の:{base_name}:ランキング\n{get_reference_data_label()}",
+                    f"{username}の:{base_name}:ランキング\n{await get_reference_data_label_async()}",
                     embed=embed,
                 )
                 insert_command_log(ctx, "/reactionrank", "37")
@@ -132,7 +89,7 @@ async def setup_reaction_commands(
                 icon_url="https://example.com/sekam2logo.png",
             )
             await ctx.followup.send(
-                f"{username}の:{base_name}:ランキング\n{get_reference_data_label()}",
+                f"{username}の:{base_name}:ランキング\n{await get_reference_data_label_async()}",
                 embed=embed,
             )
             insert_command_log(ctx, "/reactionrank", "OK")
@@ -180,7 +137,7 @@ async def setup_reaction_commands(
             )
             uid = int(getattr(user, "id", 0) or 0)
 
-            base_name, _tone_variants_unused = normalize_emoji_and_variants(reaction)
+            base_name, tone_variants = normalize_emoji_and_variants(reaction)
             if not base_name:
                 await ctx.followup.send(
                     "絵文字（または絵文字名）を判別できませんでした。",
@@ -188,49 +145,10 @@ async def setup_reaction_commands(
                 )
                 return
 
-            cache = load_json_cache("give_reaction.json", {})
-
-            rows = None
-            if base_name in cache:
-                rows = cache.get(base_name) or []
-            if rows is None:
-                rows = []
-
-            if not rows:
-                sql = (
-                    "SELECT user_id, COUNT(*) as grin_reaction_count "
-                    "FROM reaction WHERE emoji_code = %s "
-                    "GROUP BY user_id ORDER BY grin_reaction_count DESC"
-                )
-                rows = run_testdb_query(sql, (base_name,), fetch="all") or []
-                try:
-                    serial_rows = [
-                        [
-                            int(r[0]) if r and r[0] is not None else 0,
-                            int(r[1]) if r and r[1] is not None else 0,
-                        ]
-                        for r in rows
-                    ]
-                except Exception:
-                    serial_rows = []
-                cache[base_name] = serial_rows
-                save_json_cache("give_reaction.json", cache)
-                rows = serial_rows
-
-            my_total = 0
-            has_user = False
-            for r in rows:
-                try:
-                    r_uid = int(str(r[0])) if r[0] is not None else 0
-                    cnt = int(r[1]) if r[1] is not None else 0
-                except Exception:
-                    continue
-                if r_uid == uid:
-                    my_total = cnt
-                    has_user = True
-                    break
+            tables = await get_give_tables(base_name, tone_variants or [base_name])
+            entry = tables.give.lookup(uid)
 
-            if not has_user or my_total <= 0:
+            if entry is None or entry.count <= 0:
                 embed = discord.Embed(
                     title=f"ランク外、:{base_name}:は一回もあげてません",
                 )
@@ -239,20 +157,12 @@ async def setup_reaction_commands(
                     icon_url="https://example.com/sekam2logo.png",
                 )
                 await ctx.followup.send(
-                    f"{username}の:{base_name}:をあげた人ランキング\n{get_reference_data_label()}",
+                    f"{username}の:{base_name}:をあげた人ランキング\n{await get_reference_data_label_async()}",
                     embed=embed,
                 )
                 insert_command_log(ctx, "/givereactionrank", "NO_DATA")
                 return
-            greater = 0
-            for r in rows:
-                try:
-                    cnt = int(r[1]) if r[1] is not None else 0
-                except Exception:
-                    cnt = 0
-                if cnt > my_total:
-                    greater += 1
-            rank = greater + 1
+            my_total, rank = entry.count, entry.rank
 
             if rank == 37:
                 embed = discord.Embed(
@@ -268,7 +178,7 @@ async def setup_reaction_commands(
                 icon_url="https://example.com/sekam2logo.png",
             )
             await ctx.followup.send(
-                f"{username}の:{base_name}:をあげた人ランキング\n{get_reference_data_label()}",
+                f"{username}の:{base_name}:をあげた人ランキング\n{await get_reference_data_label_async()}",
                 embed=embed,
             )
             insert_command_log(ctx, "/givereactionrank", "OK")
@@ -313,53 +223,16 @@ async def setup_reaction_commands(
                 str(exec_user),
             )
             target_uid = int(getattr(exec_user, "id", 0) or 0)
-            give_rows = load_json_cache("givegrinrank.json", [])
-
-            if not give_rows:
-                sql = (
-                    "SELECT user_id, COUNT(*) as grincount "
-                    "FROM reaction WHERE emoji_code = 'grin' "
-                    "GROUP BY user_id ORDER BY grincount DESC"
-                )
-                give_rows = run_testdb_query(sql, (), fetch="all") or []
-                save_json_cache("givegrinrank.json", give_rows)
-
-            total = len(give_rows)
-            has_give = False
-            givegrincount = 0
-            for r in give_rows:
-                try:
-                    uid = int(str(r[0])) if r[0] is not None else 0
-                    cnt = int(r[1]) if r[1] is not None else 0
-                except Exception:
-                    continue
-                if uid == target_uid:
-                    givegrincount = cnt
-                    has_give = True
-                    break
+            stats = await get_user_stats(target_uid)
+            grincount = stats.grin
+            # あげた数と順位は比と同じ表から取る(スナップショットの given は
+            # reaction DB が落ちていると 0 のままなので使わない)
+            give_tables = await get_give_tables("grin", ["grin"])
+            given = give_tables.give.lookup(target_uid)
+            givegrincount = given.count if given is not None else 0
+            ratio = give_tables.ratio_of(target_uid)
 
-            grin_rows = load_json_cache("grinrank.json", [])
-            if not grin_rows:
-                sql_grin = (
-                    "SELECT m.author_id, SUM(r.count) as grincount "
-                    "FROM reactions r JOIN messages m ON r.message_id = m.id "
-                    "WHERE r.emoji_name = 'grin' "
-                    "GROUP BY m.author_id ORDER BY grincount DESC"
-                )
-                grin_rows = run_statdb_query(sql_grin, (), fetch="all") or []
-                save_json_cache("grinrank.json", grin_rows)
-            grincount = 0
-            for r in grin_rows:
-                try:
-                    aid = int(str(r[0])) if r[0] is not None else 0
-                    cnt = int(r[1]) if r[1] is not None else 0
-                except Exception:
-                    continue
-                if aid == target_uid:
-                    grincount = cnt
-                    break
-
-            if total == 0 or not has_give:
+            if given is None:
                 embed = discord.Embed(
                     title="誰にも笑ったことがないです。(0個の:grin:をあげました)",
                 )
@@ -371,18 +244,13 @@ async def setup_reaction_commands(
                     icon_url="https://example.com/sekam2logo.png",
                 )
                 await ctx.followup.send(
-                    f"{username}の:grin:をあげた人ランキング\n{get_reference_data_label()}",
+                    f"{username}の:grin:をあげた人ランキング\n{await get_reference_data_label_async()}",
                     embed=embed,
                 )
                 insert_command_log(ctx, "/givegrinrank", "NO_DATA")
                 return
 
-            greater = sum(
-                1
-                for r in give_rows
-                if (int(r[1]) if r[1] is not None else 0) > givegrincount
-            )
-            rank = greater + 1
+            rank = given.rank
 
             if rank == 37:
                 embed = discord.Embed(
@@ -396,12 +264,15 @@ async def setup_reaction_commands(
             embed.description = (
                 f"もらった:grin: : {grincount}個\nあげた:grin: : {givegrincount}個"
             )
+            if ratio is not None:
+                ratio_rank = give_tables.ratio.lookup(target_uid).rank
+                embed.description += f"\nあげた/もらった : {ratio:.2f} ({ratio_rank}位)"
             embed.set_footer(
                 text="SEKAM2 - SEKAMの2",
                 icon_url="https://example.com/sekam2logo.png",
             )
             await ctx.followup.send(
-                f"{username}の:grin:をあげた人ランキング\n{get_reference_data_label()}",
+                f"{username}の:grin:をあげた人ランキング\n{await get_reference_data_label_async()}",
                 embed=embed,
             )
             insert_command_log(ctx, "/givegrinrank", "OK")
@@ -11,7 +11,7 @@ from discord.app_commands import guild_only, allowed_contexts, allowed_installs
 
 from core.zichi import enforce_zichi_block
 from core.log import insert_command_log
-from spam.settings import set_setting_value
+from core.guild_settings import guild_settings
 
 
 async def setup_settings_commands(tree: app_commands.CommandTree, client: Client):
@@ -64,7 +64,7 @@ async def setup_settings_commands(tree: app_commands.CommandTree, client: Client
                 return
 
             chid = int(channel.id)
-            ok = set_setting_value(ctx.guild.id, "logchannel", chid)
+            ok = guild_settings.set(ctx.guild.id, "logchannel", chid)
             view = discord.ui.View()
             button = discord.ui.Button(
                 style=discord.ButtonStyle.danger,
@@ -112,7 +112,7 @@ async def setup_settings_commands(tree: app_commands.CommandTree, client: Client
                 return
 
             choice = str(setting)
-            ok = set_setting_value(
+            ok = guild_settings.set(
                 ctx.guild.id, "ban", True if choice == "on" else False
             )
             message1 = "設定されました。" if ok else "設定に失敗しました。"
@@ -159,7 +159,7 @@ async def setup_settings_commands(tree: app_commands.CommandTree, client: Client
                 return
 
             choice = str(setting)
-            ok = set_setting_value(
+            ok = guild_settings.set(
                 ctx.guild.id, "blacklist", True if choice == "on" else False
             )
             msg = "設定されました。" if ok else "設定に失敗しました。"
@@ -2,13 +2,15 @@
 ユーザー入力フォームとデータ検証を担当
 """
 
+import asyncio
 from urllib.parse import quote
 
 import discord
-from database.connection import run_aidb_query
 from discord import ui
 
+from core.db import run_aidb_query_async
 from core.log import insert_command_log
+from core.videos import is_video_message
 
 from .utils import (
     parse_date_input,
@@ -17,6 +19,10 @@ from .utils import (
     update_video_title,
 )
 
+# 情報編集Modalの初期値を読む時間の上限(秒)
+# send_modal はインタラクションから3秒以内に返す必要があるので、間に合わなければ空欄で開く
+INFO_PREFILL_TIMEOUT = 1.0
+
 
 class RankingDateModal(ui.Modal, title="ランキング期間指定"):
     """ランキング日付入力Modal
@@ -268,15 +274,23 @@ class InfoEditModal(ui.Modal, title="動画情報の追加・編集"):
         self.message_id = message_id
         self.previous_view_data = previous_view_data
 
-        # 既存情報の取得と初期値設定
-        self._load_existing_info()
-
-    def _load_existing_info(self):
-        """metaテーブルから既存情報を取得して初期値に設定"""
+    async def load_existing_info(self):
+        """
+        metaテーブルから既存情報を取得して初期値に設定(send_modal の前に呼ぶ)
+        INFO_PREFILL_TIMEOUT 秒以内に読めない場合は空欄のままにする
+        (空欄の項目は保存時に変更されず、タグは既存のものに追加されるので失われない)
+        """
         import json
 
         sql = "SELECT title, tag FROM meta WHERE id = %s"
-        result = run_aidb_query(sql, (self.message_id,), fetch="one")
+        try:
+            result = await asyncio.wait_for(
+                run_aidb_query_async(sql, (self.message_id,), fetch="one"),
+                INFO_PREFILL_TIMEOUT,
+            )
+        except Exception as e:
+            print(f"Error loading video info: {e!r}")
+            return
 
         if result:
             title, tag = result
@@ -323,13 +337,13 @@ class InfoEditModal(ui.Modal, title="動画情報の追加・編集"):
 
             # タイトルの更新
             if title:
-                if update_video_title(self.message_id, title, user_id):
+                if await update_video_title(self.message_id, title, user_id):
                     success = True
                     changes.append(f"タイトル:'{title}'")
 
             # タグの更新
             if tags:
-                if update_video_tags(self.message_id, tags, user_id):
+                if await update_video_tags(self.message_id, tags, user_id):
                     success = True
                     changes.append(f"タグ:{','.join(tags)}")
 
@@ -416,20 +430,8 @@ class VideoIdModal(ui.Modal, title="動画ID指定"):
 
             message_id = int(video_id_str)
 
-            # メッセージが存在するか確認
-            sql = """
-                SELECT m.id
-                FROM messages m
-                WHERE m.id = %s
-                AND EXISTS (SELECT 1 FROM attachments a WHERE a.message_id = m.id AND (
-                    a.filename LIKE '%%.mp4' OR a.filename LIKE '%%.mov' OR
-                    a.filename LIKE '%%.avi' OR a.filename LIKE '%%.webm' OR
-                    a.filename LIKE '%%.mkv' OR a.filename LIKE '%%.flv' OR
-                    a.filename LIKE '%%.wmv' OR a.filename LIKE '%%.m4v'))
-            """
-            result = run_aidb_query(sql, (message_id,), fetch="one")
-
-            if not result:
+            # 動画メッセージか確認
+            if not await is_video_message(message_id):
                 await interaction.response.send_message(
                     f"ID {message_id} の動画が見つかりませんでした。",
                     ephemeral=True,
@@ -5,7 +5,8 @@ SORAコマンド - ユーティリティ関数群
 
 from datetime import datetime
 
-from database.connection import run_aidb_query
+from core.db import run_aidb_query_async
+from core.tags import tag_index
 
 
 def parse_date_input(date_str: str | None) -> datetime | None:
@@ -146,7 +147,7 @@ def merge_tags(existing_tags: str, new_tags: list[str]) -> str:
     return ",".join(all_tags)
 
 
-def update_video_title(message_id: int, title: str, user_id: int) -> bool:
+async def update_video_title(message_id: int, title: str, user_id: int) -> bool:
     """
     動画のタイトルをmetaテーブルに保存
 
@@ -161,7 +162,7 @@ def update_video_title(message_id: int, title: str, user_id: int) -> bool:
     try:
         # 既存レコードの確認
         check_sql = "SELECT id FROM meta WHERE id = %s"
-        existing = run_aidb_query(check_sql, (message_id,), fetch="one")
+        existing = await run_aidb_query_async(check_sql, (message_id,), fetch="one")
 
         if existing:
             # UPDATE
@@ -170,14 +171,14 @@ def update_video_title(message_id: int, title: str, user_id: int) -> bool:
                 SET title = %s
                 WHERE id = %s
             """
-            run_aidb_query(update_sql, (title, message_id), commit=True)
+            await run_aidb_query_async(update_sql, (title, message_id), commit=True)
         else:
             # INSERT - 必須カラムを含める
             insert_sql = """
                 INSERT INTO meta (id, title, tag, description, type, filename, width, height, channelid)
                 VALUES (%s, %s, '[]', '', '', '', 0, 0, 0)
             """
-            run_aidb_query(insert_sql, (message_id, title), commit=True)
+            await run_aidb_query_async(insert_sql, (message_id, title), commit=True)
 
         return True
     except Exception as e:
@@ -185,7 +186,7 @@ def update_video_title(message_id: int, title: str, user_id: int) -> bool:
         return False
 
 
-def update_video_tags(message_id: int, tags: list[str], user_id: int) -> bool:
+async def update_video_tags(message_id: int, tags: list[str], user_id: int) -> bool:
     """
     動画のタグをmetaテーブルに保存
 
@@ -202,7 +203,7 @@ def update_video_tags(message_id: int, tags: list[str], user_id: int) -> bool:
 
         # 既存レコードの確認
         check_sql = "SELECT tag FROM meta WHERE id = %s"
-        existing = run_aidb_query(check_sql, (message_id,), fetch="one")
+        existing = await run_aidb_query_async(check_sql, (message_id,), fetch="one")
 
         if existing:
             # 既存タグとマージ
@@ -225,7 +226,8 @@ def update_video_tags(message_id: int, tags: list[str], user_id: int) -> bool:
                 SET tag = %s
                 WHERE id = %s
             """
-            run_aidb_query(update_sql, (tags_json, message_id), commit=True)
+            await run_aidb_query_async(update_sql, (tags_json, message_id), commit=True)
+            await tag_index.set_tags(message_id, merged_tags)
         else:
             # INSERT - 必須カラムを含める
             tags_json = json.dumps(tags, ensure_ascii=False)
@@ -233,7 +235,8 @@ def update_video_tags(message_id: int, tags: list[str], user_id: int) -> bool:
                 INSERT INTO meta (id, title, tag, description, type, filename, width, height, channelid)
                 VALUES (%s, '', %s, '', '', '', 0, 0, 0)
             """
-            run_aidb_query(insert_sql, (message_id, tags_json), commit=True)
+            await run_aidb_query_async(insert_sql, (message_id, tags_json), commit=True)
+            await tag_index.set_tags(message_id, tags)
 
         return True
     except Exception as e:
@@ -7,9 +7,17 @@ from typing import Any
 from urllib.parse import quote
 
 import discord
-from database.connection import run_aidb_query
 from discord import ui
 
+from core.db import run_aidb_query_async
+from core.tags import tag_filter_sql, tag_index
+from core.videos import (
+    ATTACHMENT_FILTER_SQL,
+    VideoShuffle,
+    video_filter_sql,
+    video_registry,
+)
+
 
 class MainMenuView(ui.View):
     """初期メニューのView
@@ -55,36 +63,19 @@ class MainMenuView(ui.View):
         # 現在のメッセージからボタンを削除
         await interaction.response.edit_message(view=None)
 
-        # ランダムに動画を選択
-        sql = """
-            SELECT m.id
-            FROM messages m
-            WHERE EXISTS (
-                SELECT 1 FROM attachments a
-                WHERE a.message_id = m.id
-                AND (
-                    a.filename LIKE '%%.mp4' OR a.filename LIKE '%%.mov' OR
-                    a.filename LIKE '%%.avi' OR a.filename LIKE '%%.webm' OR
-                    a.filename LIKE '%%.mkv' OR a.filename LIKE '%%.flv' OR
-                    a.filename LIKE '%%.wmv' OR a.filename LIKE '%%.m4v'
-                )
-            )
-            ORDER BY RAND()
-            LIMIT 1
-        """
-        result = run_aidb_query(sql, (), fetch="one")
+        # ランダムに動画を選択(このセッションの再生順を作る)
+        shuffle = VideoShuffle()
+        message_id = await shuffle.next_id()
 
-        if not result:
+        if message_id is None:
             await interaction.followup.send(
                 "動画が見つかりませんでした。",
                 ephemeral=True,
             )
             return
 
-        message_id = result[0]
-
         # ランダム再生Viewを表示
-        view = RandomPlayView(message_id)
+        view = RandomPlayView(message_id, shuffle)
         await view.show(interaction)
 
     @ui.button(label="タグ一覧", style=discord.ButtonStyle.primary, emoji="🏷️")
@@ -442,30 +433,10 @@ class EmojiSelectView(ui.View):
 
     async def fetch_tags(self):
         """利用可能なタグを取得"""
-        import json
-
-        # metaテーブルからすべてのtagを取得
-        sql = "SELECT tag FROM meta WHERE tag IS NOT NULL AND tag != ''"
-        results = run_aidb_query(sql, (), fetch="all")
+        await tag_index.ensure_loaded()
 
-        if not results:
-            self.tags = []
-            return
-
-        # JSON配列をパースしてタグを抽出
-        tag_set = set()
-        for row in results:
-            try:
-                tag_list = json.loads(row[0])
-                if isinstance(tag_list, list):
-                    for tag in tag_list:
-                        if isinstance(tag, str) and tag.strip():
-                            tag_set.add(tag.strip())
-            except (json.JSONDecodeError, TypeError):
-                continue
-
-        # タグをソートして格納（上位20個まで）
-        self.tags = sorted(list(tag_set))[:20]
+        # タグを名前順で格納（上位20個まで）
+        self.tags = [tag for tag, _ in tag_index.tags("name")[:20]]
 
     def _update_components(self):
         """タグセレクトの選択肢を更新"""
@@ -701,18 +672,18 @@ class RankingResultView(ui.View):
             where_conditions.append("m.timestamp >= %s")
             params.append(self.after_date)
 
-        # タグ絞り込み条件
+        # タグ絞り込み条件(タグインデックスのID集合で絞る)
         if self.selected_tag:
-            where_conditions.append("meta.tag LIKE %s")
-            params.append(f"%{self.selected_tag}%")
-
-        where_conditions.append(
-            "EXISTS (SELECT 1 FROM attachments a WHERE a.message_id = m.id AND ("
-            "a.filename LIKE '%%.mp4' OR a.filename LIKE '%%.mov' OR "
-            "a.filename LIKE '%%.avi' OR a.filename LIKE '%%.webm' OR "
-            "a.filename LIKE '%%.mkv' OR a.filename LIKE '%%.flv' OR "
-            "a.filename LIKE '%%.wmv' OR a.filename LIKE '%%.m4v'))",
-        )
+            await tag_index.ensure_loaded()
+            tagged = tag_index.message_ids(self.selected_tag)
+            if not tagged:
+                self.results = []
+                return
+            condition, tag_params = tag_filter_sql("m.id", tagged, [self.selected_tag])
+            where_conditions.append(condition)
+            params.extend(tag_params)
+
+        where_conditions.append(video_filter_sql())
 
         where_clause = " AND ".join(where_conditions)
         offset = (self.page - 1) * 5
@@ -725,7 +696,6 @@ class RankingResultView(ui.View):
                 SUM(r.count) as total_reaction_count
             FROM messages m
             JOIN reactions r ON m.id = r.message_id
-            LEFT JOIN meta ON m.id = meta.id
             WHERE {where_clause}
             GROUP BY m.id, m.channel_id, m.content
             ORDER BY total_reaction_count DESC
@@ -733,7 +703,7 @@ class RankingResultView(ui.View):
         """
         params.append(offset)
 
-        self.results = run_aidb_query(sql, tuple(params), fetch="all") or []
+        self.results = await run_aidb_query_async(sql, tuple(params), fetch="all") or []
 
     async def show(self, interaction: discord.Interaction, edit_message: bool = False):
         """ランキング結果を表示"""
@@ -901,14 +871,20 @@ class SearchResultView(ui.View):
             where_conditions.append("meta.title LIKE %s")
             params.append(f"%{self.search_conditions['title']}%")
 
-        # タグ検索
+        # タグ検索(いずれかのタグが付いたもの、タグインデックスのID集合で絞る)
         if self.search_conditions.get("tags"):
-            # タグはJSON配列なので各タグに対してLIKE検索
-            tag_conditions = []
+            await tag_index.ensure_loaded()
+            tagged = set()
             for tag in self.search_conditions["tags"]:
-                tag_conditions.append("meta.tag LIKE %s")
-                params.append(f"%{tag}%")
-            where_conditions.append(f"({' OR '.join(tag_conditions)})")
+                tagged |= tag_index.message_ids(tag)
+            if not tagged:
+                self.results = []
+                return
+            condition, tag_params = tag_filter_sql(
+                "m.id", tagged, self.search_conditions["tags"]
+            )
+            where_conditions.append(condition)
+            params.extend(tag_params)
 
         # 日付条件の追加
         if self.search_conditions.get("start_date"):
@@ -955,13 +931,7 @@ class SearchResultView(ui.View):
                 where_conditions.append(f"({' OR '.join(emoji_conditions_list)})")
 
         # 動画ファイルが添付されている
-        where_conditions.append(
-            "EXISTS (SELECT 1 FROM attachments a WHERE a.message_id = m.id AND ("
-            "a.filename LIKE '%%.mp4' OR a.filename LIKE '%%.mov' OR "
-            "a.filename LIKE '%%.avi' OR a.filename LIKE '%%.webm' OR "
-            "a.filename LIKE '%%.mkv' OR a.filename LIKE '%%.flv' OR "
-            "a.filename LIKE '%%.wmv' OR a.filename LIKE '%%.m4v'))",
-        )
+        where_conditions.append(video_filter_sql())
 
         # ソート方式
         if self.sort_by == "reaction":
@@ -1004,7 +974,7 @@ class SearchResultView(ui.View):
         """
         params.append(offset)
 
-        self.results = run_aidb_query(sql, tuple(params), fetch="all") or []
+        self.results = await run_aidb_query_async(sql, tuple(params), fetch="all") or []
 
     async def show(self, interaction: discord.Interaction, edit_message: bool = False):
         """検索結果を表示"""
@@ -1200,9 +1170,10 @@ class RandomPlayView(ui.View):
     1件のWatch URLと次へ・情報追加ボタン
     """
 
-    def __init__(self, message_id: int):
+    def __init__(self, message_id: int, shuffle: VideoShuffle | None = None):
         super().__init__(timeout=180)
         self.message_id = message_id
+        self.shuffle = shuffle or VideoShuffle()
 
     async def show(self, interaction: discord.Interaction, edit_message: bool = False):
         """ランダム動画を表示"""
@@ -1226,32 +1197,16 @@ class RandomPlayView(ui.View):
     @ui.button(label="次へ", style=discord.ButtonStyle.primary, emoji="▶️")
     async def next_random(self, interaction: discord.Interaction, button: ui.Button):
         """次のランダム動画を表示"""
-        sql = """
-            SELECT m.id
-            FROM messages m
-            WHERE EXISTS (
-                SELECT 1 FROM attachments a
-                WHERE a.message_id = m.id
-                AND (
-                    a.filename LIKE '%%.mp4' OR a.filename LIKE '%%.mov' OR
-                    a.filename LIKE '%%.avi' OR a.filename LIKE '%%.webm' OR
-                    a.filename LIKE '%%.mkv' OR a.filename LIKE '%%.flv' OR
-                    a.filename LIKE '%%.wmv' OR a.filename LIKE '%%.m4v'
-                )
-            )
-            ORDER BY RAND()
-            LIMIT 1
-        """
-        result = run_aidb_query(sql, (), fetch="one")
+        message_id = await self.shuffle.next_id()
 
-        if not result:
+        if message_id is None:
             await interaction.response.send_message(
                 "動画が見つかりませんでした。",
                 ephemeral=True,
             )
             return
 
-        self.message_id = result[0]
+        self.message_id = message_id
         await self.show(interaction, edit_message=True)
 
     @ui.button(label="情報を追加する", style=discord.ButtonStyle.success, emoji="✏️")
@@ -1260,6 +1215,7 @@ class RandomPlayView(ui.View):
         from .modals import InfoEditModal
 
         modal = InfoEditModal(self.message_id, None)
+        await modal.load_existing_info()
         await interaction.response.send_modal(modal)
 
 
@@ -1335,6 +1291,7 @@ class DetailView(ui.View):
         from .modals import InfoEditModal
 
         modal = InfoEditModal(self.message_id, self.previous_view_data)
+        await modal.load_existing_info()
         await interaction.response.send_modal(modal)
 
 
@@ -1351,43 +1308,12 @@ class TagListView(ui.View):
 
     async def fetch_tags(self):
         """タグを集計して取得"""
-        import json
-
-        # metaテーブルからすべてのtagを取得
-        sql = "SELECT tag FROM meta WHERE tag IS NOT NULL AND tag != ''"
-        results = run_aidb_query(sql, (), fetch="all")
+        await tag_index.ensure_loaded()
 
-        if not results:
-            self.tags = []
-            return
-
-        # タグをカウント
-        tag_count = {}
-        for row in results:
-            tag_json = row[0]
-            if not tag_json:
-                continue
-
-            try:
-                tags = json.loads(tag_json)
-                if isinstance(tags, list):
-                    for tag in tags:
-                        if tag and isinstance(tag, str):
-                            tag_count[tag] = tag_count.get(tag, 0) + 1
-            except Exception:
-                continue
-
-        # ソート
-        if self.sort_by == "count":
-            # 件数の多い順
-            sorted_tags = sorted(tag_count.items(), key=lambda x: x[1], reverse=True)
-        else:  # "name"
-            # 名前順
-            sorted_tags = sorted(tag_count.items(), key=lambda x: x[0])
-
-        # ページング
+        # ソート("count": 件数の多い順 / "name": 名前順)とページング
+        sort_by = "count" if self.sort_by == "count" else "name"
         offset = (self.page - 1) * 20
-        self.tags = sorted_tags[offset : offset + 20]
+        self.tags = tag_index.tags(sort_by)[offset : offset + 20]
 
     async def show(self, interaction: discord.Interaction, edit_message: bool = False):
         """タグ一覧を表示"""
@@ -1541,6 +1467,7 @@ class VideoByIdView(ui.View):
 
         # previous_view_dataをNoneにして、戻るボタンを表示しない
         modal = InfoEditModal(self.message_id, None)
+        await modal.load_existing_info()
         await interaction.response.send_modal(modal)
 
 
@@ -1586,26 +1513,41 @@ class MyPostsView(ui.View):
         """ユーザーの投稿を取得"""
         offset = (self.page - 1) * 5
 
-        sql = """
-            SELECT
-                m.id as message_id,
-                m.channel_id,
-                m.content,
-                COALESCE(SUM(r.count), 0) as reaction_count
-            FROM messages m
-            LEFT JOIN reactions r ON m.id = r.message_id
-            WHERE m.author_id = %s
-              AND EXISTS (SELECT 1 FROM attachments a WHERE a.message_id = m.id AND (
-                  a.filename LIKE '%%.mp4' OR a.filename LIKE '%%.mov' OR
-                  a.filename LIKE '%%.avi' OR a.filename LIKE '%%.webm' OR
-                  a.filename LIKE '%%.mkv' OR a.filename LIKE '%%.flv' OR
-                  a.filename LIKE '%%.wmv' OR a.filename LIKE '%%.m4v'))
-            GROUP BY m.id, m.channel_id, m.content
-            ORDER BY m.timestamp DESC
-            LIMIT 5 OFFSET %s
-        """
+        if video_registry.ready:
+            sql = """
+                SELECT
+                    m.id as message_id,
+                    m.channel_id,
+                    m.content,
+                    COALESCE(SUM(r.count), 0) as reaction_count
+                FROM video_messages v
+                JOIN messages m ON m.id = v.id
+                LEFT JOIN reactions r ON m.id = r.message_id
+                WHERE v.author_id = %s
+                GROUP BY m.id, m.channel_id, m.content, v.timestamp
+                ORDER BY v.timestamp DESC
+                LIMIT 5 OFFSET %s
+            """
+        else:
+            # 動画一覧の取り込みが終わるまでは添付ファイルを直接見る
+            sql = f"""
+                SELECT
+                    m.id as message_id,
+                    m.channel_id,
+                    m.content,
+                    COALESCE(SUM(r.count), 0) as reaction_count
+                FROM messages m
+                LEFT JOIN reactions r ON m.id = r.message_id
+                WHERE m.author_id = %s
+                  AND {ATTACHMENT_FILTER_SQL}
+                GROUP BY m.id, m.channel_id, m.content
+                ORDER BY m.timestamp DESC
+                LIMIT 5 OFFSET %s
+            """
 
-        self.results = run_aidb_query(sql, (self.user_id, offset), fetch="all") or []
+        self.results = (
+            await run_aidb_query_async(sql, (self.user_id, offset), fetch="all") or []
+        )
 
     async def show(self, interaction: discord.Interaction, edit_message: bool = False):
         """投稿一覧を表示"""
@@ -3,27 +3,21 @@
 /test ai - AI チャットコマンド
 """
 
-import os
-import tempfile
+import io
 from datetime import datetime, timedelta
 
 import aiohttp
 import discord
-import matplotlib
 from discord import app_commands
-
-matplotlib.use("Agg")
-import matplotlib.font_manager as fm
-import matplotlib.pyplot as plt
-from database.connection import run_db_query, run_statdb_query
-from PIL import Image, ImageDraw, ImageFont
-from pilmoji import Pilmoji
 from spam.protection import is_overload_allowed
 
 from config import debug
+from core.db import run_db_query_async, run_statdb_query_async
 from core.log import insert_command_log
 from core.zichi import enforce_zichi_block
-from utils.cache import get_reference_data_label
+from render.graphs import create_grinrank_image
+from render.pool import render_pool
+from utils.cache import get_reference_data_label_async
 
 
 async def setup_test_commands(tree: app_commands.CommandTree, client: discord.Client):
@@ -72,11 +66,11 @@ async def setup_test_commands(tree: app_commands.CommandTree, client: discord.Cl
             uid = int(getattr(user, "id", 0) or 0)
 
             # 参照データラベル取得
-            reference_label = get_reference_data_label()
+            reference_label = await get_reference_data_label_async()
 
             # データ取得
             data_start = time.time()
-            grinrank_data = get_grinrank_data(uid)
+            grinrank_data = await get_grinrank_data(uid)
             data_end = time.time()
             print(f"[Timer] データ取得完了: {data_end - data_start:.3f}秒")
 
@@ -98,13 +92,18 @@ async def setup_test_commands(tree: app_commands.CommandTree, client: discord.Cl
 
             # 画像生成
             image_start = time.time()
-            image_path = create_grinrank_image(grinrank_data, username, reference_label)
+            image_bytes = await render_pool.render(
+                create_grinrank_image,
+                data=grinrank_data,
+                username=username,
+                reference_label=reference_label,
+            )
             image_end = time.time()
             print(f"[Timer] 画像生成完了: {image_end - image_start:.3f}秒")
 
             # Discordに送信
             send_start = time.time()
-            file = discord.File(image_path, filename="grinrank.png")
+            file = discord.File(io.BytesIO(image_bytes), filename="grinrank.png")
 
             # 処理時間のサマリーを作成
             total_time = time.time() - start_time
@@ -152,12 +151,6 @@ async def setup_test_commands(tree: app_commands.CommandTree, client: discord.Cl
             print(f"[Timer] Discord送信完了: {send_duration:.3f}秒")
             print(f"[Timer] 総処理時間: {total_time:.3f}秒")
 
-            # 一時ファイル削除
-            try:
-                os.unlink(image_path)
-            except Exception:
-                pass
-
             insert_command_log(ctx, "/test grinrank", f"OK ({total_time:.2f}s)")
 
         except Exception as e:
@@ -292,7 +285,7 @@ async def setup_test_commands(tree: app_commands.CommandTree, client: discord.Cl
     tree.add_command(test_group)
 
 
-def get_grinrank_data(user_id: int) -> dict:
+async def get_grinrank_data(user_id: int) -> dict:
     """grinrankに必要な全データを取得（集計テーブル使用版）
 
     Args:
@@ -320,7 +313,7 @@ def get_grinrank_data(user_id: int) -> dict:
         FROM grin_user_stats
         WHERE user_id = %s
         """
-        user_row = run_statdb_query(sql_user, (user_id,), fetch="one")
+        user_row = await run_statdb_query_async(sql_user, (user_id,), fetch="one")
 
         if not user_row:
             # 集計テーブルにデータがない場合はNone
@@ -336,19 +329,21 @@ def get_grinrank_data(user_id: int) -> dict:
         FROM grin_user_stats
         WHERE total_grin_count > %s
         """
-        rank_row = run_statdb_query(sql_rank, (grincount,), fetch="one")
+        rank_row = await run_statdb_query_async(sql_rank, (grincount,), fetch="one")
         rank = int(rank_row[0]) if rank_row else 1
 
         # 総ユーザー数
         sql_total = "SELECT COUNT(*) FROM grin_user_stats"
-        total_row = run_statdb_query(sql_total, (), fetch="one")
+        total_row = await run_statdb_query_async(sql_total, (), fetch="one")
         total = int(total_row[0]) if total_row else 0
 
         # パーセント計算
         sql_percent = """
         SELECT COUNT(*) FROM grin_user_stats WHERE total_grin_count < %s
         """
-        percent_row = run_statdb_query(sql_percent, (grincount,), fetch="one")
+        percent_row = await run_statdb_query_async(
+            sql_percent, (grincount,), fetch="one"
+        )
         outrank = int(percent_row[0]) if percent_row else 0
         percent = int(outrank * 100 / total) if total > 0 else 0
 
@@ -381,7 +376,7 @@ def get_grinrank_data(user_id: int) -> dict:
             "FROM reactions r JOIN messages m ON r.message_id = m.id "
             "WHERE r.emoji_name = 'grin' AND m.author_id = %s"
         )
-        row_grin = run_statdb_query(sql_grin, (user_id,), fetch="one")
+        row_grin = await run_statdb_query_async(sql_grin, (user_id,), fetch="one")
         grin_messages = int(row_grin[0]) if row_grin and row_grin[0] is not None else 0
         timing_details["batting_query2"] = time.time() - query2_start
 
@@ -394,14 +389,14 @@ def get_grinrank_data(user_id: int) -> dict:
 
         # 3. 過去7日間のデータ取得
         daily_start = time.time()
-        daily_data = get_daily_grin_data(user_id)
+        daily_data = await get_daily_grin_data(user_id)
         data["daily_data"] = daily_data
         timing_details["daily_total"] = time.time() - daily_start
         print(f"[Timer] - 過去7日間データ取得: {timing_details['daily_total']:.3f}秒")
 
         # 4. 期間別ランキング
         period_start = time.time()
-        period_ranks = get_period_rankings(user_id)
+        period_ranks = await get_period_rankings(user_id)
         data["period_ranks"] = period_ranks
         timing_details["period_total"] = time.time() - period_start
         print(f"[Timer] - 期間別ランキング取得: {timing_details['period_total']:.3f}秒")
@@ -420,11 +415,11 @@ def get_grinrank_data(user_id: int) -> dict:
         return None
 
 
-def get_daily_grin_data(user_id: int) -> dict:
+async def get_daily_grin_data(user_id: int) -> dict:
     """過去7日間の日次grinデータを取得（集計テーブルgrin_daily_stats使用）"""
     try:
         # 参照データの最終日を取得
-        row = run_db_query(
+        row = await run_db_query_async(
             "SELECT dblastupdate FROM config WHERE id = 1 LIMIT 1",
             (),
             fetch="one",
@@ -453,7 +448,9 @@ def get_daily_grin_data(user_id: int) -> dict:
         ORDER BY date
         """
 
-        rows = run_statdb_query(sql, (user_id, start_date, end_date), fetch="all")
+        rows = await run_statdb_query_async(
+            sql, (user_id, start_date, end_date), fetch="all"
+        )
 
         # データを辞書に変換
         data_dict = {}
@@ -505,7 +502,7 @@ def get_daily_grin_data(user_id: int) -> dict:
         return {"dates": dates, "grin_counts": [0] * 7, "batting_avgs": [0.0] * 7}
 
 
-def get_period_rankings(user_id: int) -> dict:
+async def get_period_rankings(user_id: int) -> dict:
     """期間別ランキングを取得（日間/週間/月間）- 集計テーブルgrin_daily_stats使用
 
     Returns:
@@ -519,7 +516,7 @@ def get_period_rankings(user_id: int) -> dict:
     """
     try:
         # 参照データの最終日を取得
-        row = run_db_query(
+        row = await run_db_query_async(
             "SELECT dblastupdate FROM config WHERE id = 1 LIMIT 1",
             (),
             fetch="one",
@@ -555,7 +552,7 @@ def get_period_rankings(user_id: int) -> dict:
              )) as rank,
             COALESCE((SELECT grin_count FROM grin_daily_stats WHERE user_id = %s AND date = %s), 0) as count
         """
-        daily_row = run_statdb_query(
+        daily_row = await run_statdb_query_async(
             sql_daily,
             (daily_start, user_id, daily_start, user_id, daily_start),
             fetch="one",
@@ -579,7 +576,7 @@ def get_period_rankings(user_id: int) -> dict:
             COALESCE((SELECT SUM(grin_count) FROM grin_daily_stats
                       WHERE user_id = %s AND date >= %s AND date <= %s), 0) as count
         """
-        weekly_row = run_statdb_query(
+        weekly_row = await run_statdb_query_async(
             sql_weekly,
             (
                 weekly_start,
@@ -612,7 +609,7 @@ def get_period_rankings(user_id: int) -> dict:
             COALESCE((SELECT SUM(grin_count) FROM grin_daily_stats
                       WHERE user_id = %s AND date >= %s AND date <= %s), 0) as count
         """
-        monthly_row = run_statdb_query(
+        monthly_row = await run_statdb_query_async(
             sql_monthly,
             (
                 monthly_start,
@@ -646,341 +643,3 @@ def get_period_rankings(user_id: int) -> dict:
             "weekly": {"rank": 0, "count": 0},
             "monthly": {"rank": 0, "count": 0},
         }
-
-
-def create_grinrank_image(data: dict, username: str, reference_label: str) -> str:
-    """grinrankの画像を生成
-
-    Args:
-        data: get_grinrank_data()で取得したデータ
-        username: ユーザー名
-        reference_label: 参照データラベル
-
-    Returns:
-        str: 生成された画像ファイルのパス
-
-    """
-    try:
-        import time
-
-        func_start = time.time()
-
-        # フォントパスの設定
-        font_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fonts")
-        normal_font_path = os.path.join(font_dir, "UDShingoL.otf")
-        light_font_path = os.path.join(font_dir, "UDShingoL.otf")
-
-        # グラフを生成
-        graph_start = time.time()
-        graph_path = create_daily_graph(
-            data["daily_data"]["dates"],
-            data["daily_data"]["grin_counts"],
-            data["daily_data"]["batting_avgs"],
-        )
-        graph_end = time.time()
-        print(f"[Timer] - グラフ生成: {graph_end - graph_start:.3f}秒")
-
-        # 背景画像を読み込み
-        bg_load_start = time.time()
-        bg_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "bg",
-            "bg_grinrank.png",
-        )
-        bg = Image.open(bg_path).convert("RGBA")
-        bg_width, bg_height = bg.size
-        print(f"[Timer] - 背景画像読込: {time.time() - bg_load_start:.3f}秒")
-
-        # グラフ画像を読み込み
-        graph_load_start = time.time()
-        graph_img = Image.open(graph_path).convert("RGBA")
-        print(f"[Timer] - グラフ画像読込: {time.time() - graph_load_start:.3f}秒")
-
-        # グラフを背景に貼り付け（右上に配置）
-        paste_start = time.time()
-        graph_width, graph_height = graph_img.size
-        graph_x = bg_width - graph_width - 50  # 右端から50pxの余白
-        graph_y = 150  # 上から150pxの位置（より上に配置）
-        bg.paste(graph_img, (graph_x, graph_y), graph_img)
-        print(f"[Timer] - グラフ貼付: {time.time() - paste_start:.3f}秒")
-
-        # テキストを描画
-        _draw = ImageDraw.Draw(bg)
-
-        font_load_start = time.time()
-        try:
-            # フォント読み込み
-            font_title = ImageFont.truetype(normal_font_path, 36)  # 30 → 36 に拡大
-            font_72 = ImageFont.truetype(normal_font_path, 72)
-            font_60 = ImageFont.truetype(normal_font_path, 60)
-            font_48 = ImageFont.truetype(normal_font_path, 48)
-            font_24 = ImageFont.truetype(light_font_path, 24)  # 参照データ用に追加
-        except Exception:
-            # フォールバック
-            font_title = ImageFont.load_default()
-            font_72 = ImageFont.load_default()
-            font_60 = ImageFont.load_default()
-            font_48 = ImageFont.load_default()
-            font_24 = ImageFont.load_default()
-        print(f"[Timer] - フォント読込: {time.time() - font_load_start:.3f}秒")
-
-        # Pilmojiを使用してテキストを描画
-        text_start = time.time()
-        with Pilmoji(bg) as pilmoji:
-            # タイトル（上部中央）- サイズを36ptに拡大
-            title_text = f"{username}の:grin:ランキング"
-            pilmoji.text((50, 40), title_text, font=font_title, fill="white")
-
-            # コラム1（左上）- 順位・個数・パーセントのみ（ラベルは背景に含まれている）
-            # 25px左に移動（130 → 105）
-            col1_x = 80 + 50 - 25  # 105
-            col1_y_start = 120 + 15  # 135
-
-            # 順位（ラベルなし）
-            rank_text = f"{data['rank']}位"
-            pilmoji.text(
-                (col1_x, col1_y_start + 50),
-                rank_text,
-                font=font_72,
-                fill="white",
-            )
-
-            # 個数
-            count_text = f"{data['grincount']}個"
-            pilmoji.text(
-                (col1_x, col1_y_start + 140),
-                count_text,
-                font=font_60,
-                fill="white",
-            )
-
-            # パーセントのみ（"上位"は背景に含まれている）
-            # 左上を0として(180, 450)の位置に配置
-            percent_text = f"{data['percent']}%"
-            pilmoji.text((180, 450), percent_text, font=font_60, fill="white")
-
-            # コラム3（左下）- 期間別ランキング（ラベルなし、順位と個数のみ）
-            # 90px右に、12px下に移動
-            col3_x = 80 + 90  # 170
-            col3_y_start = bg_height - 220 + 12  # bg_height - 208
-
-            period_data = data["period_ranks"]
-            daily_text = (
-                f"{period_data['daily']['rank']}位/{period_data['daily']['count']}個"
-            )
-            weekly_text = (
-                f"{period_data['weekly']['rank']}位/{period_data['weekly']['count']}個"
-            )
-            monthly_text = f"{period_data['monthly']['rank']}位/{period_data['monthly']['count']}個"
-
-            pilmoji.text((col3_x, col3_y_start), daily_text, font=font_48, fill="white")
-            pilmoji.text(
-                (col3_x, col3_y_start + 60),
-                weekly_text,
-                font=font_48,
-                fill="white",
-            )
-            pilmoji.text(
-                (col3_x, col3_y_start + 120),
-                monthly_text,
-                font=font_48,
-                fill="white",
-            )
-
-            # コラム4（右中央）- パーセントのみ（"打率"は背景に含まれている）
-            # 30px左に移動（520 → 550）
-            # 右下を0とした時、文字の右上が(550, 140)の位置に
-            col4_x = bg_width - 550  # 730
-            col4_y = bg_height - 140
-
-            batting_text = f"{data['batting_avg']:.1f}%"
-            pilmoji.text(
-                (col4_x, col4_y),
-                batting_text,
-                font=font_72,
-                fill="white",
-                align="right",
-            )
-
-            # コラム5（右下）- 日付のみ（他は背景に含まれている）
-            # サイズを24ptに縮小し、右端に寄せる
-            col5_y_start = bg_height - 140
-
-            # 参照データから日付部分のみを抽出
-            clean_label = reference_label.replace("-# ", "").replace("-#", "")
-            # "参照データ:"を削除
-            if "参照データ:" in clean_label:
-                date_only = clean_label.replace("参照データ:", "")
-            else:
-                date_only = clean_label
-
-            # テキストの幅を計算して右端に配置
-            bbox = pilmoji.getsize(date_only, font=font_24)
-            text_width = bbox[0] if bbox else len(date_only) * 12
-            col5_x = bg_width - text_width - 30  # 右端から30pxの余白
-
-            pilmoji.text(
-                (col5_x, col5_y_start + 70),
-                date_only,
-                font=font_24,
-                fill="white",
-            )
-
-        print(f"[Timer] - テキスト描画: {time.time() - text_start:.3f}秒")
-
-        # 最終画像を保存
-        save_start = time.time()
-        final_temp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-        final_temp_path = final_temp.name
-        final_temp.close()
-        bg.save(final_temp_path, "PNG")
-        print(f"[Timer] - 画像保存: {time.time() - save_start:.3f}秒")
-
-        # グラフの一時ファイルを削除
-        try:
-            os.unlink(graph_path)
-        except Exception:
-            pass
-
-        total_image_time = time.time() - func_start
-        print(f"[Timer] - 画像生成関数合計: {total_image_time:.3f}秒")
-
-        return final_temp_path
-
-    except Exception:
-        # グラフの一時ファイルを削除
-        try:
-            os.unlink(graph_path)
-        except Exception:
-            pass
-
-        print(f"[Timer] - 画像生成関数合計: {time.time() - func_start:.3f}秒")
-        return final_temp_path
-
-    except Exception as e:
-        if debug:
-            print(f"create_grinrank_imageエラー: {e}")
-            import traceback
-
-            traceback.print_exc()
-        raise
-
-
-def create_daily_graph(dates: list, grin_counts: list, batting_avgs: list) -> str:
-    """過去7日間のグラフを生成
-
-    Args:
-        dates: 日付リスト
-        grin_counts: grin数リスト
-        batting_avgs: 打率リスト
-
-    Returns:
-        str: グラフ画像ファイルのパス
-
-    """
-    try:
-        # フォントパスの設定
-        font_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fonts")
-        font_path = os.path.join(font_dir, "UDShingoL.otf")
-
-        # 日付ラベル作成
-        date_labels = [f"{d.month}/{d.day}" for d in dates]
-
-        # グラフ作成
-        fig, ax1 = plt.subplots(figsize=(8, 4), facecolor="#2C2F33")
-        ax1.set_facecolor("#2C2F33")
-
-        # 棒グラフ（grin数）
-        x_positions = range(len(date_labels))
-        _bars = ax1.bar(
-            x_positions,
-            grin_counts,
-            color="#5865F2",
-            width=0.6,
-            label="Grin数",
-        )
-        ax1.set_xlabel("日付", color="white")
-        ax1.set_ylabel("Grin数", color="#5865F2")
-        ax1.tick_params(axis="y", labelcolor="#5865F2", colors="white")
-        ax1.tick_params(axis="x", colors="white")
-
-        # X軸ラベル設定
-        ax1.set_xticks(x_positions)
-        ax1.set_xticklabels(date_labels)
-
-        # 第2Y軸（打率）
-        ax2 = ax1.twinx()
-        _line = ax2.plot(
-            x_positions,
-            batting_avgs,
-            color="#ED4245",
-            marker="o",
-            linewidth=2,
-            label="打率",
-        )
-        ax2.set_ylabel("打率 (%)", color="#ED4245")
-        ax2.tick_params(axis="y", labelcolor="#ED4245", colors="white")
-        ax2.set_ylim(0, 100)
-
-        # フォント設定
-        try:
-            prop = fm.FontProperties(fname=font_path, size=10)
-            ax1.set_xlabel("日付", fontproperties=prop, color="white")
-            ax1.set_ylabel("Grin数", fontproperties=prop, color="#5865F2")
-            ax2.set_ylabel("打率 (%)", fontproperties=prop, color="#ED4245")
-            for label in ax1.get_xticklabels():
-                label.set_fontproperties(prop)
-        except Exception:
-            pass
-
-        # グリッド
-        ax1.grid(axis="y", alpha=0.2, color="white")
-
-        # 枠線設定
-        ax1.spines["top"].set_visible(False)
-        ax1.spines["bottom"].set_color("white")
-        ax1.spines["left"].set_color("#5865F2")
-        ax1.spines["right"].set_visible(False)
-        ax2.spines["top"].set_visible(False)
-        ax2.spines["bottom"].set_visible(False)
-        ax2.spines["left"].set_visible(False)
-        ax2.spines["right"].set_color("#ED4245")
-
-        # タイトル
-        try:
-            title_prop = fm.FontProperties(fname=font_path, size=12)
-            plt.title(
-                "過去7日間のGrinの数と打率の推移のグラフ",
-                fontproperties=title_prop,
-                color="white",
-                pad=10,
-            )
-        except Exception:
-            plt.title("過去7日間のGrinの数と打率の推移のグラフ", color="white", pad=10)
-
-        # レイアウト調整
-        plt.tight_layout()
-
-        # 一時ファイルに保存
-        graph_temp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-        graph_temp_path = graph_temp.name
-        graph_temp.close()
-        plt.savefig(
-            graph_temp_path,
-            dpi=100,
-            bbox_inches="tight",
-            facecolor="#2C2F33",
-            edgecolor="none",
-            transparent=False,
-        )
-        plt.close(fig)
-
-        return graph_temp_path
-
-    except Exception as e:
-        if debug:
-            print(f"create_daily_graphエラー: {e}")
-            import traceback
-
-            traceback.print_exc()
-        raise
@@ -16,11 +16,94 @@ DB_HOST = os.getenv("dbhost")
 DB_USER = os.getenv("dbuser")
 DB_PASSWORD = os.getenv("dbpassword")
 DB_NAME = os.getenv("dbname")
+DB_PORT = int(os.getenv("dbport") or 3306)
 
 STAT_DB_HOST = os.getenv("statdbhost")
 STAT_DB_USER = os.getenv("statdbuser")
 STAT_DB_PASSWORD = os.getenv("statdbpassword")
 STAT_DB_NAME = os.getenv("statdbname")
+STAT_DB_PORT = int(os.getenv("statdbport") or 3306)
+
+AI_DB_HOST = os.getenv("aidbhost") or DB_HOST
+AI_DB_USER = os.getenv("aidbuser") or DB_USER
+AI_DB_PASSWORD = os.getenv("aidbpassword") or DB_PASSWORD
+AI_DB_NAME = os.getenv("aidbname") or DB_NAME
+AI_DB_PORT = int(os.getenv("aidbport") or DB_PORT)
+
+REACTION_DB_HOST = os.getenv("reactiondbhost")
+REACTION_DB_USER = os.getenv("reactiondbuser")
+REACTION_DB_PASSWORD = os.getenv("reactiondbpassword")
+REACTION_DB_NAME = os.getenv("reactiondbname")
+REACTION_DB_PORT = int(os.getenv("reactiondbport") or 3306)
+
+# コネクションプール設定 (最小数, 最大数)
+DB_POOL_SIZES = {
+    "main": (1, int(os.getenv("DB_POOL_MAX_MAIN") or 4)),
+    "stat": (1, int(os.getenv("DB_POOL_MAX_STAT") or 6)),
+    "ai": (1, int(os.getenv("DB_POOL_MAX_AI") or 4)),
+    "reaction": (0, int(os.getenv("DB_POOL_MAX_REACTION") or 2)),
+}
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT") or 10)
+DB_POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL") or 60)
+
+# ログ書き込みのバッチ設定
+LOG_FLUSH_BATCH = 200
+LOG_FLUSH_INTERVAL = 2.0
+LOG_QUEUE_MAX = 10000
+LOG_MAX_RETRIES = 3
+
+# 自治インデックスの更新確認間隔(秒)
+ZICHI_REFRESH_INTERVAL = 30
+
+# サーバー設定キャッシュの有効期間(秒)
+GUILD_SETTINGS_TTL = 300
+
+# ブラックリストの更新確認間隔(秒)とBloomフィルタの使用有無
+BLACKLIST_REFRESH_INTERVAL = 30
+BLACKLIST_USE_BLOOM = os.getenv("BLACKLIST_USE_BLOOM", "").lower() in ("1", "true")
+
+# 専科メンバー判定のキャッシュ期間(秒)・保持件数とAPI呼び出しの流量
+SENKA_MEMBER_TTL = 3600
+SENKA_NONMEMBER_TTL = 300
+SENKA_VERDICT_CACHE_SIZE = 10000
+SENKA_RATE_PER_SEC = 5.0
+SENKA_RATE_BURST = 10
+
+# 参加レイド検知: RAID_WINDOW秒以内にRAID_JOIN_THRESHOLD人でレイドモード
+RAID_JOIN_THRESHOLD = 8
+RAID_WINDOW = 10.0
+RAID_BATCH_INTERVAL = 3.0
+RAID_CONCURRENCY = 5
+
+# ランキングキャッシュのデータ世代(dblastupdate)の確認間隔(秒)
+DATA_VERSION_CHECK_INTERVAL = 60
+
+# ランキングキャッシュの事前作成: DB集計の同時実行数と、結果を報告する管理者
+PREWARM_CONCURRENCY = 2
+ADMIN_USER_ID = 668479297551466516
+
+# メモリに置いておくランキング表の合計サイズの上限(バイト)
+RANK_TABLE_CACHE_BYTES = int(os.getenv("RANK_TABLE_CACHE_BYTES") or 64 * 1024 * 1024)
+
+# 動画メッセージ一覧(AI DB の video_messages)の差分取り込み間隔(秒)
+VIDEO_REGISTRY_REFRESH_INTERVAL = 60
+
+# 動画タグのインデックスの更新確認間隔(秒)
+TAG_INDEX_REFRESH_INTERVAL = 300
+
+# タグ絞り込みを IN (...) にするIDの上限(超えたら video_tags 表と突き合わせる)
+TAG_IN_LIMIT = 1000
+
+# 画像生成プロセスプール: ワーカー数、待ちを含めた同時受付数、1件あたりの制限時間(秒)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS") or 2)
+RENDER_QUEUE_MAX = 16
+RENDER_TIMEOUT = 30.0
+
+# 描画ワーカーが持っておく背景・透かし画像の合計サイズの上限(バイト)と、フォントの保持数
+RENDER_ASSET_CACHE_BYTES = int(
+    os.getenv("RENDER_ASSET_CACHE_BYTES") or 64 * 1024 * 1024
+)
+RENDER_FONT_CACHE_SIZE = 64
 
 debug = True
 
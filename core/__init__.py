@@ -3,21 +3,121 @@
 ログ記録、自治機能など
 """
 
+from .db import (
+    run_db_query_async,
+    run_statdb_query_async,
+    run_aidb_query_async,
+    run_testdb_query_async,
+)
+
+from .airank import (
+    AiRankWindow,
+    get_airank_window,
+)
+
+from .blacklist import (
+    BlacklistFilter,
+    blacklist_filter,
+)
+
+from .giverank import (
+    GiveTables,
+    get_give_tables,
+)
+
+from .guild_settings import (
+    GuildSettings,
+    guild_settings,
+)
+
 from .log import (
     insert_log,
     insert_command_log,
 )
 
+from .prewarm import (
+    CachePrewarmer,
+    cache_prewarmer,
+)
+
+from .raid import (
+    RaidDetector,
+    raid_detector,
+)
+
+from .senka import (
+    SenkaVerifier,
+    senka_verifier,
+)
+
+from .tags import (
+    TagIndex,
+    tag_index,
+)
+
+from .topmessages import (
+    TopMessage,
+    get_top_message,
+)
+
+from .userstats import (
+    UserStats,
+    get_user_stats,
+)
+
+from .videos import (
+    VideoRegistry,
+    VideoShuffle,
+    video_registry,
+    video_filter_sql,
+    is_video_message,
+)
+
 from .zichi import (
     get_active_zichi,
+    get_active_zichi_async,
     enforce_zichi_block,
     insert_zichi_request,
+    set_zichi_valid,
+    zichi_index,
 )
 
 __all__ = [
+    "run_db_query_async",
+    "run_statdb_query_async",
+    "run_aidb_query_async",
+    "run_testdb_query_async",
+    "AiRankWindow",
+    "get_airank_window",
+    "BlacklistFilter",
+    "blacklist_filter",
+    "GiveTables",
+    "get_give_tables",
+    "GuildSettings",
+    "guild_settings",
     "insert_log",
     "insert_command_log",
+    "CachePrewarmer",
+    "cache_prewarmer",
+    "RaidDetector",
+    "raid_detector",
+    "SenkaVerifier",
+    "senka_verifier",
+    "TagIndex",
+    "tag_index",
+    "TopMessage",
+    "get_top_message",
+    "UserStats",
+    "get_user_stats",
+    "VideoRegistry",
+    "VideoShuffle",
+    "video_registry",
+    "video_filter_sql",
+    "is_video_message",
     "get_active_zichi",
+    "get_active_zichi_async",
     "enforce_zichi_block",
     "insert_zichi_request",
+    "set_zichi_valid",
+    "zichi_index",
 ]
@@ -0,0 +1,193 @@
+"""
+AI部門ランキング
+/airank の (絵文字, 期間) ごとの並び順を1回だけ集計し、ページはその切り出しで返す
+"""
+
+import asyncio
+import os
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple
+
+from utils.cache import cache_registry, load_binary_cache, save_binary_cache, shard_path
+
+from .db import run_aidb_query_async
+from .videos import video_filter_sql
+
+AIRANK_DIR = "airank"
+
+# メモリに置いておく集計結果の数
+AIRANK_MEMO_SIZE = 128
+
+# cache/airank/ に残しておく集計結果のファイル数と、作り直されないまま残しておく秒数
+# (使われている条件はデータ世代が変わるたびに作り直されるので、古いファイルは使われていない)
+AIRANK_FILE_LIMIT = 512
+AIRANK_FILE_MAX_AGE = 7 * 24 * 3600
+
+
+class AiRankKey(NamedTuple):
+    """集計条件"""
+
+    base_name: str
+    tone_variants: tuple[str, ...]
+    before: datetime | None
+    after: datetime | None
+
+    @property
+    def name(self) -> str:
+        before = self.before.strftime("%Y%m%d") if self.before else ""
+        after = self.after.strftime("%Y%m%d") if self.after else ""
+        return f"{self.base_name}|{after}|{before}"
+
+
+class AiRankWindow:
+    """
+    1つの集計条件についての、リアクション数順のメッセージIDと件数の列
+
+    過去の期間でもリアクション数は後から増えるので、データ世代が変わったら作り直す。
+    """
+
+    __slots__ = ("_counts", "_ids", "version")
+
+    def __init__(self, ids, counts, version: str | None):
+        self._ids = ids
+        self._counts = counts
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def page(self, page: int, size: int = 5) -> list[tuple[int, int]]:
+        """
+        指定ページの (message_id, リアクション数) を返す
+
+        Args:
+            page (int): ページ番号(1始まり)
+            size (int): 1ページの件数
+
+        Returns:
+            list[tuple[int, int]]: 該当ページの行(範囲外なら空)
+        """
+        start = (max(page, 1) - 1) * size
+        end = min(start + size, len(self._ids))
+        return [(self._ids[i], self._counts[i]) for i in range(start, end)]
+
+
+# 条件名 -> (更新時刻, AiRankWindow)
+_WINDOWS: OrderedDict[str, tuple[float, AiRankWindow]] = OrderedDict()
+
+
+def _load_window(key: AiRankKey) -> AiRankWindow | None:
+    path = shard_path(AIRANK_DIR, key.name)
+    try:
+        mtime = os.path.getmtime(f"cache/{path}")
+    except OSError:
+        return None
+    memo = _WINDOWS.get(key.name)
+    if memo is not None and memo[0] == mtime:
+        _WINDOWS.move_to_end(key.name)
+        return memo[1]
+
+    loaded = load_binary_cache(path)
+    if loaded is None:
+        return None
+    meta, columns = loaded
+    window = AiRankWindow(columns["ids"], columns["counts"], meta.get("dblastupdate"))
+    _WINDOWS[key.name] = (mtime, window)
+    while len(_WINDOWS) > AIRANK_MEMO_SIZE:
+        _WINDOWS.popitem(last=False)
+    return window
+
+
+def _prune_files() -> int:
+    # 期間の指定は自由なので、古いものと多すぎる分を作成の古い順に消す
+    try:
+        entries = []
+        for entry in os.scandir(f"cache/{AIRANK_DIR}"):
+            if entry.name.endswith(".bin"):
+                entries.append((entry.stat().st_mtime, entry.path))
+    except OSError:
+        return 0
+    entries.sort()
+    expired = time.time() - AIRANK_FILE_MAX_AGE
+    excess = len(entries) - AIRANK_FILE_LIMIT
+    removed = 0
+    for i, (mtime, path) in enumerate(entries):
+        if i >= excess and mtime >= expired:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _airank_sql(key: AiRankKey) -> tuple[str, tuple]:
+    placeholders = ", ".join(["%s"] * len(key.tone_variants))
+    params = list(key.tone_variants)
+    where_conditions = [f"r.emoji_name IN ({placeholders})"]
+
+    # before条件（before日付を含まない: < before）
+    if key.before:
+        where_conditions.append("m.timestamp < %s")
+        params.append(key.before)
+
+    # after条件（after日付を含まない: > after）
+    if key.after:
+        where_conditions.append("m.timestamp > %s")
+        params.append(key.after)
+
+    where_conditions.append(video_filter_sql())
+    sql = (
+        "SELECT m.id as message_id, SUM(r.count) as total_reaction_count "
+        "FROM messages m "
+        "JOIN reactions r ON m.id = r.message_id "
+        f"WHERE {' AND '.join(where_conditions)} "
+        "GROUP BY m.id "
+        "ORDER BY total_reaction_count DESC, m.id"
+    )
+    return sql, tuple(params)
+
+
+def airank_spec(key: AiRankKey):
+    """集計結果のキャッシュ (キー, 読み込み関数, 作成関数)"""
+
+    async def build(version: str | None) -> AiRankWindow:
+        sql, params = _airank_sql(key)
+        rows = await run_aidb_query_async(sql, params, fetch="all") or []
+        ids = array("q", (int(r[0]) for r in rows))
+        counts = array("q", (int(r[1] or 0) for r in rows))
+        meta = {"dblastupdate": version}
+        save_binary_cache(
+            shard_path(AIRANK_DIR, key.name), {"ids": ids, "counts": counts}, meta
+        )
+        await asyncio.to_thread(_prune_files)
+        window = _load_window(key)
+        return window if window is not None else AiRankWindow(ids, counts, version)
+
+    return f"airank:{key.name}", lambda: _load_window(key), build
+
+
+async def get_airank_window(
+    base_name: str,
+    tone_variants: list[str],
+    before: datetime | None = None,
+    after: datetime | None = None,
+) -> AiRankWindow:
+    """
+    AI部門ランキングの集計結果を取得する
+
+    Args:
+        base_name (str): 正規化した絵文字名
+        tone_variants (list[str]): 集計対象の絵文字名(肌色違いを含む)
+        before (datetime | None): この日時より前
+        after (datetime | None): この日時より後
+
+    Returns:
+        AiRankWindow: リアクション数順の集計結果
+    """
+    key = AiRankKey(base_name, tuple(tone_variants), before, after)
+    return await cache_registry.get(*airank_spec(key))
@@ -0,0 +1,215 @@
+"""
+ブラックリスト判定
+blacklistテーブルをメモリに読み込み、参加時の判定をDBなしで行う
+"""
+
+import asyncio
+import math
+import time
+
+from config import BLACKLIST_REFRESH_INTERVAL, BLACKLIST_USE_BLOOM, debug
+
+from .db import run_pooled_query
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix64(x: int) -> int:
+    """splitmix64 の最終混合"""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+class BloomFilter:
+    """
+    整数ID用のBloomフィルタ
+    偽陽性はあるが偽陰性はない
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1024, capacity)
+        # m = -n ln p / (ln 2)^2, k = (m / n) ln 2
+        bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self._bits = bits
+        self._array = bytearray((bits + 7) // 8)
+        self._hashes = max(1, round(bits / capacity * math.log(2)))
+
+    def _positions(self, value: int):
+        h = _mix64(value & _MASK64)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        for i in range(self._hashes):
+            yield (h1 + i * h2) % self._bits
+
+    def add(self, value: int) -> None:
+        for pos in self._positions(value):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value: int) -> bool:
+        return all(
+            self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value)
+        )
+
+    def nbytes(self) -> int:
+        return len(self._array)
+
+
+class BlacklistFilter:
+    """
+    blacklistテーブルのメモリ上のコピー
+
+    通常は整数のsetで完全一致判定する。
+    BLACKLIST_USE_BLOOM が有効な場合はBloomフィルタのみを保持し、
+    「含まれるかもしれない」ときだけDBで確認させる。
+    更新は (件数, 最大ID) をウォーターマークとして、最大IDより大きい行だけを
+    追加で読み込み、件数が合わなくなった場合のみ全件を読み直す。
+    """
+
+    def __init__(
+        self,
+        interval: float = BLACKLIST_REFRESH_INTERVAL,
+        use_bloom: bool = BLACKLIST_USE_BLOOM,
+    ):
+        self.interval = interval
+        self.use_bloom = use_bloom
+
+        self._ids: set[int] = set()
+        self._bloom: BloomFilter | None = None
+        self._count = 0
+        self._max_id = 0
+        self._loaded = False
+        self._lock: asyncio.Lock | None = None
+        self._task: asyncio.Task | None = None
+
+        self.hits = 0
+        self.negatives = 0
+        self.fallbacks = 0
+        self.full_reloads = 0
+        self.incremental_rows = 0
+
+    def contains(self, user_id: int) -> bool | None:
+        """
+        ブラックリストに含まれるか判定する
+
+        Args:
+            user_id (int): ユーザーID
+
+        Returns:
+            bool | None: 含まれる場合 True、含まれない場合 False、
+                メモリ上で判定できない場合(未読込/Bloomで陽性) None
+        """
+        if not self._loaded:
+            self.fallbacks += 1
+            return None
+
+        user_id = int(user_id)
+        if self._bloom is not None:
+            if user_id in self._bloom:
+                self.fallbacks += 1
+                return None
+            self.negatives += 1
+            return False
+
+        if user_id in self._ids:
+            self.hits += 1
+            return True
+        self.negatives += 1
+        return False
+
+    def _add(self, user_id: int) -> None:
+        if self._bloom is not None:
+            self._bloom.add(user_id)
+        else:
+            self._ids.add(user_id)
+
+    async def _full_reload(self, count: int) -> None:
+        rows = await run_pooled_query(
+            "main", "SELECT id FROM blacklist", (), fetch="all"
+        )
+        ids = [int(r[0]) for r in rows or [] if r[0] is not None]
+        if self.use_bloom:
+            bloom = BloomFilter(int(max(count, len(ids)) * 1.5))
+            for user_id in ids:
+                bloom.add(user_id)
+            self._bloom = bloom
+            self._ids = set()
+        else:
+            self._bloom = None
+            self._ids = set(ids)
+        self._count = len(ids)
+        self._max_id = max(ids, default=0)
+        self.full_reloads += 1
+
+    async def refresh(self, force: bool = False) -> None:
+        """
+        ウォーターマークを確認して差分または全件を読み込む
+
+        Args:
+            force (bool): Trueの場合は全件を読み直す
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            start = time.perf_counter()
+            row = await run_pooled_query(
+                "main",
+                "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM blacklist",
+                (),
+                fetch="one",
+            )
+            count, max_id = (int(row[0] or 0), int(row[1] or 0)) if row else (0, 0)
+
+            if force or not self._loaded:
+                await self._full_reload(count)
+            elif (count, max_id) != (self._count, self._max_id):
+                rows = await run_pooled_query(
+                    "main",
+                    "SELECT id FROM blacklist WHERE id > %s",
+                    (self._max_id,),
+                    fetch="all",
+                )
+                new_ids = [int(r[0]) for r in rows or [] if r[0] is not None]
+                for user_id in new_ids:
+                    self._add(user_id)
+                self._count += len(new_ids)
+                self._max_id = max([self._max_id, *new_ids])
+                self.incremental_rows += len(new_ids)
+                # 最大ID以下の追加や削除があった場合は差分では追えない
+                if self._count != count:
+                    await self._full_reload(count)
+
+            self._loaded = True
+            if debug:
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"ブラックリスト更新: {self._count}件 {elapsed:.1f}ms")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                if debug:
+                    print(f"ブラックリスト更新エラー: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """定期更新タスクを開始する(起動済みなら何もしない)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "entries": self._count,
+            "bloom_bytes": self._bloom.nbytes() if self._bloom else 0,
+            "hits": self.hits,
+            "negatives": self.negatives,
+            "fallbacks": self.fallbacks,
+            "full_reloads": self.full_reloads,
+            "incremental_rows": self.incremental_rows,
+        }
+
+
+blacklist_filter = BlacklistFilter()
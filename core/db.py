@@ -0,0 +1,361 @@
+"""
+非同期DBアクセス
+データベースごとのコネクションプールと、イベントループを止めないクエリ関数
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+import MySQLdb
+
+import config
+from config import debug
+
+
+class PoolTimeoutError(Exception):
+    """プールからコネクションを取得できなかった場合の例外"""
+
+
+class ConnectionPool:
+    """
+    MySQLコネクションプール(スレッドセーフ)
+
+    最小数のコネクションを保持し、最大数を超えては接続しない。
+    一定時間使われていないコネクションは取り出し時に ping で生存確認する。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connect_kwargs: dict,
+        minsize: int,
+        maxsize: int,
+        timeout: float,
+        ping_interval: float,
+    ):
+        self.name = name
+        self._connect_kwargs = connect_kwargs
+        self.minsize = max(0, minsize)
+        self.maxsize = max(1, maxsize, self.minsize)
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        self._idle: deque = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        return MySQLdb.connect(**self._connect_kwargs)
+
+    def warm(self) -> None:
+        """最小数までコネクションを確立しておく"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.minsize:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def acquire(self):
+        """
+        コネクションを取り出す
+
+        Returns:
+            MySQLdb.Connection: 利用可能なコネクション
+
+        Raises:
+            PoolTimeoutError: timeout秒以内に取得できなかった場合
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeoutError(f"{self.name}プールは終了しています")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.maxsize:
+                        self._size += 1
+                        conn, last_used = None, 0.0
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"{self.name}プールの空き待ちがタイムアウトしました"
+                        )
+                    self._cond.wait(remaining)
+
+            try:
+                if conn is None:
+                    return self._connect()
+                if time.monotonic() - last_used >= self.ping_interval:
+                    conn.ping()
+                return conn
+            except Exception as e:
+                if debug:
+                    print(f"{self.name}プール: コネクション破棄: {e}")
+                self._discard(conn)
+                if conn is None or time.monotonic() >= deadline:
+                    raise
+
+    def release(self, conn, broken: bool = False) -> None:
+        """
+        コネクションをプールに返却する
+
+        Args:
+            conn: 返却するコネクション
+            broken (bool): Trueの場合は再利用せずに閉じる
+        """
+        if broken or self._closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn) -> None:
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def close(self) -> None:
+        """保持しているコネクションをすべて閉じる"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        """プールの利用状況を返す"""
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max": self.maxsize,
+            }
+
+    def execute(
+        self,
+        sql: str,
+        params: tuple | None = None,
+        fetch: str | None = None,
+        commit: bool = False,
+        many: bool = False,
+    ):
+        """
+        プールのコネクションでクエリを実行する(同期)
+
+        Args:
+            sql (str): SQL文
+            params: パラメータ
+            fetch (str | None): "one" / "all" / None
+            commit (bool): 実行後にコミットするか
+            many (bool): Trueの場合は executemany で実行する
+
+        Returns:
+            fetch="one" なら1行、"all" なら全行、それ以外は影響行数
+        """
+        conn = self.acquire()
+        broken = False
+        try:
+            cur = conn.cursor()
+            try:
+                if many:
+                    cur.executemany(sql, params or [])
+                else:
+                    cur.execute(sql, params or ())
+                if fetch == "one":
+                    result = cur.fetchone()
+                elif fetch == "all":
+                    result = cur.fetchall()
+                else:
+                    result = cur.rowcount
+                if commit:
+                    conn.commit()
+                else:
+                    conn.rollback()
+                return result
+            finally:
+                cur.close()
+        except MySQLdb.OperationalError:
+            broken = True
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+
+_POOLS: dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _connect_kwargs(db: str) -> dict:
+    if db == "main":
+        host, port, user, password, name = (
+            config.DB_HOST,
+            config.DB_PORT,
+            config.DB_USER,
+            config.DB_PASSWORD,
+            config.DB_NAME,
+        )
+    elif db == "stat":
+        host, port, user, password, name = (
+            config.STAT_DB_HOST,
+            config.STAT_DB_PORT,
+            config.STAT_DB_USER,
+            config.STAT_DB_PASSWORD,
+            config.STAT_DB_NAME,
+        )
+    elif db == "ai":
+        host, port, user, password, name = (
+            config.AI_DB_HOST,
+            config.AI_DB_PORT,
+            config.AI_DB_USER,
+            config.AI_DB_PASSWORD,
+            config.AI_DB_NAME,
+        )
+    elif db == "reaction":
+        host, port, user, password, name = (
+            config.REACTION_DB_HOST,
+            config.REACTION_DB_PORT,
+            config.REACTION_DB_USER,
+            config.REACTION_DB_PASSWORD,
+            config.REACTION_DB_NAME,
+        )
+    else:
+        raise ValueError(f"未知のデータベース: {db}")
+
+    return {
+        "host": host or "localhost",
+        "port": port,
+        "user": user or "",
+        "passwd": password or "",
+        "db": name or "",
+        "charset": "utf8mb4",
+        "connect_timeout": int(config.DB_POOL_TIMEOUT),
+    }
+
+
+def get_pool(db: str) -> ConnectionPool:
+    """
+    データベース名に対応するプールを取得(なければ作成)
+
+    Args:
+        db (str): "main" / "stat" / "ai" / "reaction"
+
+    Returns:
+        ConnectionPool: 対応するプール
+    """
+    pool = _POOLS.get(db)
+    if pool is not None:
+        return pool
+    with _POOLS_LOCK:
+        pool = _POOLS.get(db)
+        if pool is None:
+            minsize, maxsize = config.DB_POOL_SIZES.get(db, (1, 4))
+            pool = ConnectionPool(
+                db,
+                _connect_kwargs(db),
+                minsize,
+                maxsize,
+                config.DB_POOL_TIMEOUT,
+                config.DB_POOL_PING_INTERVAL,
+            )
+            _POOLS[db] = pool
+        return pool
+
+
+async def run_pooled_query(
+    db: str,
+    sql: str,
+    params: tuple | None = None,
+    fetch: str | None = None,
+    commit: bool = False,
+    many: bool = False,
+):
+    """
+    指定DBのプールでクエリをワーカースレッド上で実行する
+
+    Args:
+        db (str): "main" / "stat" / "ai" / "reaction"
+        sql (str): SQL文
+        params: パラメータ
+        fetch (str | None): "one" / "all" / None
+        commit (bool): 実行後にコミットするか
+        many (bool): Trueの場合は executemany で実行する
+
+    Returns:
+        クエリ結果(ConnectionPool.execute と同じ)
+    """
+    pool = get_pool(db)
+    return await asyncio.to_thread(pool.execute, sql, params, fetch, commit, many)
+
+
+async def run_db_query_async(sql: str, params=None, fetch=None, commit=False):
+    """メインDBに対する run_db_query の非同期版"""
+    return await run_pooled_query("main", sql, params, fetch, commit)
+
+
+async def run_statdb_query_async(sql: str, params=None, fetch=None, commit=False):
+    """統計DBに対する run_statdb_query の非同期版"""
+    return await run_pooled_query("stat", sql, params, fetch, commit)
+
+
+async def run_aidb_query_async(sql: str, params=None, fetch=None, commit=False):
+    """AI DBに対する run_aidb_query の非同期版"""
+    return await run_pooled_query("ai", sql, params, fetch, commit)
+
+
+async def run_testdb_query_async(sql: str, params=None, fetch=None, commit=False):
+    """リアクションDBに対する run_testdb_query の非同期版"""
+    return await run_pooled_query("reaction", sql, params, fetch, commit)
+
+
+async def warm_db_pools() -> None:
+    """全プールを最小コネクション数まで確立する"""
+    for db in config.DB_POOL_SIZES:
+        try:
+            await asyncio.to_thread(get_pool(db).warm)
+        except Exception as e:
+            if debug:
+                print(f"{db}プールの初期接続に失敗: {e}")
+
+
+def close_db_pools() -> None:
+    """全プールのコネクションを閉じる"""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,148 @@
+"""
+あげたリアクションのランキング
+絵文字ごとに「あげた数」と「あげた数/もらった数」のランキング表をまとめて作る
+"""
+
+import asyncio
+from typing import NamedTuple
+
+from utils.cache import cache_registry, list_shards, shard_path
+from utils.emoji import normalize_emoji_and_variants
+from utils.rank import RankTable, load_rank_table, save_rank_table
+
+from .db import run_testdb_query_async
+from .rankings import grin_spec, reaction_spec, table_at
+
+# 保存先(cache/ 以下、1絵文字1ファイル)
+GIVE_REACTION_DIR = "give_reaction"
+GIVE_RATIO_DIR = "give_ratio"
+
+GIVE_SQL = (
+    "SELECT user_id, COUNT(*) as give_count "
+    "FROM reaction WHERE emoji_code = %s "
+    "GROUP BY user_id ORDER BY give_count DESC"
+)
+
+# あげた/もらった比は整数のランキング表に入れるため1000倍して持つ
+RATIO_SCALE = 1000
+
+
+class GiveTables(NamedTuple):
+    """1つの絵文字についての、あげた側のランキング表"""
+
+    give: RankTable
+    ratio: RankTable
+
+    @property
+    def version(self) -> str | None:
+        """作成時の dblastupdate(2つの表の世代が食い違う場合は None)"""
+        if self.give.version != self.ratio.version:
+            return None
+        return self.give.version
+
+    def ratio_of(self, uid: int) -> float | None:
+        """あげた数/もらった数(もらっていない場合は None)"""
+        count = self.ratio.count(uid)
+        return None if count is None else count / RATIO_SCALE
+
+
+def _received_spec(base_name: str, tone_variants: list[str]):
+    # :grin: は受け取り側の表が別にあるのでそれを使う
+    if base_name == "grin":
+        return grin_spec()
+    return reaction_spec(base_name, tone_variants)
+
+
+def _ratio_rows(give: RankTable, received: RankTable) -> list[tuple[int, int]]:
+    rows = []
+    for uid, count in give.items():
+        got = received.count(uid)
+        if got:
+            rows.append((uid, count * RATIO_SCALE // got))
+    return rows
+
+
+def _save_tables(base_name: str, rows, received: RankTable, version) -> GiveTables:
+    give = save_rank_table(shard_path(GIVE_REACTION_DIR, base_name), rows, version)
+    ratio = save_rank_table(
+        shard_path(GIVE_RATIO_DIR, base_name), _ratio_rows(give, received), version
+    )
+    return GiveTables(give, ratio)
+
+
+def give_spec(base_name: str, tone_variants: list[str]):
+    """
+    あげた側のランキング表のキャッシュ (キー, 読み込み関数, 作成関数)
+
+    あげた数は reaction DB から1回の集計で作り、比は同じ世代の受け取り側の表と突き合わせる。
+    """
+    give_path = shard_path(GIVE_REACTION_DIR, base_name)
+    ratio_path = shard_path(GIVE_RATIO_DIR, base_name)
+
+    def load() -> GiveTables | None:
+        give = load_rank_table(give_path)
+        if give is None:
+            return None
+        ratio = load_rank_table(ratio_path)
+        if ratio is None:
+            ratio = RankTable.from_rows([], give.version)
+        return GiveTables(give, ratio)
+
+    async def build(version: str | None) -> GiveTables:
+        rows = await run_testdb_query_async(GIVE_SQL, (base_name,), fetch="all") or []
+        received = await table_at(_received_spec(base_name, tone_variants), version)
+        # 表の作成と比の計算は行数に比例するのでスレッドで行う
+        return await asyncio.to_thread(_save_tables, base_name, rows, received, version)
+
+    return f"give:{base_name}", load, build
+
+
+def give_specs() -> list:
+    """
+    事前作成の対象になる、あげた側のランキング表の一覧
+    :grin: と、これまでに作成されたことのある絵文字を対象にする
+    """
+    specs = [give_spec("grin", ["grin"])]
+    for base_name in list_shards(GIVE_REACTION_DIR):
+        if base_name == "grin":
+            continue
+        _, tone_variants = normalize_emoji_and_variants(base_name)
+        specs.append(give_spec(base_name, tone_variants or [base_name]))
+    return specs
+
+
+async def give_tables_at(
+    base_name: str, tone_variants: list[str], version: str | None
+) -> GiveTables:
+    """
+    指定の世代のあげた側のランキング表を取得する(古ければ作り直しを待つ)
+
+    Args:
+        base_name (str): 正規化した絵文字名
+        tone_variants (list[str]): 受け取り側の集計対象の絵文字名
+        version (str | None): dblastupdate
+
+    Returns:
+        GiveTables: ランキング表
+    """
+    spec = give_spec(base_name, tone_variants)
+    await cache_registry.ensure(*spec, version)
+    tables = spec[1]()
+    if tables is None:
+        empty = RankTable.from_rows([], version)
+        return GiveTables(empty, empty)
+    return tables
+
+
+async def get_give_tables(base_name: str, tone_variants: list[str]) -> GiveTables:
+    """
+    あげた側のランキング表を取得する
+
+    Args:
+        base_name (str): 正規化した絵文字名
+        tone_variants (list[str]): 受け取り側の集計対象の絵文字名(肌色違いを含む)
+
+    Returns:
+        GiveTables: ランキング表
+    """
+    return await cache_registry.get(*give_spec(base_name, tone_variants))
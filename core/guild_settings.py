@@ -0,0 +1,140 @@
+"""
+サーバー設定キャッシュ
+spam.settings の値をサーバー単位でまとめて保持する
+"""
+
+import asyncio
+import time
+
+from spam.settings import get_setting_value, set_setting_value
+
+from config import GUILD_SETTINGS_TTL, debug
+
+# キャッシュするキーと取得失敗時の値(on_member_join の従来の挙動に合わせる)
+_DEFAULTS = {
+    "logchannel": 0,
+    "blacklist": True,
+}
+
+
+class GuildSettings:
+    """1サーバー分の設定値"""
+
+    __slots__ = ("blacklist", "guild_id", "loaded_at", "logchannel")
+
+    def __init__(self, guild_id: int, logchannel, blacklist):
+        self.guild_id = guild_id
+        self.logchannel = logchannel
+        self.blacklist = blacklist
+        self.loaded_at = time.monotonic()
+
+
+class GuildSettingsCache:
+    """
+    guild_id -> GuildSettings のキャッシュ
+
+    1サーバー分の全キーを1回のワーカースレッド呼び出しで読み込み、
+    同じサーバーへの同時アクセスは読み込み1回にまとめる。
+    set() は書き込み成功時にキャッシュも更新する(write-through)。
+    """
+
+    def __init__(self, ttl: float = GUILD_SETTINGS_TTL):
+        self.ttl = ttl
+        self._entries: dict[int, GuildSettings] = {}
+        self._loading: dict[int, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _load_sync(guild_id: int) -> tuple[GuildSettings, bool]:
+        values = {}
+        complete = True
+        for key, default in _DEFAULTS.items():
+            try:
+                values[key] = get_setting_value(guild_id, key)
+            except Exception as e:
+                if debug:
+                    print(f"設定取得エラー({key}): {e}")
+                values[key] = default
+                complete = False
+        return GuildSettings(guild_id, **values), complete
+
+    async def get(self, guild_id: int) -> GuildSettings:
+        """
+        サーバーの設定を取得する
+
+        Args:
+            guild_id (int): サーバーID
+
+        Returns:
+            GuildSettings: 設定値(取得に失敗したキーは既定値)
+        """
+        guild_id = int(guild_id)
+        entry = self._entries.get(guild_id)
+        if entry is not None and time.monotonic() - entry.loaded_at < self.ttl:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        future = self._loading.get(guild_id)
+        if future is not None:
+            return await future
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[guild_id] = future
+        try:
+            entry, complete = await asyncio.to_thread(self._load_sync, guild_id)
+            if complete:
+                self._entries[guild_id] = entry
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            future.set_exception(e)
+            # 待っている呼び出しがない場合に "never retrieved" と出ないよう回収済みにする
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(guild_id, None)
+
+    def set(self, guild_id: int, key: str, value) -> bool:
+        """
+        設定を書き込み、成功したらキャッシュにも反映する
+
+        Args:
+            guild_id (int): サーバーID
+            key (str): "logchannel" / "ban" / "blacklist"
+            value: 設定値
+
+        Returns:
+            bool: 成功時 True、失敗時 False
+        """
+        ok = set_setting_value(guild_id, key, value)
+        if key not in _DEFAULTS:
+            # キャッシュしていないキー("ban" など)は書き込むだけ
+            return ok
+        entry = self._entries.get(int(guild_id))
+        if entry is not None:
+            if ok:
+                setattr(entry, key, value)
+            else:
+                self.invalidate(guild_id)
+        return ok
+
+    def invalidate(self, guild_id: int | None = None) -> None:
+        """キャッシュを破棄する(guild_id省略時は全サーバー)"""
+        if guild_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(int(guild_id), None)
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+guild_settings = GuildSettingsCache()
@@ -2,24 +2,257 @@
 ログ記録機能
 """
 
+import asyncio
+import time
 import traceback
+from collections import deque
+from datetime import datetime
 
 import discord
+import MySQLdb
 
-from config import debug
-from database.connection import run_db_query
+from config import (
+    LOG_FLUSH_BATCH,
+    LOG_FLUSH_INTERVAL,
+    LOG_MAX_RETRIES,
+    LOG_QUEUE_MAX,
+    debug,
+)
+
+from .db import PoolTimeoutError, run_pooled_query
+
+# 行を変えずに再送すれば通る見込みのある失敗(接続断・プールの取得待ち)
+_RETRYABLE_ERRORS = (MySQLdb.OperationalError, PoolTimeoutError)
+
+_LOG_COLUMNS = {
+    "log": ("userid", "username", "time", "server", "serverid", "error", "result"),
+    "commandlog": (
+        "userid",
+        "user",
+        "time",
+        "command",
+        "result",
+        "serverid",
+        "server",
+        "channelid",
+    ),
+}
+
+
+class LogSink:
+    """
+    log / commandlog テーブルへの書き込みをまとめて行うバッファ
+
+    put() はメモリ上のキューに積むだけで、バックグラウンドタスクが
+    件数または時間のしきい値で複数行INSERTとして書き込む。
+    キューが上限に達した場合は新しい行を捨てて dropped に計上する。
+    """
+
+    def __init__(
+        self,
+        batch_size: int = LOG_FLUSH_BATCH,
+        interval: float = LOG_FLUSH_INTERVAL,
+        max_queue: int = LOG_QUEUE_MAX,
+        max_retries: int = LOG_MAX_RETRIES,
+    ):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+
+        # table -> deque[(row, 試行回数)]
+        self._queues: dict[str, deque] = {table: deque() for table in _LOG_COLUMNS}
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._closing = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.retried = 0
+        self.flushes = 0
+
+    def pending(self) -> int:
+        """未書き込みの行数"""
+        return sum(len(q) for q in self._queues.values())
+
+    def put(self, table: str, row: tuple) -> bool:
+        """
+        1行をキューに追加する
+
+        Args:
+            table (str): "log" または "commandlog"
+            row (tuple): _LOG_COLUMNS の順に並んだ値
+
+        Returns:
+            bool: キューに積めた場合 True、上限超過で捨てた場合 False
+        """
+        if self._closing or self.pending() >= self.max_queue:
+            self.dropped += 1
+            return False
+
+        self._queues[table].append((row, 0))
+        self.enqueued += 1
+
+        if not self._ensure_task():
+            return True
+        if len(self._queues[table]) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _ensure_task(self) -> bool:
+        if self._task is not None and not self._task.done():
+            return True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run())
+        return True
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def _insert(self, table: str, batch: list) -> None:
+        columns = _LOG_COLUMNS[table]
+        placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join(
+            [placeholders] * len(batch)
+        )
+        params = tuple(value for row, _ in batch for value in row)
+        await run_pooled_query("main", sql, params, commit=True)
+        self.written += len(batch)
+
+    def _requeue(self, table: str, batch: list) -> None:
+        # 試行回数が上限に達していない行は先頭に戻して再送する
+        queue = self._queues[table]
+        for row, attempts in reversed(batch):
+            if attempts + 1 >= self.max_retries:
+                self.dropped += 1
+            else:
+                queue.appendleft((row, attempts + 1))
+                self.retried += 1
+
+    async def _insert_split(self, table: str, batch: list, error: Exception) -> None:
+        # 行の内容が原因の失敗は、半分ずつに分けて書き込み、失敗した1行だけを捨てる
+        pending = deque([(batch, error)])
+        while pending:
+            part, error = pending.popleft()
+            if len(part) == 1:
+                self.dropped += 1
+                if debug:
+                    print(f"ログ書き込みエラー({table}, 1件を破棄): {error}")
+                continue
+            mid = len(part) // 2
+            halves = (part[:mid], part[mid:])
+            for i, half in enumerate(halves):
+                try:
+                    await self._insert(table, half)
+                except _RETRYABLE_ERRORS:
+                    untried = [entry for h in halves[i:] for entry in h]
+                    rest = [entry for p, _ in pending for entry in p]
+                    self._requeue(table, untried + rest)
+                    raise
+                except Exception as e:
+                    pending.append((half, e))
+
+    async def _flush_table(self, table: str) -> None:
+        queue = self._queues[table]
+        batch = []
+        while queue and len(batch) < self.batch_size:
+            batch.append(queue.popleft())
+        if not batch:
+            return
+
+        try:
+            await self._insert(table, batch)
+        except _RETRYABLE_ERRORS as e:
+            # 接続の問題はまとめて再送する
+            if debug:
+                print(f"ログ書き込みエラー({table}, {len(batch)}件): {e}")
+            self._requeue(table, batch)
+            raise
+        except Exception as e:
+            if debug:
+                print(
+                    f"ログ書き込みエラー({table}, {len(batch)}件を分割して再試行): {e}"
+                )
+            await self._insert_split(table, batch, e)
+
+    async def flush(self) -> None:
+        """キューに溜まっている行をすべて書き込む(失敗した分は次回に持ち越し)"""
+        self.flushes += 1
+        for table, queue in self._queues.items():
+            while queue:
+                try:
+                    await self._flush_table(table)
+                except Exception:
+                    break
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """
+        新規受付を止め、残りをすべて書き込んでからタスクを終了する
+
+        Args:
+            timeout (float): 書き込みを待つ最大秒数
+        """
+        self._closing = True
+        if self._task is not None:
+            self._wakeup.set()
+            try:
+                # 書き込み中のバッチを途中で打ち切らないよう、タスク自体はキャンセルしない
+                await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+        deadline = time.monotonic() + timeout
+        while self.pending() and time.monotonic() < deadline:
+            before = self.pending()
+            await self.flush()
+            if self.pending() >= before:
+                await asyncio.sleep(0.5)
+
+        if self.pending():
+            self.dropped += self.pending()
+            for queue in self._queues.values():
+                queue.clear()
+        if debug:
+            print(f"ログ書き込み終了: {self.stats()}")
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "pending": self.pending(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "retried": self.retried,
+            "flushes": self.flushes,
+        }
+
+
+log_sink = LogSink()
 
 
 def insert_log(member, result: str, error: str | None = None) -> bool:
     """
-    logテーブルに1件書き込みます。
+    logテーブルへの書き込みを1件キューに積みます。
+    実際の書き込みは log_sink がまとめて行います。
     展開は関数内で実施:
       - userid: member.id (なければ 0)
       - username: member.display_name or member.name or str(member)
       - server: member.guild.name (なければ 空文字)
       - serverid: member.guild.id (なければ 0)
-      - time: NOW()(DB側で現在時刻)
-    成功時 True、失敗時 False を返す。
+      - time: キューに積んだ時刻
+    キューに積めた場合 True、上限超過で捨てた場合 False を返す。
 
     Args:
         member: Discord Member オブジェクト
@@ -27,7 +260,7 @@ def insert_log(member, result: str, error: str | None = None) -> bool:
         error (str | None, optional): エラーメッセージ。デフォルトはNone。
 
     Returns:
-        bool: 成功時 True、失敗時 False
+        bool: キューに積めた場合 True、捨てた場合 False
     """
     try:
         uid = int(getattr(member, "id", 0) or 0)
@@ -50,23 +283,15 @@ def insert_log(member, result: str, error: str | None = None) -> bool:
 
     err_text = "" if error is None else str(error)
 
-    try:
-        run_db_query(
-            "INSERT INTO log (userid, username, time, server, serverid, error, result) "
-            "VALUES (%s, %s, NOW(), %s, %s, %s, %s)",
-            (uid, username, server_name, server_id, err_text, result),
-            commit=True,
-        )
-        return True
-    except Exception as e:
-        if debug:
-            print(f"データベースエラー(insert_log): {e}")
-        return False
+    return log_sink.put(
+        "log",
+        (uid, username, datetime.now(), server_name, server_id, err_text, result),
+    )
 
 
 def insert_command_log(ctx: discord.Interaction, command: str, result: str) -> None:
     """
-    commandlogテーブルにコマンド実行ログを記録
+    commandlogテーブルにコマンド実行ログを記録(log_sink経由でまとめて書き込む)
 
     Args:
         ctx (discord.Interaction): コマンドのコンテキスト
@@ -84,11 +309,9 @@ def insert_command_log(ctx: discord.Interaction, command: str, result: str) -> N
         channel = getattr(ctx, "channel", None)
         channel_id = int(getattr(channel, "id", 0) or 0) if channel else 0
 
-        run_db_query(
-            "INSERT INTO commandlog (userid, user, time, command, result, serverid, server, channelid) "
-            "VALUES (%s, %s, NOW(), %s, %s, %s, %s, %s)",
-            (uid, uname, command, result, gid, gname, channel_id),
-            commit=True,
+        log_sink.put(
+            "commandlog",
+            (uid, uname, datetime.now(), command, result, gid, gname, channel_id),
         )
     except Exception as e:
         if debug:
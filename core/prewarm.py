@@ -0,0 +1,155 @@
+"""
+ランキングキャッシュの事前作成
+起動時と dblastupdate が変わったときに、ランキング表をまとめて作り直す
+"""
+
+import asyncio
+import time
+
+import discord
+
+from config import (
+    ADMIN_USER_ID,
+    DATA_VERSION_CHECK_INTERVAL,
+    PREWARM_CONCURRENCY,
+    debug,
+)
+from utils.cache import cache_registry
+
+from .giverank import give_specs
+from .rankings import all_specs
+from .topmessages import top_message_specs
+from .userstats import user_stats_spec
+
+
+class CachePrewarmer:
+    """
+    ランキングキャッシュの事前作成
+
+    DATA_VERSION_CHECK_INTERVAL 秒ごとに dblastupdate を確認し、
+    前回作成した世代と違えば全ランキング表・最多メッセージ表・ユーザー別統計を作り直す(起動直後も1回実行する)。
+    DB集計は PREWARM_CONCURRENCY 件まで並列に行い、表の作成はスレッドで行う。
+    各表はファイルの置き換えで切り替わるので、作成中も古い表が読まれ続ける。
+    進み具合と所要時間は管理者にDMで報告する。
+    """
+
+    def __init__(
+        self,
+        interval: float = DATA_VERSION_CHECK_INTERVAL,
+        concurrency: int = PREWARM_CONCURRENCY,
+    ):
+        self.interval = interval
+        self.concurrency = concurrency
+        self._client: discord.Client | None = None
+        self._task: asyncio.Task | None = None
+        self._warmed: str | None = None
+
+        self.runs = 0
+        self.last_duration = 0.0
+
+    async def warm(self, version: str | None) -> dict:
+        """
+        ランキング表を指定の世代で作り直す(すでにその世代の表はそのまま)
+
+        Args:
+            version (str | None): dblastupdate
+
+        Returns:
+            dict: total / rebuilt / failed / seconds
+        """
+        # あげた側の表とユーザー別統計は受け取り側のランキング表を材料にするので後に作る
+        stages = [
+            all_specs() + top_message_specs(),
+            give_specs(),
+            [user_stats_spec()],
+        ]
+        total = sum(len(specs) for specs in stages)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        result = {"total": total, "rebuilt": 0, "failed": 0, "seconds": 0.0}
+        done = 0
+        report = await self._report(f"キャッシュ事前作成開始: {total}件 ({version})")
+        started = time.monotonic()
+        last_report = started
+
+        async def run(spec):
+            nonlocal done, last_report
+            async with semaphore:
+                try:
+                    if await cache_registry.ensure(*spec, version):
+                        result["rebuilt"] += 1
+                except Exception as e:
+                    result["failed"] += 1
+                    if debug:
+                        print(f"キャッシュ事前作成エラー: {spec[0]}: {e}")
+
+            done += 1
+            now = time.monotonic()
+            if report is not None and now - last_report >= 5:
+                last_report = now
+                await self._edit(
+                    report,
+                    f"キャッシュ事前作成中: {done}/{total}件 ({version})",
+                )
+
+        for specs in stages:
+            await asyncio.gather(*(run(spec) for spec in specs))
+
+        result["seconds"] = round(time.monotonic() - started, 1)
+        self.runs += 1
+        self.last_duration = result["seconds"]
+        text = (
+            f"キャッシュ事前作成完了 ({version})\n"
+            f"対象:{result['total']}件 / 作成:{result['rebuilt']}件 / "
+            f"失敗:{result['failed']}件 / {result['seconds']}秒"
+        )
+        print(text)
+        if report is not None:
+            await self._edit(report, text)
+        return result
+
+    async def _report(self, text: str) -> discord.Message | None:
+        if self._client is None:
+            return None
+        try:
+            user = await self._client.fetch_user(ADMIN_USER_ID)
+            return await user.send(text)
+        except Exception as e:
+            if debug:
+                print(f"事前作成の報告エラー: {e}")
+            return None
+
+    async def _edit(self, message: discord.Message, text: str) -> None:
+        try:
+            await message.edit(content=text)
+        except Exception as e:
+            if debug:
+                print(f"事前作成の報告エラー: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                version = await cache_registry.data_version(force=True)
+                if version is not None and version != self._warmed:
+                    await self.warm(version)
+                    self._warmed = version
+            except Exception as e:
+                if debug:
+                    print(f"キャッシュ事前作成エラー: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self, client: discord.Client) -> None:
+        """定期確認タスクを開始する(起動済みなら何もしない)"""
+        self._client = client
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "warmed": self._warmed,
+            "runs": self.runs,
+            "last_duration": self.last_duration,
+        }
+
+
+cache_prewarmer = CachePrewarmer()
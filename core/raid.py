@@ -0,0 +1,140 @@
+"""
+参加レイド検知
+サーバーごとの参加数を監視し、急増時は参加処理をまとめて行うためのキューを提供する
+"""
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+from config import RAID_BATCH_INTERVAL, RAID_JOIN_THRESHOLD, RAID_WINDOW, debug
+
+
+class RaidDetector:
+    """
+    サーバー単位の参加バースト検知とマイクロバッチ
+
+    RAID_WINDOW 秒以内の参加が RAID_JOIN_THRESHOLD 件に達するとレイドモードに入り、
+    以降の参加は enqueue() で溜めて RAID_BATCH_INTERVAL 秒ごとにまとめて処理する。
+    参加数がしきい値の半分を下回り、キューが空になったら通常モードに戻る。
+    """
+
+    def __init__(
+        self,
+        threshold: int = RAID_JOIN_THRESHOLD,
+        window: float = RAID_WINDOW,
+        interval: float = RAID_BATCH_INTERVAL,
+    ):
+        self.threshold = threshold
+        self.window = window
+        self.interval = interval
+
+        self._joins: dict[int, deque] = {}
+        self._active: set[int] = set()
+        self._batches: dict[int, list] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._next_sweep = 0.0
+
+        self.raids = 0
+        self.batched = 0
+
+    def _recent(self, guild_id: int, now: float) -> deque:
+        joins = self._joins.get(guild_id)
+        if joins is None:
+            return deque()
+        while joins and now - joins[0] > self.window:
+            joins.popleft()
+        if not joins:
+            del self._joins[guild_id]
+        return joins
+
+    def _sweep(self, now: float) -> None:
+        # 最後の参加から window 秒以上たったサーバーの記録を window 秒ごとにまとめて捨てる
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.window
+        for guild_id in [
+            g for g, j in self._joins.items() if now - j[-1] > self.window
+        ]:
+            del self._joins[guild_id]
+
+    def observe(self, guild_id: int) -> bool:
+        """
+        参加を1件記録し、そのサーバーがレイドモードか返す
+
+        Args:
+            guild_id (int): サーバーID
+
+        Returns:
+            bool: レイドモードなら True
+        """
+        now = time.monotonic()
+        self._sweep(now)
+        joins = self._recent(guild_id, now)
+        joins.append(now)
+        self._joins[guild_id] = joins
+
+        if guild_id not in self._active and len(joins) >= self.threshold:
+            self._active.add(guild_id)
+            self.raids += 1
+            print(f"レイド検知: guild={guild_id} {len(joins)}人/{self.window}秒")
+        return guild_id in self._active
+
+    def is_active(self, guild_id: int) -> bool:
+        return guild_id in self._active
+
+    def enqueue(
+        self,
+        guild_id: int,
+        member,
+        flush: Callable[[int, list], Awaitable[None]],
+    ) -> None:
+        """
+        レイドモード中の参加者をバッチに追加する
+
+        Args:
+            guild_id (int): サーバーID
+            member: 参加したメンバー
+            flush: バッチをまとめて処理するコルーチン関数 (guild_id, members)
+        """
+        self._batches.setdefault(guild_id, []).append(member)
+        self.batched += 1
+        task = self._tasks.get(guild_id)
+        if task is None or task.done():
+            self._tasks[guild_id] = asyncio.get_running_loop().create_task(
+                self._run(guild_id, flush)
+            )
+
+    async def _run(self, guild_id: int, flush) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                batch = self._batches.pop(guild_id, [])
+                if batch:
+                    try:
+                        await flush(guild_id, batch)
+                    except Exception as e:
+                        if debug:
+                            print(f"レイドバッチ処理エラー: {e}")
+
+                joins = self._recent(guild_id, time.monotonic())
+                if len(joins) < max(1, self.threshold // 2) and not self._batches.get(
+                    guild_id
+                ):
+                    self._active.discard(guild_id)
+                    print(f"レイド終了: guild={guild_id}")
+                    return
+        finally:
+            self._tasks.pop(guild_id, None)
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "active": len(self._active),
+            "raids": self.raids,
+            "batched": self.batched,
+        }
+
+
+raid_detector = RaidDetector()
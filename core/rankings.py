@@ -0,0 +1,160 @@
+"""
+ランキング集計
+ランキング系コマンドが共有するランキング表の取得と作成
+キャッシュは dblastupdate の世代つきで、古くなったものは裏で作り直す
+"""
+
+import asyncio
+from collections.abc import Callable
+
+from utils.cache import cache_registry, list_shards, shard_path
+from utils.emoji import normalize_emoji_and_variants
+from utils.rank import RankTable, load_rank_table, save_rank_table
+
+from .db import run_statdb_query_async
+
+GRIN_SQL = (
+    "SELECT m.author_id, SUM(r.count) as grincount "
+    "FROM reactions r JOIN messages m ON r.message_id = m.id "
+    "WHERE r.emoji_name = 'grin' "
+    "GROUP BY m.author_id ORDER BY grincount DESC"
+)
+
+ALL_SQL = (
+    "SELECT m.author_id, SUM(r.count) as total_count "
+    "FROM reactions r JOIN messages m ON r.message_id = m.id "
+    "GROUP BY m.author_id ORDER BY total_count DESC"
+)
+
+TRUTH_GRIN_SQL = (
+    "SELECT m.author_id, SUM(r.count) as grincount "
+    "FROM reactions r JOIN messages m ON r.message_id = m.id "
+    "WHERE r.emoji_name = 'grin' "
+    "  AND m.content NOT LIKE '%%http%%' "
+    "  AND m.content NOT LIKE '%%https%%' "
+    "GROUP BY m.author_id ORDER BY grincount DESC"
+)
+
+# 絵文字ごとのランキング表の保存先(cache/ 以下、1絵文字1ファイル)
+REACTION_DIR = "reaction"
+
+
+def reaction_sql(variant_count: int) -> str:
+    """受け取ったリアクション(肌色違いを含む)の集計SQL"""
+    placeholders = ", ".join(["%s"] * variant_count)
+    return (
+        "SELECT m.author_id, SUM(r.count) as total_reactions "
+        "FROM reactions r "
+        "JOIN messages m ON r.message_id = m.id "
+        f"WHERE r.emoji_name IN ({placeholders}) "
+        "GROUP BY m.author_id "
+        "ORDER BY total_reactions DESC"
+    )
+
+
+# ランキング表の (キー, 読み込み関数, 作成関数)
+CacheSpec = tuple[str, Callable[[], RankTable | None], Callable]
+
+
+def _table_spec(key: str, path: str, query, sql: str, params=()) -> CacheSpec:
+    async def build(version: str | None) -> RankTable:
+        rows = await query(sql, params, fetch="all") or []
+        # 行数が多いと集計表の作成に時間がかかるのでスレッドで行う
+        return await asyncio.to_thread(save_rank_table, path, rows, version=version)
+
+    return key, lambda: load_rank_table(path), build
+
+
+def grin_spec() -> CacheSpec:
+    """受け取った:grin:のランキング表"""
+    return _table_spec("grinrank", "grinrank.bin", run_statdb_query_async, GRIN_SQL)
+
+
+def all_spec() -> CacheSpec:
+    """受け取った全リアクション合計のランキング表"""
+    return _table_spec("allrank", "allrank.bin", run_statdb_query_async, ALL_SQL)
+
+
+def truth_grin_spec() -> CacheSpec:
+    """URLを含まないメッセージで受け取った:grin:のランキング表"""
+    return _table_spec(
+        "truthgrinrank", "truthgrinrank.bin", run_statdb_query_async, TRUTH_GRIN_SQL
+    )
+
+
+def reaction_spec(base_name: str, tone_variants: list[str]) -> CacheSpec:
+    """受け取ったリアクションのランキング表"""
+
+    async def build(version: str | None) -> RankTable:
+        rows = (
+            await run_statdb_query_async(
+                reaction_sql(len(tone_variants)), tuple(tone_variants), fetch="all"
+            )
+            or []
+        )
+        return await asyncio.to_thread(save_rank_table, path, rows, version=version)
+
+    path = shard_path(REACTION_DIR, base_name)
+    return f"reaction:{base_name}", lambda: load_rank_table(path), build
+
+
+def all_specs() -> list[CacheSpec]:
+    """
+    事前作成の対象になるランキング表の一覧
+    絵文字ごとの表は、これまでに作成されたことのある絵文字だけを対象にする
+
+    Returns:
+        list[CacheSpec]: ランキング表の一覧
+    """
+    specs = [grin_spec(), all_spec(), truth_grin_spec()]
+    for base_name in list_shards(REACTION_DIR):
+        _, tone_variants = normalize_emoji_and_variants(base_name)
+        if tone_variants:
+            specs.append(reaction_spec(base_name, tone_variants))
+    return specs
+
+
+async def table_at(spec: CacheSpec, version: str | None) -> RankTable:
+    """
+    指定の世代のランキング表を取得する(古ければ作り直しを待つ)
+    他のキャッシュの材料にするときに、古い表が混ざらないようにするためのもの
+
+    Args:
+        spec (CacheSpec): ランキング表
+        version (str | None): dblastupdate
+
+    Returns:
+        RankTable: ランキング表
+    """
+    await cache_registry.ensure(*spec, version)
+    table = spec[1]()
+    return table if table is not None else RankTable.from_rows([], version)
+
+
+async def get_grin_table() -> RankTable:
+    """受け取った:grin:のランキング表"""
+    return await cache_registry.get(*grin_spec())
+
+
+async def get_all_table() -> RankTable:
+    """受け取った全リアクション合計のランキング表"""
+    return await cache_registry.get(*all_spec())
+
+
+async def get_truth_grin_table() -> RankTable:
+    """URLを含まないメッセージで受け取った:grin:のランキング表"""
+    return await cache_registry.get(*truth_grin_spec())
+
+
+async def get_reaction_table(base_name: str, tone_variants: list[str]) -> RankTable:
+    """
+    受け取ったリアクションのランキング表
+
+    Args:
+        base_name (str): 正規化した絵文字名
+        tone_variants (list[str]): 集計対象の絵文字名(肌色違いを含む)
+
+    Returns:
+        RankTable: ランキング表
+    """
+    return await cache_registry.get(*reaction_spec(base_name, tone_variants))
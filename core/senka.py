@@ -0,0 +1,207 @@
+"""
+専科メンバー判定
+参加者が専科サーバーにいるかを、Gatewayキャッシュ・判定キャッシュ・APIの順に確認する
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+from bot import client, get_http_session
+from config import (
+    ALLOWED_GUILD_ID,
+    SENKA_MEMBER_TTL,
+    SENKA_NONMEMBER_TTL,
+    SENKA_RATE_BURST,
+    SENKA_RATE_PER_SEC,
+    SENKA_VERDICT_CACHE_SIZE,
+    SENKATOKEN,
+    debug,
+)
+
+
+class TokenBucket:
+    """
+    非同期トークンバケット
+    Discordのレート制限ヘッダーを受けて一時停止もできる
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """トークンを1つ取得する(空なら補充まで待つ)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """指定秒数の間トークンを払い出さない"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+
+class SenkaVerifier:
+    """
+    専科メンバー判定
+
+    1. 専科サーバーにBotがいればGatewayのメンバーキャッシュを使う
+    2. 直近の判定結果をTTL付きでキャッシュする(最大 max_verdicts 件、古く使われたものから捨てる)
+    3. それ以外はカスタムDNSのaiohttpセッションでAPIに問い合わせる
+       (レート制限ヘッダーに従い、共有トークンバケットで流量を抑える)
+    """
+
+    def __init__(
+        self,
+        member_ttl: float = SENKA_MEMBER_TTL,
+        nonmember_ttl: float = SENKA_NONMEMBER_TTL,
+        max_verdicts: int = SENKA_VERDICT_CACHE_SIZE,
+    ):
+        self.member_ttl = member_ttl
+        self.nonmember_ttl = nonmember_ttl
+        self.max_verdicts = max_verdicts
+        self.bucket = TokenBucket(SENKA_RATE_PER_SEC, SENKA_RATE_BURST)
+        self._verdicts: OrderedDict[int, tuple[bool, float]] = OrderedDict()
+        self._next_sweep = 0.0
+
+        self.gateway_hits = 0
+        self.cache_hits = 0
+        self.api_calls = 0
+        self.rate_limited = 0
+
+    def _from_gateway(self, user_id: int) -> bool | None:
+        guild = client.get_guild(ALLOWED_GUILD_ID)
+        if guild is None:
+            return None
+        if guild.get_member(user_id) is not None:
+            return True
+        # 全メンバー取得済みの場合のみ「いない」と判断できる
+        if guild.chunked:
+            return False
+        return None
+
+    def _from_cache(self, user_id: int) -> bool | None:
+        entry = self._verdicts.get(user_id)
+        if entry is None:
+            return None
+        verdict, expires = entry
+        if time.monotonic() >= expires:
+            self._verdicts.pop(user_id, None)
+            return None
+        self._verdicts.move_to_end(user_id)
+        return verdict
+
+    def remember(self, user_id: int, verdict: bool) -> None:
+        """判定結果をキャッシュする"""
+        ttl = self.member_ttl if verdict else self.nonmember_ttl
+        user_id = int(user_id)
+        self._verdicts[user_id] = (verdict, time.monotonic() + ttl)
+        self._verdicts.move_to_end(user_id)
+        self._sweep()
+
+    def _sweep(self) -> None:
+        # 期限切れの判定は nonmember_ttl 秒ごとにまとめて捨て、件数の上限は古く使われたものから捨てる
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.nonmember_ttl
+            expired = [u for u, (_, exp) in self._verdicts.items() if exp <= now]
+            for user_id in expired:
+                del self._verdicts[user_id]
+        while len(self._verdicts) > self.max_verdicts:
+            self._verdicts.popitem(last=False)
+
+    async def _from_api(self, user_id: int) -> bool | None:
+        session = await get_http_session()
+        url = f"https://discord.com/api/v10/guilds/{ALLOWED_GUILD_ID}/members/{user_id}"
+        headers = {"Authorization": SENKATOKEN or ""}
+
+        for _ in range(3):
+            await self.bucket.acquire()
+            self.api_calls += 1
+            async with session.get(url, headers=headers) as response:
+                remaining = response.headers.get("X-RateLimit-Remaining")
+                reset_after = response.headers.get("X-RateLimit-Reset-After")
+                if remaining == "0" and reset_after:
+                    self.bucket.pause(float(reset_after))
+
+                if response.status == 429:
+                    self.rate_limited += 1
+                    try:
+                        data = await response.json()
+                        retry_after = float(data.get("retry_after", 1))
+                    except Exception:
+                        retry_after = float(response.headers.get("Retry-After", 1))
+                    self.bucket.pause(retry_after)
+                    continue
+                if response.status == 200:
+                    return True
+                if response.status == 404:
+                    return False
+                if response.status == 401:
+                    print("Unauthorized!!!!!!!")
+                elif debug:
+                    print(f"専科メンバー確認: 想定外のステータス {response.status}")
+                return None
+        return None
+
+    async def is_member(self, user_id: int) -> bool | None:
+        """
+        専科サーバーのメンバーか判定する
+
+        Args:
+            user_id (int): ユーザーID
+
+        Returns:
+            bool | None: メンバーなら True、いなければ False、判定できない場合 None
+        """
+        user_id = int(user_id)
+
+        verdict = self._from_gateway(user_id)
+        if verdict is not None:
+            self.gateway_hits += 1
+            return verdict
+
+        verdict = self._from_cache(user_id)
+        if verdict is not None:
+            self.cache_hits += 1
+            return verdict
+
+        try:
+            verdict = await self._from_api(user_id)
+        except Exception as e:
+            if debug:
+                print(f"専科メンバー確認エラー: {e}")
+            return None
+        if verdict is not None:
+            self.remember(user_id, verdict)
+        return verdict
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "cached": len(self._verdicts),
+            "gateway_hits": self.gateway_hits,
+            "cache_hits": self.cache_hits,
+            "api_calls": self.api_calls,
+            "rate_limited": self.rate_limited,
+        }
+
+
+senka_verifier = SenkaVerifier()
@@ -0,0 +1,383 @@
+"""
+動画タグのインデックス
+AI DB の meta.tag(JSON配列)を タグ -> メッセージID集合 の形でメモリに持ち、
+同じ内容を (タグ, メッセージID) の表 video_tags として AI DB にも置く
+"""
+
+import asyncio
+import json
+import time
+
+from config import TAG_IN_LIMIT, TAG_INDEX_REFRESH_INTERVAL, debug
+
+from .db import run_pooled_query
+
+TAG_TABLE_CREATE_SQL = (
+    "CREATE TABLE IF NOT EXISTS video_tags ("
+    "  tag VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL, "
+    "  message_id BIGINT UNSIGNED NOT NULL, "
+    "  PRIMARY KEY (tag, message_id), "
+    "  KEY idx_message (message_id)"
+    ")"
+)
+TAG_TABLE_INSERT_SQL = "INSERT IGNORE INTO video_tags (tag, message_id) VALUES (%s, %s)"
+TAG_TABLE_DELETE_SQL = "DELETE FROM video_tags WHERE tag = %s AND message_id = %s"
+
+# video_tags に入れられるタグの長さ(これより長いタグは表に入れず、IN 条件で絞る)
+TAG_TABLE_MAX_LENGTH = 255
+
+# video_tags への1回の書き込み件数
+TAG_TABLE_BATCH = 5000
+
+
+def parse_tag_json(raw) -> list[str]:
+    """
+    meta.tag の JSON配列からタグを取り出す
+
+    Args:
+        raw: meta.tag の値
+
+    Returns:
+        list[str]: 前後の空白を除いたタグ(壊れた値や文字列以外は無視)
+    """
+    if not raw:
+        return []
+    try:
+        tags = json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return []
+    if not isinstance(tags, list):
+        return []
+    return [tag.strip() for tag in tags if isinstance(tag, str) and tag.strip()]
+
+
+def _table_tags(tags: frozenset[str]) -> frozenset[str]:
+    # video_tags に入れるタグ(長すぎるものを除く)
+    if all(len(tag) <= TAG_TABLE_MAX_LENGTH for tag in tags):
+        return tags
+    return frozenset(tag for tag in tags if len(tag) <= TAG_TABLE_MAX_LENGTH)
+
+
+def tag_filter_sql(column: str, ids, tags: list[str]) -> tuple[str, list]:
+    """
+    タグ絞り込みの条件を作る
+
+    IDが TAG_IN_LIMIT 件までなら IN 条件にし、それより多い場合は
+    巨大な IN を送らないよう video_tags 表と主キーで突き合わせる条件にする。
+    (video_tags がまだ揃っていない間と、表に入らない長さのタグは IN 条件のまま)
+
+    Args:
+        column (str): メッセージIDの列名(例: "m.id")
+        ids: タグインデックスで求めたメッセージIDの集合(空でないこと)
+        tags (list[str]): いずれかが付いていればよいタグ
+
+    Returns:
+        tuple[str, list]: (条件SQL, パラメータ)
+    """
+    tags = [tag.strip() for tag in tags]
+    if (
+        len(ids) <= TAG_IN_LIMIT
+        or not tag_index.table_ready
+        or any(len(tag) > TAG_TABLE_MAX_LENGTH for tag in tags)
+    ):
+        params = sorted(ids)
+        return f"{column} IN ({', '.join(['%s'] * len(params))})", params
+    placeholders = ", ".join(["%s"] * len(tags))
+    return (
+        "EXISTS (SELECT 1 FROM video_tags vt "
+        f"WHERE vt.message_id = {column} AND vt.tag IN ({placeholders}))",
+        tags,
+    )
+
+
+class TagIndex:
+    """
+    タグ -> メッセージID集合 のメモリ上のインデックス
+
+    件数はID集合の大きさ、名前順・件数順の一覧は変更があるまで使い回す。
+    update_video_tags からの変更はその場で反映し、
+    それ以外の経路での変更は meta の (件数, タグのCRC合計) をウォーターマークにして
+    変化があったときだけ全件を読み直す。
+    video_tags 表は最後に書き込んだ内容をメモリに持っておき、差分だけを書き込む。
+    """
+
+    def __init__(self, interval: float = TAG_INDEX_REFRESH_INTERVAL):
+        self.interval = interval
+        self._ids: dict[str, set[int]] = {}
+        self._tags: dict[int, frozenset[str]] = {}
+        self._sorted: dict[str, list[tuple[str, int]]] = {}
+        self._pending: dict[int, frozenset[str]] | None = None
+        self._watermark: tuple | None = None
+        self._loaded = False
+        self._lock: asyncio.Lock | None = None
+        self._task: asyncio.Task | None = None
+        # video_tags に書き込み済みの メッセージID -> タグ(未確認なら None)
+        self._synced: dict[int, frozenset[str]] | None = None
+        self._table_lock: asyncio.Lock | None = None
+
+        self.reloads = 0
+        self.updates = 0
+        self.table_syncs = 0
+
+    @property
+    def loaded(self) -> bool:
+        """インデックスを読み込み済みか"""
+        return self._loaded
+
+    @property
+    def table_ready(self) -> bool:
+        """video_tags 表がインデックスと揃っているか"""
+        return self._synced is not None
+
+    def _apply(
+        self,
+        ids: dict[str, set[int]],
+        by_message: dict[int, frozenset[str]],
+        message_id: int,
+        tags: frozenset[str],
+    ) -> None:
+        for tag in by_message.get(message_id, frozenset()) - tags:
+            members = ids.get(tag)
+            if members is not None:
+                members.discard(message_id)
+                if not members:
+                    del ids[tag]
+        for tag in tags:
+            ids.setdefault(tag, set()).add(message_id)
+        if tags:
+            by_message[message_id] = tags
+        else:
+            by_message.pop(message_id, None)
+
+    async def set_tags(self, message_id: int, tags: list[str]) -> None:
+        """
+        メッセージのタグを置き換える(meta への保存後に呼ぶ)
+        video_tags 表にもそのメッセージの差分を書き込む
+
+        Args:
+            message_id (int): メッセージID
+            tags (list[str]): 保存したタグのすべて
+        """
+        message_id = int(message_id)
+        tags = frozenset(t.strip() for t in tags if isinstance(t, str) and t.strip())
+        self._apply(self._ids, self._tags, message_id, tags)
+        # 全件読み直しの最中なら、読み直した結果にも反映させる
+        if self._pending is not None:
+            self._pending[message_id] = tags
+        self._sorted.clear()
+        self.updates += 1
+
+        if self._synced is None:
+            # 表が未確認なら次の突き合わせでまとめて書き込む
+            return
+        if self._table_lock is None:
+            self._table_lock = asyncio.Lock()
+        try:
+            async with self._table_lock:
+                if self._synced is None:
+                    return
+                old = self._synced.get(message_id, frozenset())
+                new = _table_tags(self._tags.get(message_id, frozenset()))
+                await self._write_table(
+                    [(tag, message_id) for tag in old - new],
+                    [(tag, message_id) for tag in new - old],
+                )
+                if new:
+                    self._synced[message_id] = new
+                else:
+                    self._synced.pop(message_id, None)
+        except Exception as e:
+            if debug:
+                print(f"タグ表更新エラー: {e}")
+            # どこまで書けたかわからないので、次の突き合わせで表を読み直す
+            self._synced = None
+
+    async def _write_table(self, removed: list, added: list) -> None:
+        for i in range(0, len(removed), TAG_TABLE_BATCH):
+            await run_pooled_query(
+                "ai",
+                TAG_TABLE_DELETE_SQL,
+                removed[i : i + TAG_TABLE_BATCH],
+                commit=True,
+                many=True,
+            )
+        for i in range(0, len(added), TAG_TABLE_BATCH):
+            await run_pooled_query(
+                "ai",
+                TAG_TABLE_INSERT_SQL,
+                added[i : i + TAG_TABLE_BATCH],
+                commit=True,
+                many=True,
+            )
+
+    async def sync_table(self) -> int:
+        """
+        video_tags 表をメモリ上のインデックスに揃える
+        初回(と書き込み失敗後)は表を読み込んでから、差分だけを書き込む
+
+        Returns:
+            int: 書き込んだ行数(追加と削除の合計)
+        """
+        if self._table_lock is None:
+            self._table_lock = asyncio.Lock()
+        async with self._table_lock:
+            synced = self._synced
+            if synced is None:
+                await run_pooled_query("ai", TAG_TABLE_CREATE_SQL, (), commit=True)
+                rows = await run_pooled_query(
+                    "ai", "SELECT message_id, tag FROM video_tags", (), fetch="all"
+                )
+                stored: dict[int, set[str]] = {}
+                for message_id, tag in rows or []:
+                    stored.setdefault(int(message_id), set()).add(tag)
+                synced = {k: frozenset(v) for k, v in stored.items()}
+
+            # この時点のインデックスに揃える(書き込み中の set_tags は後から差分を書く)
+            target = {}
+            for message_id, tags in self._tags.items():
+                tags = _table_tags(tags)
+                if tags:
+                    target[message_id] = tags
+            removed = []
+            added = []
+            for message_id in synced.keys() | target.keys():
+                old = synced.get(message_id, frozenset())
+                new = target.get(message_id, frozenset())
+                if old != new:
+                    removed.extend((tag, message_id) for tag in old - new)
+                    added.extend((tag, message_id) for tag in new - old)
+            try:
+                await self._write_table(removed, added)
+            except Exception:
+                self._synced = None
+                raise
+            self._synced = target
+            self.table_syncs += 1
+            return len(removed) + len(added)
+
+    def message_ids(self, tag: str) -> set[int]:
+        """
+        タグが付いたメッセージIDの集合を返す(完全一致)
+
+        Args:
+            tag (str): タグ
+
+        Returns:
+            set[int]: メッセージID(該当なしは空集合)
+        """
+        return self._ids.get(tag.strip(), set())
+
+    def count(self, tag: str) -> int:
+        """タグが付いたメッセージの件数"""
+        return len(self.message_ids(tag))
+
+    def tags(self, sort_by: str = "name") -> list[tuple[str, int]]:
+        """
+        タグと件数の一覧を返す
+
+        Args:
+            sort_by (str): "name"(名前順) / "count"(件数の多い順)
+
+        Returns:
+            list[tuple[str, int]]: (タグ, 件数)
+        """
+        cached = self._sorted.get(sort_by)
+        if cached is None:
+            items = [(tag, len(ids)) for tag, ids in self._ids.items()]
+            if sort_by == "count":
+                items.sort(key=lambda x: (-x[1], x[0]))
+            else:
+                items.sort()
+            cached = self._sorted[sort_by] = items
+        return cached
+
+    async def _reload(self) -> None:
+        self._pending = {}
+        try:
+            rows = await run_pooled_query(
+                "ai",
+                "SELECT id, tag FROM meta WHERE tag IS NOT NULL AND tag != ''",
+                (),
+                fetch="all",
+            )
+            ids: dict[str, set[int]] = {}
+            by_message: dict[int, frozenset[str]] = {}
+            for message_id, raw in rows or []:
+                self._apply(
+                    ids, by_message, int(message_id), frozenset(parse_tag_json(raw))
+                )
+            for message_id, tags in self._pending.items():
+                self._apply(ids, by_message, message_id, tags)
+        finally:
+            self._pending = None
+        self._ids = ids
+        self._tags = by_message
+        self._sorted.clear()
+        self.reloads += 1
+
+    async def refresh(self, force: bool = False) -> bool:
+        """
+        ウォーターマークを確認し、変化していれば全件を読み直す
+
+        Args:
+            force (bool): Trueの場合はウォーターマークに関わらず読み直す
+
+        Returns:
+            bool: 読み直した場合 True
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            start = time.perf_counter()
+            row = await run_pooled_query(
+                "ai",
+                "SELECT COUNT(*), COALESCE(SUM(CRC32(tag)), 0) FROM meta "
+                "WHERE tag IS NOT NULL AND tag != ''",
+                (),
+                fetch="one",
+            )
+            watermark = tuple(row) if row else None
+            if not force and self._loaded and watermark == self._watermark:
+                return False
+            await self._reload()
+            self._watermark = watermark
+            self._loaded = True
+            if debug:
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"タグインデックス更新: {len(self._ids)}タグ {elapsed:.1f}ms")
+            return True
+
+    async def ensure_loaded(self) -> None:
+        """未読込なら読み込む"""
+        if not self._loaded:
+            await self.refresh()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # 表の突き合わせは件数が多いことがあるので、利用者を待たせないここでだけ行う
+                if await self.refresh() or not self.table_ready:
+                    await self.sync_table()
+            except Exception as e:
+                if debug:
+                    print(f"タグインデックス更新エラー: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """定期更新タスクを開始する(起動済みなら何もしない)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "tags": len(self._ids),
+            "messages": len(self._tags),
+            "reloads": self.reloads,
+            "updates": self.updates,
+            "table_ready": self.table_ready,
+            "table_syncs": self.table_syncs,
+        }
+
+
+tag_index = TagIndex()
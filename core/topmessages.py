@@ -0,0 +1,228 @@
+"""
+最多リアクションメッセージ
+ユーザーと絵文字ごとに、最も多くリアクションを受け取ったメッセージを前もって集計しておく
+"""
+
+import asyncio
+import os
+from array import array
+from bisect import bisect_left
+from typing import NamedTuple
+
+from utils.cache import (
+    cache_registry,
+    list_shards,
+    load_binary_cache,
+    save_binary_cache,
+    shard_path,
+)
+from utils.emoji import normalize_emoji_and_variants
+from utils.rank import recall_table, remember_table
+
+from .db import run_statdb_query_async
+from .rankings import REACTION_DIR
+
+TOP_MESSAGE_DIR = "topmessage"
+
+
+def top_message_sql(variant_count: int) -> str:
+    """絵文字(肌色違いを含む)ごとの、ユーザー別最多メッセージと最初の添付URLの集計SQL"""
+    placeholders = ", ".join(["%s"] * variant_count)
+    return (
+        "SELECT t.author_id, t.message_id, t.channel_id, t.total_count, "
+        "  (SELECT a.url FROM attachments a WHERE a.message_id = t.message_id LIMIT 1) "
+        "FROM ("
+        "  SELECT m.author_id, m.id as message_id, m.channel_id, "
+        "    SUM(r.count) as total_count, "
+        "    ROW_NUMBER() OVER ("
+        "      PARTITION BY m.author_id ORDER BY SUM(r.count) DESC, m.id"
+        "    ) as rn "
+        "  FROM reactions r "
+        "  JOIN messages m ON r.message_id = m.id "
+        f"  WHERE r.emoji_name IN ({placeholders}) "
+        "  GROUP BY m.id, m.author_id, m.channel_id"
+        ") t WHERE t.rn = 1"
+    )
+
+
+class TopMessage(NamedTuple):
+    """1ユーザー分の最多リアクションメッセージ"""
+
+    message_id: int
+    channel_id: int
+    count: int
+    image_url: str | None
+
+
+class TopMessageIndex:
+    """
+    1つの絵文字についての、ユーザー別最多リアクションメッセージの表
+
+    ユーザーID昇順の列と、メッセージID・チャンネルID・件数・添付URL番号の列(int64)を持つ。
+    添付URLはヘッダーに一覧で持ち、URL番号が -1 のものは添付なし。
+    """
+
+    __slots__ = (
+        "_channels",
+        "_counts",
+        "_ids",
+        "_messages",
+        "_url_ids",
+        "_urls",
+        "version",
+    )
+
+    def __init__(self, columns: dict, urls: list[str], version: str | None = None):
+        self._ids = columns["ids"]
+        self._messages = columns["message_id"]
+        self._channels = columns["channel_id"]
+        self._counts = columns["count"]
+        self._url_ids = columns["url"]
+        self._urls = urls
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def nbytes(self) -> int:
+        """列と添付URLのおおよその合計バイト数"""
+        columns = (
+            self._ids,
+            self._messages,
+            self._channels,
+            self._counts,
+            self._url_ids,
+        )
+        return sum(memoryview(col).nbytes for col in columns) + sum(
+            len(url) for url in self._urls
+        )
+
+    def lookup(self, uid: int) -> TopMessage | None:
+        """
+        ユーザーの最多リアクションメッセージを取得する
+
+        Args:
+            uid (int): ユーザーID
+
+        Returns:
+            TopMessage | None: メッセージ、リアクションを受け取っていない場合は None
+        """
+        i = bisect_left(self._ids, uid)
+        if i >= len(self._ids) or self._ids[i] != uid:
+            return None
+        url_id = self._url_ids[i]
+        return TopMessage(
+            self._messages[i],
+            self._channels[i],
+            self._counts[i],
+            self._urls[url_id] if url_id >= 0 else None,
+        )
+
+
+def _build_columns(rows) -> tuple[dict[str, array], list[str]]:
+    rows = sorted(
+        (r for r in rows or [] if r[0] is not None and r[1] is not None),
+        key=lambda r: int(r[0]),
+    )
+    urls: list[str] = []
+    url_ids = array("q")
+    for r in rows:
+        if r[4]:
+            url_ids.append(len(urls))
+            urls.append(r[4])
+        else:
+            url_ids.append(-1)
+    columns = {
+        "ids": array("q", (int(r[0]) for r in rows)),
+        "message_id": array("q", (int(r[1]) for r in rows)),
+        "channel_id": array("q", (int(r[2] or 0) for r in rows)),
+        "count": array("q", (int(r[3] or 0) for r in rows)),
+        "url": url_ids,
+    }
+    return columns, urls
+
+
+def load_top_message_index(base_name: str) -> TopMessageIndex | None:
+    """
+    キャッシュから絵文字の最多メッセージ表を読み込む
+    (ファイルが更新されていなければ前回の表を返す)
+
+    Args:
+        base_name (str): 正規化した絵文字名
+
+    Returns:
+        TopMessageIndex | None: 最多メッセージ表、キャッシュがない場合は None
+    """
+    path = shard_path(TOP_MESSAGE_DIR, base_name)
+    try:
+        mtime = os.path.getmtime(f"cache/{path}")
+    except OSError:
+        return None
+    # メモリ上の表はランキング表と同じ上限(RANK_TABLE_CACHE_BYTES)で持つ
+    index = recall_table(path, mtime)
+    if index is not None:
+        return index
+
+    loaded = load_binary_cache(path)
+    if loaded is None:
+        return None
+    meta, columns = loaded
+    index = TopMessageIndex(columns, meta.get("urls", []), meta.get("dblastupdate"))
+    remember_table(path, mtime, index)
+    return index
+
+
+def top_message_spec(base_name: str, tone_variants: list[str]):
+    """絵文字の最多メッセージ表のキャッシュ (キー, 読み込み関数, 作成関数)"""
+
+    async def build(version: str | None) -> TopMessageIndex:
+        rows = await run_statdb_query_async(
+            top_message_sql(len(tone_variants)), tuple(tone_variants), fetch="all"
+        )
+        columns, urls = await asyncio.to_thread(_build_columns, rows)
+        meta = {"dblastupdate": version, "urls": urls}
+        if save_binary_cache(shard_path(TOP_MESSAGE_DIR, base_name), columns, meta):
+            index = load_top_message_index(base_name)
+            if index is not None:
+                return index
+        return TopMessageIndex(columns, urls, version)
+
+    return (
+        f"topmessage:{base_name}",
+        lambda: load_top_message_index(base_name),
+        build,
+    )
+
+
+def top_message_specs() -> list:
+    """
+    事前作成の対象になる最多メッセージ表の一覧
+    :grin: と、これまでにランキングが作成されたことのある絵文字を対象にする
+    """
+    specs = [top_message_spec("grin", ["grin"])]
+    for base_name in list_shards(REACTION_DIR):
+        if base_name == "grin":
+            continue
+        _, tone_variants = normalize_emoji_and_variants(base_name)
+        if tone_variants:
+            specs.append(top_message_spec(base_name, tone_variants))
+    return specs
+
+
+async def get_top_message(
+    uid: int, base_name: str, tone_variants: list[str]
+) -> TopMessage | None:
+    """
+    ユーザーが指定の絵文字を最も多く受け取ったメッセージを取得する
+
+    Args:
+        uid (int): ユーザーID
+        base_name (str): 正規化した絵文字名
+        tone_variants (list[str]): 集計対象の絵文字名(肌色違いを含む)
+
+    Returns:
+        TopMessage | None: メッセージ、見つからない場合は None
+    """
+    index = await cache_registry.get(*top_message_spec(base_name, tone_variants))
+    return index.lookup(int(uid))
@@ -0,0 +1,303 @@
+"""
+ユーザー別統計
+/grinrank 系コマンドが使う数値をユーザーごとに1レコードにまとめて持つ
+"""
+
+import asyncio
+import os
+import time
+from array import array
+from bisect import bisect_left
+from typing import NamedTuple
+
+from config import debug
+from utils.cache import cache_registry, load_binary_cache, save_binary_cache
+from utils.rank import RankTable
+
+from .db import run_statdb_query_async
+from .giverank import give_tables_at
+from .rankings import all_spec, grin_spec, table_at, truth_grin_spec
+
+USER_STATS_PATH = "userstats.bin"
+
+# あげた数(リアクションDB)を取れずに作った統計を、作り直すまでの秒数
+GIVEN_RETRY_INTERVAL = 600
+
+MESSAGE_COUNT_SQL = (
+    "SELECT author_id, COUNT(*) as total_messages FROM messages GROUP BY author_id"
+)
+
+GRIN_MESSAGE_COUNT_SQL = (
+    "SELECT m.author_id, COUNT(DISTINCT r.message_id) as message_count_with_grin "
+    "FROM reactions r JOIN messages m ON r.message_id = m.id "
+    "WHERE r.emoji_name = 'grin' "
+    "GROUP BY m.author_id"
+)
+
+# ユーザーごとのモノホン:grin:最多メッセージ(URLやwww.を含むものは除外)
+TOP_TRUTH_MESSAGE_SQL = (
+    "SELECT author_id, message_id, channel_id FROM ("
+    "  SELECT m.author_id, m.id as message_id, m.channel_id, "
+    "    ROW_NUMBER() OVER ("
+    "      PARTITION BY m.author_id ORDER BY SUM(r.count) DESC, m.id"
+    "    ) as rn "
+    "  FROM messages m "
+    "  JOIN reactions r ON m.id = r.message_id "
+    "  WHERE r.emoji_name = 'grin' "
+    "    AND m.content NOT LIKE '%%http://%%' "
+    "    AND m.content NOT LIKE '%%https://%%' "
+    "    AND m.content NOT LIKE '%%www.%%' "
+    "  GROUP BY m.id, m.author_id, m.channel_id"
+    ") t WHERE rn = 1"
+)
+
+
+class UserStats(NamedTuple):
+    """
+    1ユーザー分の統計
+
+    *_rank はランキングにいない場合 0。
+    truth_rank だけは従来どおり件数 0 でも順位を持つ(ランキングの人数 + 1 など)。
+    """
+
+    grin: int
+    grin_rank: int
+    grin_percent: int
+    all_reactions: int
+    all_rank: int
+    all_percent: int
+    truth: int
+    truth_rank: int
+    truth_percent: int
+    messages: int
+    grin_messages: int
+    given: int
+    given_rank: int
+    given_percent: int
+    top_truth_message_id: int
+    top_truth_channel_id: int
+
+
+_FIELDS = UserStats._fields
+_INDEX = {name: i for i, name in enumerate(_FIELDS)}
+
+
+class UserStatsTable:
+    """
+    ユーザー別統計の表
+
+    ユーザーID昇順の列と、UserStats の各項目の列(int64)を持つ。
+    バイナリキャッシュをメモリマップしたまま使うので、読み込み時にレコードは作らない。
+    """
+
+    __slots__ = ("_columns", "_ids", "truth_rank_of_zero", "version")
+
+    def __init__(
+        self,
+        ids,
+        columns: list,
+        version: str | None = None,
+        truth_rank_of_zero: int = 1,
+    ):
+        self._ids = ids
+        self._columns = columns
+        self.version = version
+        self.truth_rank_of_zero = truth_rank_of_zero
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def lookup(self, uid: int) -> UserStats:
+        """
+        ユーザーの統計を取得する
+
+        Args:
+            uid (int): ユーザーID
+
+        Returns:
+            UserStats: 統計(データがないユーザーはすべて 0)
+        """
+        i = bisect_left(self._ids, uid)
+        if i < len(self._ids) and self._ids[i] == uid:
+            return UserStats(*(col[i] for col in self._columns))
+        empty = [0] * len(_FIELDS)
+        empty[_INDEX["truth_rank"]] = self.truth_rank_of_zero
+        return UserStats(*empty)
+
+
+def _build_columns(
+    tables: dict[str, RankTable],
+    messages,
+    grin_messages,
+    top_truth,
+) -> tuple[dict[str, array], int]:
+    users: dict[int, list[int]] = {}
+
+    def record(uid) -> list[int]:
+        uid = int(uid)
+        rec = users.get(uid)
+        if rec is None:
+            rec = users[uid] = [0] * len(_FIELDS)
+        return rec
+
+    for prefix, field in (
+        ("grin", "grin"),
+        ("all", "all_reactions"),
+        ("truth", "truth"),
+        ("given", "given"),
+    ):
+        table = tables[prefix]
+        for uid, count in table.items():
+            rec = record(uid)
+            rec[_INDEX[field]] = count
+            rec[_INDEX[f"{prefix}_rank"]] = table.rank_of(count)
+            rec[_INDEX[f"{prefix}_percent"]] = table.percent_of(count)
+
+    for r in messages or []:
+        record(r[0])[_INDEX["messages"]] = int(r[1] or 0)
+    for r in grin_messages or []:
+        record(r[0])[_INDEX["grin_messages"]] = int(r[1] or 0)
+    for r in top_truth or []:
+        rec = record(r[0])
+        rec[_INDEX["top_truth_message_id"]] = int(r[1] or 0)
+        rec[_INDEX["top_truth_channel_id"]] = int(r[2] or 0)
+
+    # モノホンの順位はランキングにいないユーザーにも付ける
+    truth = tables["truth"]
+    truth_rank_of_zero = truth.rank_of(0)
+    for rec in users.values():
+        if rec[_INDEX["truth_rank"]] == 0:
+            rec[_INDEX["truth_rank"]] = truth_rank_of_zero
+
+    ids = sorted(users)
+    columns = {"ids": array("q", ids)}
+    for i, name in enumerate(_FIELDS):
+        columns[name] = array("q", (users[uid][i] for uid in ids))
+    return columns, truth_rank_of_zero
+
+
+# (更新時刻, UserStatsTable)
+_MEMO: list = [None, None]
+
+
+def load_user_stats() -> UserStatsTable | None:
+    """
+    キャッシュからユーザー別統計を読み込む(ファイルが更新されていなければ前回の表を返す)
+
+    Returns:
+        UserStatsTable | None: ユーザー別統計、キャッシュがない場合は None
+    """
+    try:
+        mtime = os.path.getmtime(f"cache/{USER_STATS_PATH}")
+    except OSError:
+        return None
+    if _MEMO[0] == mtime:
+        return _MEMO[1]
+
+    loaded = load_binary_cache(USER_STATS_PATH)
+    if loaded is None:
+        return None
+    meta, columns = loaded
+    if any(name not in columns for name in _FIELDS):
+        return None
+    version = meta.get("dblastupdate")
+    if not meta.get("given", True) and time.time() - mtime >= GIVEN_RETRY_INTERVAL:
+        # あげた数が欠けた統計は、しばらくたったら世代違いとして裏で作り直させる
+        version = None
+    table = UserStatsTable(
+        columns["ids"],
+        [columns[name] for name in _FIELDS],
+        version,
+        int(meta.get("truth_rank_of_zero", 1)),
+    )
+    if version is not None:
+        _MEMO[:] = [mtime, table]
+    return table
+
+
+async def build_user_stats(version: str | None) -> UserStatsTable:
+    """
+    ユーザー別統計をまとめて作成し、キャッシュに保存する
+    材料のランキング表は同じ世代のものを使う
+    あげた数(リアクションDB)を取れない場合はその列を 0 にして作る
+
+    Args:
+        version (str | None): dblastupdate
+
+    Returns:
+        UserStatsTable: 作成したユーザー別統計
+    """
+    tables = {
+        "grin": await table_at(grin_spec(), version),
+        "all": await table_at(all_spec(), version),
+        "truth": await table_at(truth_grin_spec(), version),
+    }
+    try:
+        tables["given"] = (await give_tables_at("grin", ["grin"], version)).give
+        given_ok = True
+    except Exception as e:
+        if debug:
+            print(f"ユーザー別統計: あげた数を取得できませんでした: {e}")
+        tables["given"] = RankTable.from_rows([])
+        given_ok = False
+    messages = await run_statdb_query_async(MESSAGE_COUNT_SQL, (), fetch="all")
+    grin_messages = await run_statdb_query_async(
+        GRIN_MESSAGE_COUNT_SQL, (), fetch="all"
+    )
+    top_truth = await run_statdb_query_async(TOP_TRUTH_MESSAGE_SQL, (), fetch="all")
+
+    columns, truth_rank_of_zero = await asyncio.to_thread(
+        _build_columns, tables, messages, grin_messages, top_truth
+    )
+    meta = {
+        "dblastupdate": version,
+        "truth_rank_of_zero": truth_rank_of_zero,
+        "given": given_ok,
+    }
+    if save_binary_cache(USER_STATS_PATH, columns, meta):
+        table = load_user_stats()
+        if table is not None:
+            return table
+    return UserStatsTable(
+        columns["ids"],
+        [columns[name] for name in _FIELDS],
+        version,
+        truth_rank_of_zero,
+    )
+
+
+def user_stats_spec():
+    """ユーザー別統計のキャッシュ (キー, 読み込み関数, 作成関数)"""
+    return "userstats", load_user_stats, build_user_stats
+
+
+async def get_user_stats(uid: int) -> UserStats:
+    """
+    ユーザーの統計を取得する
+
+    Args:
+        uid (int): ユーザーID
+
+    Returns:
+        UserStats: 統計
+    """
+    table = await cache_registry.get(*user_stats_spec())
+    return table.lookup(int(uid))
+
+
+async def get_message_content(message_id: int) -> str:
+    """
+    メッセージ本文を主キーで取得する
+
+    Args:
+        message_id (int): メッセージID
+
+    Returns:
+        str: 本文(見つからない場合は空文字)
+    """
+    row = await run_statdb_query_async(
+        "SELECT content FROM messages WHERE id = %s",
+        (message_id,),
+        fetch="one",
+    )
+    return row[0] if row and row[0] is not None else ""
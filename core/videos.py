@@ -0,0 +1,359 @@
+"""
+動画メッセージ一覧
+動画が添付されたメッセージを AI DB の video_messages に取り込み、メモリにも同じ一覧を持つ
+"""
+
+import asyncio
+import os
+import random
+import time
+from array import array
+from bisect import bisect_left
+
+from config import VIDEO_REGISTRY_REFRESH_INTERVAL, debug
+
+from .db import run_pooled_query
+
+VIDEO_EXTENSIONS = frozenset(
+    (".mp4", ".mov", ".avi", ".webm", ".mkv", ".flv", ".wmv", ".m4v")
+)
+
+CREATE_SQL = (
+    "CREATE TABLE IF NOT EXISTS video_messages ("
+    "  id BIGINT UNSIGNED NOT NULL PRIMARY KEY, "
+    "  channel_id BIGINT UNSIGNED NOT NULL, "
+    "  author_id BIGINT UNSIGNED NOT NULL, "
+    "  timestamp DATETIME NOT NULL, "
+    "  KEY idx_author_timestamp (author_id, timestamp), "
+    "  KEY idx_timestamp (timestamp)"
+    ")"
+)
+
+INSERT_SQL = (
+    "INSERT IGNORE INTO video_messages (id, channel_id, author_id, timestamp) "
+    "VALUES (%s, %s, %s, %s)"
+)
+
+# 指定IDより新しい添付ファイル(1回に読む件数は SCAN_BATCH まで)
+SCAN_SQL = (
+    "SELECT a.message_id, a.filename, m.channel_id, m.author_id, m.timestamp "
+    "FROM attachments a JOIN messages m ON m.id = a.message_id "
+    "WHERE a.message_id > %s ORDER BY a.message_id LIMIT %s"
+)
+SCAN_BATCH = 10000
+
+# 添付ファイルやメッセージの行は遅れて入ることがあるので、
+# 取り込み済みの最大IDから遡ってこの秒数分は毎回読み直す
+RESCAN_SECONDS = 3600
+
+# メッセージIDは上位ビットがミリ秒単位の投稿時刻なので、秒数をIDの差に直せる
+_RESCAN_IDS = (RESCAN_SECONDS * 1000) << 22
+
+# 除外済みIDに当たった場合に選び直す回数
+RANDOM_TRIES = 8
+
+# messages m に対する「動画が添付されている」条件
+VIDEO_FILTER_SQL = "EXISTS (SELECT 1 FROM video_messages v WHERE v.id = m.id)"
+
+# 同じ条件を添付ファイルから直接見るもの(video_messages の取り込みが終わるまで使う)
+ATTACHMENT_FILTER_SQL = (
+    "EXISTS (SELECT 1 FROM attachments a WHERE a.message_id = m.id AND ("
+    "a.filename LIKE '%%.mp4' OR a.filename LIKE '%%.mov' OR "
+    "a.filename LIKE '%%.avi' OR a.filename LIKE '%%.webm' OR "
+    "a.filename LIKE '%%.mkv' OR a.filename LIKE '%%.flv' OR "
+    "a.filename LIKE '%%.wmv' OR a.filename LIKE '%%.m4v'))"
+)
+
+
+def is_video_filename(filename: str | None) -> bool:
+    """ファイル名の拡張子が動画のものか"""
+    if not filename:
+        return False
+    return os.path.splitext(filename)[1].lower() in VIDEO_EXTENSIONS
+
+
+def _epoch(value) -> int:
+    return int(value.timestamp()) if hasattr(value, "timestamp") else 0
+
+
+class VideoRegistry:
+    """
+    video_messages のメモリ上のコピー
+
+    メッセージID昇順の列と、チャンネルID・投稿者ID・投稿時刻(UNIX秒)の列を持つ。
+    更新は取り込み済みの最大メッセージIDから RESCAN_SECONDS 分遡ったところより
+    新しい添付ファイルだけを読み、まだないもののうち動画のものを video_messages に追加する。
+    初回の取り込み(既存の添付ファイル全件)が終わるまでは ready が False で、
+    その間は一覧が途中までしかないので、SQL の条件は添付ファイルを直接見るものを使う。
+    """
+
+    def __init__(self, interval: float = VIDEO_REGISTRY_REFRESH_INTERVAL):
+        self.interval = interval
+
+        self._ids = array("q")
+        self._channels = array("q")
+        self._authors = array("q")
+        self._timestamps = array("q")
+        self._scanned = 0
+        self._loaded = False
+        self._ready = False
+        self._lock: asyncio.Lock | None = None
+        self._task: asyncio.Task | None = None
+
+        self.scanned_rows = 0
+        self.added = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def loaded(self) -> bool:
+        """一覧を読み込み済みか"""
+        return self._loaded
+
+    @property
+    def ready(self) -> bool:
+        """既存の添付ファイルを最後まで取り込み終えたか"""
+        return self._ready
+
+    @property
+    def watermark(self) -> int:
+        """
+        取り込みが確定したメッセージID
+        これより新しいものは遅れて入った行を次の更新で拾う可能性がある
+        """
+        return max(0, self._scanned - _RESCAN_IDS)
+
+    def contains(self, message_id: int) -> bool | None:
+        """
+        動画メッセージか判定する
+
+        Args:
+            message_id (int): メッセージID
+
+        Returns:
+            bool | None: 動画メッセージなら True、そうでなければ False、
+                まだ読み込んでいない場合 None
+        """
+        if not self._loaded:
+            return None
+        message_id = int(message_id)
+        i = bisect_left(self._ids, message_id)
+        return i < len(self._ids) and self._ids[i] == message_id
+
+    def random_id(self, exclude: set[int] | frozenset = frozenset()) -> int | None:
+        """
+        動画メッセージIDを1件ランダムに選ぶ
+
+        Args:
+            exclude (set[int]): 選ばないID
+
+        Returns:
+            int | None: メッセージID、選べるものがない場合は None
+        """
+        ids = self._ids
+        n = len(ids)
+        if n == 0:
+            return None
+        for _ in range(RANDOM_TRIES):
+            message_id = ids[random.randrange(n)]
+            if message_id not in exclude:
+                return message_id
+        # ほとんど除外済みの場合は、ランダムな位置から除外されていないものを探す
+        start = random.randrange(n)
+        for k in range(n):
+            message_id = ids[(start + k) % n]
+            if message_id not in exclude:
+                return message_id
+        return None
+
+    def _append(self, row) -> None:
+        self._ids.append(int(row[0]))
+        self._channels.append(int(row[1] or 0))
+        self._authors.append(int(row[2] or 0))
+        self._timestamps.append(_epoch(row[3]))
+
+    def _insert(self, row) -> bool:
+        message_id = int(row[0])
+        i = bisect_left(self._ids, message_id)
+        if i < len(self._ids) and self._ids[i] == message_id:
+            return False
+        # 遅れて入った行は途中に入るので、昇順を保つ位置に差し込む
+        self._ids.insert(i, message_id)
+        self._channels.insert(i, int(row[1] or 0))
+        self._authors.insert(i, int(row[2] or 0))
+        self._timestamps.insert(i, _epoch(row[3]))
+        return True
+
+    async def _load(self) -> None:
+        await run_pooled_query("ai", CREATE_SQL, (), commit=True)
+        rows = await run_pooled_query(
+            "ai",
+            "SELECT id, channel_id, author_id, timestamp FROM video_messages "
+            "ORDER BY id",
+            (),
+            fetch="all",
+        )
+        for column in (self._ids, self._channels, self._authors, self._timestamps):
+            del column[:]
+        for row in rows or []:
+            self._append(row)
+        self._scanned = self._ids[-1] if self._ids else 0
+        self._loaded = True
+
+    async def _scan(self) -> int:
+        added = 0
+        cursor = self.watermark
+        while True:
+            rows = await run_pooled_query(
+                "ai", SCAN_SQL, (cursor, SCAN_BATCH), fetch="all"
+            )
+            rows = list(rows or [])
+            if not rows:
+                break
+            full = len(rows) >= SCAN_BATCH
+            if full:
+                # 1メッセージの添付が次の読み込みにまたがらないよう、末尾のメッセージは次回に回す
+                last = rows[-1][0]
+                rows = [r for r in rows if r[0] != last] or rows
+
+            videos = []
+            for message_id, filename, channel_id, author_id, timestamp in rows:
+                if videos and videos[-1][0] == message_id:
+                    continue
+                if is_video_filename(filename):
+                    videos.append((message_id, channel_id, author_id, timestamp))
+            # 読み直した範囲の取り込み済みのものは飛ばす
+            videos = [row for row in videos if not self.contains(row[0])]
+            if videos:
+                await run_pooled_query("ai", INSERT_SQL, videos, commit=True, many=True)
+                for row in videos:
+                    if self._insert(row):
+                        added += 1
+
+            self.scanned_rows += len(rows)
+            cursor = int(rows[-1][0])
+            self._scanned = max(self._scanned, cursor)
+            if not full:
+                break
+        self._ready = True
+        return added
+
+    async def refresh(self, force: bool = False) -> None:
+        """
+        新しい添付ファイルを取り込む
+
+        Args:
+            force (bool): Trueの場合は video_messages を全件読み直してから取り込む
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            start = time.perf_counter()
+            if force or not self._loaded:
+                await self._load()
+            added = await self._scan()
+            self.added += added
+            if debug and added:
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"動画一覧更新: +{added}件 計{len(self._ids)}件 {elapsed:.1f}ms")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                if debug:
+                    print(f"動画一覧更新エラー: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """定期更新タスクを開始する(起動済みなら何もしない)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "entries": len(self._ids),
+            "ready": self._ready,
+            "watermark": self._scanned,
+            "scanned_rows": self.scanned_rows,
+            "added": self.added,
+        }
+
+
+video_registry = VideoRegistry()
+
+
+def video_filter_sql() -> str:
+    """
+    messages m に対する「動画が添付されている」条件
+
+    Returns:
+        str: 一覧の取り込みが終わっていれば VIDEO_FILTER_SQL、まだなら ATTACHMENT_FILTER_SQL
+    """
+    return VIDEO_FILTER_SQL if video_registry.ready else ATTACHMENT_FILTER_SQL
+
+
+class VideoShuffle:
+    """
+    1セッション分のランダム再生順
+
+    一覧から選んだIDを覚えておき、すべて出し終えるまで同じ動画を出さない。
+    選ぶのはメモリ上の一覧からなので、DBには問い合わせない。
+    一覧の取り込みが終わるまでは、添付ファイルから直接ランダムに選ぶ。
+    """
+
+    def __init__(self, registry: VideoRegistry = video_registry):
+        self._registry = registry
+        self._seen: set[int] = set()
+
+    async def next_id(self) -> int | None:
+        """
+        次の動画メッセージIDを取得する
+
+        Returns:
+            int | None: メッセージID、動画がない場合は None
+        """
+        if not self._registry.ready:
+            row = await run_pooled_query(
+                "ai",
+                f"SELECT m.id FROM messages m WHERE {ATTACHMENT_FILTER_SQL} "
+                "ORDER BY RAND() LIMIT 1",
+                (),
+                fetch="one",
+            )
+            return int(row[0]) if row else None
+        message_id = self._registry.random_id(self._seen)
+        if message_id is None and self._seen:
+            # 一巡したら最初から
+            self._seen.clear()
+            message_id = self._registry.random_id(self._seen)
+        if message_id is not None:
+            self._seen.add(message_id)
+        return message_id
+
+
+async def is_video_message(message_id: int) -> bool:
+    """
+    動画メッセージか判定する
+    メモリ上の一覧で判定できない場合(未読込/取り込みが確定していない新しいID)はそのメッセージの添付ファイルを見る
+
+    Args:
+        message_id (int): メッセージID
+
+    Returns:
+        bool: 動画メッセージなら True
+    """
+    message_id = int(message_id)
+    found = video_registry.contains(message_id)
+    if found or (found is False and message_id <= video_registry.watermark):
+        return bool(found)
+    rows = await run_pooled_query(
+        "ai",
+        "SELECT filename FROM attachments WHERE message_id = %s",
+        (message_id,),
+        fetch="all",
+    )
+    return any(is_video_filename(r[0]) for r in rows or [])
@@ -2,15 +2,146 @@
 自治(チャンネルブロック)機能
 """
 
+import asyncio
+import time
+
 import discord
 
 from database.connection import run_db_query
-from config import debug
+from config import ZICHI_REFRESH_INTERVAL, debug
+
+from .db import run_db_query_async, run_pooled_query
+
+
+class ZichiIndex:
+    """
+    channel_id -> 自治理由 のメモリ上のインデックス
+
+    有効な自治行の (件数, id合計) をウォーターマークとして定期的に確認し、
+    変化があったときだけ全件を読み直す。
+    """
+
+    def __init__(self, interval: float = ZICHI_REFRESH_INTERVAL):
+        self.interval = interval
+        self._reasons: dict[int, str] = {}
+        self._watermark: tuple | None = None
+        self._loaded = False
+        self._stale = True
+        self._lock: asyncio.Lock | None = None
+        self._task: asyncio.Task | None = None
+        self._invalidate_task: asyncio.Task | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.last_refresh_ms = 0.0
+        self.max_refresh_ms = 0.0
+
+    def lookup(self, channel_id: int) -> tuple[bool, str | None]:
+        """
+        インデックスから自治理由を引く
+
+        Returns:
+            tuple[bool, str | None]: (インデックスで判定できたか, 自治理由)
+        """
+        if not self._loaded or self._stale:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, self._reasons.get(int(channel_id))
+
+    def invalidate(self) -> None:
+        """次回参照時に読み直すよう印を付け、可能なら即座に再読込を予約する"""
+        self._stale = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        # 参照を持っておかないと、実行前にタスクが回収されることがある
+        self._invalidate_task = loop.create_task(self.refresh(force=True))
+
+    async def refresh(self, force: bool = False) -> bool:
+        """
+        ウォーターマークを確認し、変化していれば全件を読み直す
+
+        Args:
+            force (bool): Trueの場合はウォーターマークに関わらず読み直す
+
+        Returns:
+            bool: 読み直した場合 True
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            start = time.perf_counter()
+            mark_row = await run_pooled_query(
+                "main",
+                "SELECT COUNT(*), COALESCE(SUM(id), 0) FROM zichi WHERE valid = 1",
+                (),
+                fetch="one",
+            )
+            watermark = tuple(int(v or 0) for v in mark_row) if mark_row else None
+            if (
+                not force
+                and not self._stale
+                and self._loaded
+                and watermark == self._watermark
+            ):
+                return False
+
+            rows = await run_pooled_query(
+                "main",
+                "SELECT channelid, reason FROM zichi WHERE valid = 1 ORDER BY id",
+                (),
+                fetch="all",
+            )
+            # id昇順なので同一チャンネルは最新の理由で上書きされる
+            self._reasons = {int(r[0]): r[1] for r in rows or [] if r[0] is not None}
+            self._watermark = watermark
+            self._loaded = True
+            self._stale = False
+
+            elapsed = (time.perf_counter() - start) * 1000
+            self.refreshes += 1
+            self.last_refresh_ms = elapsed
+            self.max_refresh_ms = max(self.max_refresh_ms, elapsed)
+            if debug:
+                print(f"zichiインデックス更新: {len(self._reasons)}件 {elapsed:.1f}ms")
+            return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                if debug:
+                    print(f"zichiインデックス更新エラー: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """定期更新タスクを開始する(起動済みなら何もしない)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "entries": len(self._reasons),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "last_refresh_ms": round(self.last_refresh_ms, 1),
+            "max_refresh_ms": round(self.max_refresh_ms, 1),
+        }
+
+
+zichi_index = ZichiIndex()
 
 
 def get_active_zichi(channel_id: int):
     """
     チャンネルの有効な自治設定を取得
+    インデックスが読み込み済みならDBには問い合わせない
 
     Args:
         channel_id (int): チャンネルID
@@ -18,6 +149,10 @@ def get_active_zichi(channel_id: int):
     Returns:
         str | None: 自治理由、自治が無効または存在しない場合はNone
     """
+    found, reason = zichi_index.lookup(channel_id)
+    if found:
+        return reason
+
     try:
         row = run_db_query(
             "SELECT reason FROM zichi WHERE channelid = %s AND valid = 1 ORDER BY id DESC LIMIT 1",
@@ -31,6 +166,30 @@ def get_active_zichi(channel_id: int):
         return None
 
 
+async def get_active_zichi_async(channel_id: int):
+    """
+    get_active_zichi の非同期版
+    インデックス未読込の場合は読み込んでから判定する
+
+    Args:
+        channel_id (int): チャンネルID
+
+    Returns:
+        str | None: 自治理由、自治が無効または存在しない場合はNone
+    """
+    found, reason = zichi_index.lookup(channel_id)
+    if found:
+        return reason
+
+    try:
+        await zichi_index.refresh()
+    except Exception as e:
+        if debug:
+            print(f"zichiインデックス読込エラー: {e}")
+        return await asyncio.to_thread(get_active_zichi, channel_id)
+    return zichi_index.lookup(channel_id)[1]
+
+
 async def enforce_zichi_block(ctx: discord.Interaction, cmdname: str) -> bool:
     """
     自治ブロック判定。ブロック時 True
@@ -50,7 +209,7 @@ async def enforce_zichi_block(ctx: discord.Interaction, cmdname: str) -> bool:
         if not ch:
             return False
 
-        reason = get_active_zichi(getattr(ch, "id", 0))
+        reason = await get_active_zichi_async(getattr(ch, "id", 0))
         if reason:
             text = (
                 f"このチャンネルでは次の理由からSEKAM2は使用できません。\n"
@@ -91,8 +250,34 @@ def insert_zichi_request(channel_id: int, user_id: int, reason: str):
             (channel_id, user_id, reason),
             commit=True,
         )
+        zichi_index.invalidate()
         return True
     except Exception as e:
         if debug:
             print(f"zichi挿入エラー: {e}")
         return False
+
+
+async def set_zichi_valid(zichi_id: int, valid: bool) -> bool:
+    """
+    自治リクエストの承認/取り消し
+
+    Args:
+        zichi_id (int): zichiテーブルのID
+        valid (bool): 有効にする場合 True
+
+    Returns:
+        bool: 成功時 True、失敗時 False
+    """
+    try:
+        await run_db_query_async(
+            "UPDATE zichi SET valid = %s WHERE id = %s",
+            (1 if valid else 0, zichi_id),
+            commit=True,
+        )
+        zichi_index.invalidate()
+        return True
+    except Exception as e:
+        if debug:
+            print(f"zichi更新エラー: {e}")
+        return False
@@ -5,7 +5,7 @@ on_interaction イベントハンドラ
 import discord
 
 from config import debug
-from spam.settings import get_setting_value
+from core.guild_settings import guild_settings
 from core.log import insert_command_log
 
 
@@ -30,7 +30,7 @@ def setup_interaction_events(client: discord.Client):
 
         if custom_id == "logtest":
             try:
-                logchannelid = get_setting_value(inter.guild.id, "logchannel")
+                logchannelid = (await guild_settings.get(inter.guild.id)).logchannel
             except Exception as e:
                 if debug:
                     print(f"設定取得エラー(logtest): {e}")
@@ -2,16 +2,51 @@
 on_member_join イベントハンドラ
 """
 
-import os
+import asyncio
 
 import discord
-import requests
 
-from config import debug
+from config import RAID_CONCURRENCY, debug
+from core.blacklist import blacklist_filter
+from core.db import run_db_query_async
+from core.guild_settings import GuildSettings, guild_settings
 from core.log import insert_log
-from database.connection import run_db_query
+from core.raid import raid_detector
+from core.senka import senka_verifier
 from spam.protection import spamban
-from spam.settings import get_setting_value
+
+
+async def judge_member(member, settings: GuildSettings) -> str:
+    """
+    参加者の扱いを判定する
+
+    Args:
+        member: 参加したメンバー
+        settings (GuildSettings): 参加先サーバーの設定
+
+    Returns:
+        str: "spam" / "blacklist" / "senka"
+    """
+    if await senka_verifier.is_member(member.id) is False:
+        return "spam"
+
+    if settings.blacklist is False:
+        return "senka"
+
+    row = blacklist_filter.contains(member.id)
+    if row is None:
+        try:
+            row = await run_db_query_async(
+                "SELECT 1 FROM blacklist WHERE id = %s LIMIT 1",
+                (member.id,),
+                fetch="one",
+            )
+        except Exception as e:
+            if debug:
+                print(f"ブラックリスト存在確認エラー: {e}")
+            row = None
+
+    return "blacklist" if row else "senka"
 
 
 def setup_member_events(client: discord.Client):
@@ -22,6 +57,71 @@ def setup_member_events(client: discord.Client):
         client: Discord Client インスタンス
     """
 
+    async def process_raid_batch(guild_id: int, members: list) -> None:
+        """
+        レイドモード中に溜まった参加者をまとめて処理する
+        判定とキック/BANは並列(同時実行数は RAID_CONCURRENCY まで)で行い、
+        ログチャンネルには1回分の集計だけを送る
+        """
+        settings = await guild_settings.get(guild_id)
+        semaphore = asyncio.Semaphore(RAID_CONCURRENCY)
+
+        async def judge(member):
+            async with semaphore:
+                return await judge_member(member, settings)
+
+        async def ban(member, status):
+            async with semaphore:
+                await spamban(client, member, status)
+
+        statuses = await asyncio.gather(
+            *(judge(m) for m in members), return_exceptions=True
+        )
+
+        results = {"spam": [], "blacklist": [], "senka": []}
+        for member, status in zip(members, statuses):
+            if isinstance(status, Exception):
+                if debug:
+                    print(f"レイド判定エラー: {status}")
+                status = "senka"
+            results[status].append(member)
+
+        await asyncio.gather(
+            *(
+                ban(m, status)
+                for status in ("spam", "blacklist")
+                for m in results[status]
+            ),
+            return_exceptions=True,
+        )
+        print(
+            f"レイドバッチ: {len(members)}人 "
+            f"spam={len(results['spam'])} blacklist={len(results['blacklist'])}"
+        )
+
+        error = None
+        logchannelid = settings.logchannel
+        if logchannelid not in (0, None):
+            logch = client.get_channel(int(logchannelid))
+            if logch:
+                names = ", ".join(f"{m.display_name}({m.id})" for m in results["senka"])
+                text = (
+                    f"参加が急増しています。直近{len(members)}人をまとめて処理しました。\n"
+                    f"スパム:{len(results['spam'])}人 / "
+                    f"ブラックリスト:{len(results['blacklist'])}人 / "
+                    f"専科:{len(results['senka'])}人"
+                )
+                if names:
+                    text += f"\n専科にいた人: {names}"
+                try:
+                    await logch.send(text[:2000])
+                except Exception:
+                    print("LOGSEND ERROR")
+                    error = "ログチャンネルへの送信に失敗しました。"
+
+        for member in results["senka"]:
+            insert_log(member, result="PASS", error=error)
+
     @client.event
     async def on_member_join(member):
         # Botは除外
@@ -29,61 +129,24 @@ def setup_member_events(client: discord.Client):
             print("bot")
             return
 
-        skip = False
+        if raid_detector.observe(member.guild.id):
+            raid_detector.enqueue(member.guild.id, member, process_raid_batch)
+            return
 
-        url = (
-            f"https://discord.com/api/v10/guilds/518371205452005387/members/{member.id}"
-        )
-        headers = {"Authorization": os.getenv("SENKATOKEN")}
-        response = requests.get(url, headers=headers)
+        settings = await guild_settings.get(member.guild.id)
+        status = await judge_member(member, settings)
 
-        if response.status_code == 404:
-            status = "spam"
+        if status == "spam":
             await spamban(client, member, status)
-            skip = True
             print("spamreturnon")
             return
-        elif response.status_code == 401:
-            print("Unauthorized!!!!!!!")
 
-        print("blackliststart")
-
-        try:
-            configblack = get_setting_value(member.guild.id, "blacklist")
-        except Exception as e:
-            if debug:
-                print(f"設定取得エラー(blacklist): {e}")
-            configblack = True
-
-        if configblack is False or skip is True:
-            pass
-        else:
-            print("blackliststart")
-            try:
-                row = run_db_query(
-                    "SELECT 1 FROM blacklist WHERE id = %s LIMIT 1",
-                    (member.id,),
-                    fetch="one",
-                )
-            except Exception as e:
-                if debug:
-                    print(f"ブラックリスト存在確認エラー: {e}")
-                row = None
-
-            if row:
-                print("blacklist!!!")
-                status = "blacklist"
-                await spamban(client, member, status)
-                return
-
-        status = "senka"
+        if status == "blacklist":
+            print("blacklist!!!")
+            await spamban(client, member, status)
+            return
 
-        try:
-            logchannelid = get_setting_value(member.guild.id, "logchannel")
-        except Exception as e:
-            if debug:
-                print(f"設定取得エラー(join logchannel): {e}")
-            logchannelid = 0
+        logchannelid = settings.logchannel
 
         if logchannelid not in (0, None):
             logch = client.get_channel(int(logchannelid))
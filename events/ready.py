@@ -7,6 +7,11 @@ import discord
 from bot import setup_custom_dns
 from commands.rewind import PersistentRewindButtonView
 from commands.sora_components import PersistentDailyRankingButtonView
+from core.blacklist import blacklist_filter
+from core.prewarm import cache_prewarmer
+from core.tags import tag_index
+from core.videos import video_registry
+from core.zichi import zichi_index
 from fileutil import loadtxt
 
 
@@ -22,6 +27,11 @@ def setup_ready_event(client: discord.Client):
     async def on_ready():
         print("SEKAM2起動したンゴねぇ")
         await setup_custom_dns()
+        zichi_index.start()
+        blacklist_filter.start()
+        cache_prewarmer.start(client)
+        video_registry.start()
+        tag_index.start()
 
         # 永続的なViewを登録
         client.add_view(PersistentDailyRankingButtonView())
@@ -1,20 +1,36 @@
 import asyncio
-from bot import client, tree, setup_custom_dns
-from database.connection import test_db_connection
-from events import setup_all_events
-from commands import setup_all_commands
-import config
 
 
 async def main():
     """
     エントリー関数
     """
+    # 描画ワーカーは起動時に main.py を読み込み直すので、
+    # Bot 本体のモジュールはワーカーに持ち込まないようここで読み込む
+    from bot import client, tree, setup_custom_dns, close_http_session
+    from core.db import close_db_pools, warm_db_pools
+    from core.log import log_sink
+    from database.connection import test_db_connection
+    from events import setup_all_events
+    from commands import setup_all_commands
+    from render.emoji_atlas import emoji_atlas
+    from render.pool import render_pool
+    import config
+
     await setup_custom_dns()
     test_db_connection()
+    await warm_db_pools()
+    render_pool.start()
+    emoji_atlas.start()
     setup_all_events(client)
     await setup_all_commands(tree, client)
-    await client.start(config.TOKEN)
+    try:
+        await client.start(config.TOKEN)
+    finally:
+        await log_sink.drain()
+        close_db_pools()
+        render_pool.shutdown()
+        await close_http_session()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,16 @@
+"""
+画像描画モジュール
+描画プロセスプールと、ワーカーで実行する描画関数
+"""
+
+from .pool import (
+    RenderBusyError,
+    RenderPool,
+    render_pool,
+)
+
+__all__ = [
+    "RenderBusyError",
+    "RenderPool",
+    "render_pool",
+]
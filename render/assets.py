@@ -0,0 +1,198 @@
+"""
+描画用の素材キャッシュ
+フォント・背景画像・透かし画像をワーカープロセス内で1回だけ読み込んで使い回す
+"""
+
+import os
+from collections import OrderedDict
+
+from PIL import Image, ImageFont
+
+from config import RENDER_ASSET_CACHE_BYTES, RENDER_FONT_CACHE_SIZE, debug
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# 起動時に読み込んでおく背景画像
+PRELOAD_IMAGES = (
+    "bg/bg_green.png",
+    "bg/bg_blue.png",
+    "bg/bg_grinrank.png",
+)
+
+# 起動時に読み込んでおく (フォント, サイズ)
+PRELOAD_FONTS = (
+    ("fonts/UDShingo2.otf", (14, 18)),
+    ("fonts/UDShingoL.otf", (18, 20, 24, 28, 36, 48, 60, 72)),
+)
+
+WATERMARK_PATH = "bg/sekam2logo.png"
+
+
+def _resolve(path: str) -> str:
+    if os.path.isabs(path):
+        return path
+    return os.path.join(ROOT_DIR, path)
+
+
+def _image_bytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+class AssetCache:
+    """
+    描画素材のプロセス内キャッシュ
+
+    フォントは (パス, サイズ) ごとに FreeTypeFont を保持する(最大 font_size 個)。
+    背景画像は変換済みの画像を、透かし画像は (幅, 不透明度) ごとに縮小・透過済みの画像を保持し、
+    画像の合計サイズが max_bytes を超えたら古く使われたものから捨てる。
+    返す画像は共有されるので、書き込む場合は呼び出し側で copy() すること。
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = RENDER_ASSET_CACHE_BYTES,
+        font_size: int = RENDER_FONT_CACHE_SIZE,
+    ):
+        self.max_bytes = max_bytes
+        self.font_size = font_size
+        self._fonts: OrderedDict[tuple[str, int], ImageFont.FreeTypeFont] = (
+            OrderedDict()
+        )
+        self._images: OrderedDict[tuple, Image.Image] = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def font(self, path: str, size: int) -> ImageFont.FreeTypeFont:
+        """
+        フォントを取得する
+
+        Args:
+            path (str): フォントファイルのパス(相対パスはリポジトリ直下から)
+            size (int): サイズ
+
+        Returns:
+            ImageFont.FreeTypeFont: フォント
+
+        Raises:
+            OSError: フォントを読み込めない
+        """
+        key = (_resolve(path), size)
+        font = self._fonts.get(key)
+        if font is not None:
+            self._fonts.move_to_end(key)
+            self.hits += 1
+            return font
+        self.misses += 1
+        font = ImageFont.truetype(key[0], size)
+        self._fonts[key] = font
+        while len(self._fonts) > self.font_size:
+            self._fonts.popitem(last=False)
+            self.evictions += 1
+        return font
+
+    def _get(self, key: tuple) -> Image.Image | None:
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+            self.hits += 1
+        return image
+
+    def _put(self, key: tuple, image: Image.Image) -> Image.Image:
+        self.misses += 1
+        size = _image_bytes(image)
+        if size > self.max_bytes:
+            return image
+        self._images[key] = image
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, old = self._images.popitem(last=False)
+            self._bytes -= _image_bytes(old)
+            self.evictions += 1
+        return image
+
+    def image(self, path: str, mode: str | None = "RGBA") -> Image.Image:
+        """
+        画像を取得する(共有画像なので書き込む場合は copy() する)
+
+        Args:
+            path (str): 画像ファイルのパス(相対パスはリポジトリ直下から)
+            mode (str | None): 変換後のモード、None の場合はファイルのまま
+
+        Returns:
+            Image.Image: 読み込み済みの画像
+
+        Raises:
+            OSError: 画像を読み込めない
+        """
+        key = ("image", _resolve(path), mode)
+        image = self._get(key)
+        if image is not None:
+            return image
+        with Image.open(key[1]) as source:
+            image = source.convert(mode) if mode else source.copy()
+        return self._put(key, image)
+
+    def watermark(
+        self, width: int, opacity: float = 0.2, path: str = WATERMARK_PATH
+    ) -> Image.Image | None:
+        """
+        指定した幅に縮小し、不透明度を掛けた透かし画像を取得する
+
+        Args:
+            width (int): 透かし画像の幅
+            opacity (float): 不透明度(0〜1)
+            path (str): 透かし画像のパス
+
+        Returns:
+            Image.Image | None: RGBA の透かし画像、ファイルがない場合は None
+        """
+        if width <= 0:
+            return None
+        key = ("watermark", _resolve(path), width, opacity)
+        image = self._get(key)
+        if image is not None:
+            return image
+        if not os.path.exists(key[1]):
+            return None
+        source = self.image(path)
+        height = max(1, int(source.height * width / source.width))
+        image = source.resize((width, height), Image.LANCZOS)
+        alpha = image.getchannel("A").point(lambda p: int(p * opacity))
+        image.putalpha(alpha)
+        return self._put(key, image)
+
+    def warm(self) -> None:
+        """よく使う背景画像とフォントを読み込んでおく(ないものは飛ばす)"""
+        for path in PRELOAD_IMAGES:
+            try:
+                self.image(path)
+            except Exception as e:
+                if debug:
+                    print(f"素材読み込みエラー: {path}: {e}")
+        for path, sizes in PRELOAD_FONTS:
+            if not os.path.exists(_resolve(path)):
+                continue
+            for size in sizes:
+                try:
+                    self.font(path, size)
+                except Exception as e:
+                    if debug:
+                        print(f"フォント読み込みエラー: {path}: {e}")
+                    break
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "fonts": len(self._fonts),
+            "images": len(self._images),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+asset_cache = AssetCache()
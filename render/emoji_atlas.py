@@ -0,0 +1,289 @@
+"""
+絵文字アトラス
+discord-emojis.pretty.json の Unicode絵文字を1枚の画像に並べたものと、その位置表
+Pilmoji の絵文字の取得先として使い、描画時に絵文字画像を取りに行かないようにする
+
+アトラスの作成(初回と絵文字の追加時のみ、ここだけネットワークを使う):
+    python -m render.emoji_atlas
+アトラスがなければ起動時にもバックグラウンドで作成する(EmojiAtlas.start)
+"""
+
+import asyncio
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from pilmoji.source import BaseSource, Twemoji
+
+from config import CACHE_DIR, EMOJI_JSON_PATH, debug
+
+ATLAS_IMAGE_PATH = os.path.join(CACHE_DIR, "emoji_atlas.png")
+ATLAS_TABLE_PATH = os.path.join(CACHE_DIR, "emoji_atlas.json")
+
+# 1絵文字のマスの大きさ(px)と1行に並べる数
+ATLAS_TILE = 36
+ATLAS_COLUMNS = 64
+
+# 作成時に絵文字画像を同時に取得する数
+BUILD_WORKERS = 16
+
+# アトラスのファイルが作り直されていないか確認する間隔(秒)
+ATLAS_RECHECK_INTERVAL = 60
+
+VS16 = "\ufe0f"
+
+
+def _iter_surrogates(json_path: str):
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        return
+    for items in data.values():
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            # 肌色違いは diversityChildren に入っている
+            for entry in [item, *(item.get("diversityChildren") or [])]:
+                surrogates = (
+                    entry.get("surrogates") if isinstance(entry, dict) else None
+                )
+                if isinstance(surrogates, str) and surrogates:
+                    yield surrogates
+
+
+def build_atlas(
+    json_path: str = EMOJI_JSON_PATH,
+    source: BaseSource | None = None,
+    workers: int = BUILD_WORKERS,
+    image_path: str = ATLAS_IMAGE_PATH,
+    table_path: str = ATLAS_TABLE_PATH,
+) -> int:
+    """
+    絵文字画像を取得してアトラスを作成する
+
+    Args:
+        json_path (str): 絵文字一覧のJSON
+        source (BaseSource | None): 絵文字画像の取得元(既定は Pilmoji と同じ Twemoji)
+        workers (int): 同時に取得する数
+        image_path (str): アトラス画像の保存先
+        table_path (str): 位置表の保存先
+
+    Returns:
+        int: アトラスに入れた絵文字の数
+    """
+    source = source or Twemoji()
+    surrogates = list(dict.fromkeys(_iter_surrogates(json_path)))
+
+    def fetch(emoji: str) -> tuple[str, Image.Image | None]:
+        try:
+            stream = source.get_emoji(emoji)
+            if stream is None:
+                return emoji, None
+            with Image.open(stream) as image:
+                glyph = image.convert("RGBA")
+            glyph.thumbnail((ATLAS_TILE, ATLAS_TILE), Image.Resampling.LANCZOS)
+            return emoji, glyph
+        except Exception as e:
+            if debug:
+                print(f"絵文字取得エラー: {emoji!r}: {e}")
+            return emoji, None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        glyphs = [(e, g) for e, g in executor.map(fetch, surrogates) if g is not None]
+
+    rows = max(1, -(-len(glyphs) // ATLAS_COLUMNS))
+    atlas = Image.new(
+        "RGBA", (ATLAS_COLUMNS * ATLAS_TILE, rows * ATLAS_TILE), (0, 0, 0, 0)
+    )
+    offsets = {}
+    for index, (emoji, glyph) in enumerate(glyphs):
+        x = index % ATLAS_COLUMNS * ATLAS_TILE
+        y = index // ATLAS_COLUMNS * ATLAS_TILE
+        atlas.paste(glyph, (x, y))
+        offsets[emoji] = [x, y, glyph.width, glyph.height]
+
+    os.makedirs(os.path.dirname(table_path) or ".", exist_ok=True)
+    # 読み込み中のワーカーが壊れたファイルを読まないよう、書き終えてから置き換える
+    # (ワーカーは位置表の更新時刻を見るので、位置表を最後に置き換える)
+    atlas.save(image_path + ".tmp", format="PNG", optimize=True)
+    with open(table_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"tile": ATLAS_TILE, "offsets": offsets}, f, ensure_ascii=False)
+    os.replace(image_path + ".tmp", image_path)
+    os.replace(table_path + ".tmp", table_path)
+    return len(offsets)
+
+
+class EmojiAtlas:
+    """
+    絵文字アトラスのメモリ上のコピー
+
+    アトラス画像は読み込んだものを使い続け、絵文字ごとの PNG は初回に切り出したものを使い回す。
+    アトラスにない絵文字が来たときは(ATLAS_RECHECK_INTERVAL 秒に1回まで)位置表の更新時刻を確認し、
+    後から作成・更新されていれば読み直す。
+    """
+
+    def __init__(
+        self, image_path: str = ATLAS_IMAGE_PATH, table_path: str = ATLAS_TABLE_PATH
+    ):
+        self.image_path = image_path
+        self.table_path = table_path
+        self._image: Image.Image | None = None
+        self._offsets: dict[str, list[int]] = {}
+        self._glyphs: dict[str, bytes] = {}
+        self._mtime: float | None = None
+        self._checked: float | None = None
+        self._task: asyncio.Task | None = None
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def loaded(self) -> bool:
+        """アトラスを読み込めたか"""
+        return self._image is not None
+
+    def load(self) -> bool:
+        """
+        アトラスを読み込む
+        前回の確認から ATLAS_RECHECK_INTERVAL 秒経っていれば位置表の更新時刻を確認し、
+        読み込んだときから変わっていれば読み直す
+
+        Returns:
+            bool: アトラスを使える場合 True
+        """
+        now = time.monotonic()
+        first = self._checked is None
+        if not first and now - self._checked < ATLAS_RECHECK_INTERVAL:
+            return self._image is not None
+        self._checked = now
+
+        try:
+            mtime = os.stat(self.table_path).st_mtime
+        except OSError:
+            if debug and first:
+                print("絵文字アトラスがありません(python -m render.emoji_atlas で作成)")
+            return self._image is not None
+        if mtime == self._mtime:
+            return self._image is not None
+
+        try:
+            with open(self.table_path, "r", encoding="utf-8") as f:
+                offsets = json.load(f)["offsets"]
+            with Image.open(self.image_path) as source:
+                image = source.convert("RGBA")
+        except Exception as e:
+            # 読み込めなければ今までのアトラスを使い続ける
+            if debug:
+                print(f"絵文字アトラス読み込みエラー: {e}")
+            return self._image is not None
+        self._offsets = offsets
+        self._image = image
+        self._glyphs.clear()
+        self._mtime = mtime
+        return True
+
+    async def _build(self) -> None:
+        try:
+            count = await asyncio.to_thread(
+                build_atlas, image_path=self.image_path, table_path=self.table_path
+            )
+            if debug:
+                print(f"絵文字アトラスを作成しました: {count}件")
+        except Exception as e:
+            if debug:
+                print(f"絵文字アトラス作成エラー: {e}")
+
+    def start(self) -> None:
+        """
+        アトラスがなければバックグラウンドで作成する(作成済み・作成中なら何もしない)
+        描画ワーカーは作成後の更新確認で読み込む
+        """
+        if os.path.exists(self.table_path) and os.path.exists(self.image_path):
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._build())
+
+    def glyph(self, emoji: str) -> bytes | None:
+        """
+        絵文字1つ分の PNG を取得する
+
+        Args:
+            emoji (str): Unicode絵文字
+
+        Returns:
+            bytes | None: PNG画像、アトラスにない場合は None
+        """
+        cached = self._glyphs.get(emoji)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        # 未読み込みの場合や、アトラスにない場合は作り直されていないか確認する
+        offset = None
+        if self.load():
+            offset = self._offsets.get(emoji) or self._offsets.get(
+                emoji.replace(VS16, "")
+            )
+        if offset is None:
+            self.misses += 1
+            return None
+        x, y, width, height = offset
+        output = io.BytesIO()
+        # 切り出しは1回だけなので、展開の軽い無圧縮で持つ
+        self._image.crop((x, y, x + width, y + height)).save(
+            output, format="PNG", compress_level=0
+        )
+        cached = self._glyphs[emoji] = output.getvalue()
+        self.misses += 1
+        return cached
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "emojis": len(self._offsets),
+            "glyphs": len(self._glyphs),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+emoji_atlas = EmojiAtlas()
+
+
+class AtlasSource(BaseSource):
+    """
+    絵文字アトラスから絵文字を返す Pilmoji の取得元
+
+    アトラスにない絵文字とDiscordのカスタム絵文字は None を返し、
+    Pilmoji はその部分を通常の文字として描画する(ネットワークには出ない)。
+    """
+
+    def __init__(self, atlas: EmojiAtlas = emoji_atlas):
+        self.atlas = atlas
+
+    def get_emoji(self, emoji: str, /) -> io.BytesIO | None:
+        data = self.atlas.glyph(emoji)
+        return io.BytesIO(data) if data is not None else None
+
+    def get_discord_emoji(self, id: int, /) -> io.BytesIO | None:
+        return None
+
+
+def emoji_source() -> BaseSource:
+    """
+    Pilmoji に渡す絵文字の取得元
+    描画時にネットワークへ出ないよう常にアトラスを使う(アトラスがない間、絵文字は通常の文字で描画される)
+
+    Returns:
+        BaseSource: AtlasSource
+    """
+    return AtlasSource(emoji_atlas)
+
+
+if __name__ == "__main__":
+    count = build_atlas()
+    print(f"絵文字アトラスを作成しました: {count}件 -> {ATLAS_IMAGE_PATH}")
@@ -0,0 +1,804 @@
+"""
+グラフ画像の描画
+/myreaction・/mylocate・/test grinrank の画像を作る(描画プロセスプールのワーカーで実行される)
+"""
+
+import io
+import math
+import os
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.font_manager as fm
+import matplotlib.pyplot as plt
+from PIL import Image, ImageDraw, ImageFont
+from pilmoji import Pilmoji
+
+from config import debug
+
+from .assets import asset_cache
+from .emoji_atlas import emoji_atlas, emoji_source
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fonts")
+
+
+def warm() -> None:
+    """描画ワーカーの起動時に、フォントの読み込みと最初の描画を済ませておく"""
+    for name in ("UDShingo2.otf", "UDShingoL.otf"):
+        path = os.path.join(FONT_DIR, name)
+        if os.path.exists(path):
+            fm.fontManager.addfont(path)
+    asset_cache.warm()
+    emoji_atlas.load()
+    fig, ax = plt.subplots(figsize=(1, 1))
+    ax.bar([0], [1])
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+def _figure_to_image(fig) -> Image.Image:
+    """
+    matplotlib の図をファイルを介さずに RGBA の Pillow 画像にする
+    savefig(bbox_inches="tight") と同じく、描画内容の周囲 0.1 インチで切り抜き、図は閉じる
+    """
+    try:
+        canvas = fig.canvas
+        canvas.draw()
+        width, height = canvas.get_width_height()
+        image = Image.frombuffer(
+            "RGBA", (width, height), canvas.buffer_rgba(), "raw", "RGBA", 0, 1
+        )
+        bbox = fig.get_tightbbox(canvas.get_renderer())
+        dpi = fig.dpi
+        pad = 0.1
+        box = (
+            max(0, math.floor((bbox.x0 - pad) * dpi)),
+            max(0, math.floor(height - (bbox.y1 + pad) * dpi)),
+            min(width, math.ceil((bbox.x1 + pad) * dpi)),
+            min(height, math.ceil(height - (bbox.y0 - pad) * dpi)),
+        )
+        # crop は新しい画像を作るので、図を閉じた後もそのまま使える
+        return image.crop(box)
+    finally:
+        plt.close(fig)
+
+
+def _png_bytes(image: Image.Image) -> bytes:
+    """画像を PNG のバイト列にする"""
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def create_channel_graph(
+    data: list,
+    username: str,
+    reference_label: str,
+    status_text: str = "",
+) -> bytes:
+    """チャンネル統計データから縦棒グラフを生成し、背景画像と合成して画像を作成する。
+
+    引数:
+      data: [(channel_name, count), ...] のリスト（上位10個 + その他）
+      username: ユーザー名
+      reference_label: 参照データのラベル
+
+    返り値:
+      PNG画像のバイト列
+    """
+    try:
+        # フォントパスの設定
+        font_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fonts")
+        normal_font_path = os.path.join(font_dir, "UDShingo2.otf")
+        title_font_path = os.path.join(font_dir, "UDShingoL.otf")
+
+        # 入れ物準備
+        channel_labels = [name for name, count in data]
+        counts = [count for name, count in data]
+
+        # matplotlibでグラフを作成
+        fig, ax = plt.subplots(figsize=(13, 5.5), facecolor="#2C2F33", dpi=100)
+        ax.set_facecolor("#2C2F33")  # 背景
+
+        # 縦棒グラフを描画
+        x_positions = range(len(channel_labels))
+        _bars = ax.bar(x_positions, counts, color="#5865F2", width=0.6)
+
+        # X軸のラベル設定（空白にして後でPillowで描画）
+        ax.set_xticks(x_positions)
+        ax.set_xticklabels([""] * len(channel_labels))
+
+        # フォント設定（Y軸ラベルのみ）
+        try:
+            prop_normal = fm.FontProperties(fname=normal_font_path, size=12)
+            ax.set_ylabel("投稿数", fontproperties=prop_normal, color="white")
+            ax.tick_params(axis="y", colors="white")  # Y軸の目盛りを白に
+        except Exception as e:
+            if debug:
+                print(f"フォント設定エラー: {e}")
+            ax.set_ylabel("投稿数", color="white")
+            ax.tick_params(axis="y", colors="white")
+
+        # グリッド追加
+        ax.grid(axis="y", alpha=0.2, color="white")
+
+        # 枠線を削除
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+        ax.spines["bottom"].set_visible(False)
+        ax.spines["left"].set_color("white")
+
+        # X軸の下側にスペースを確保（チャンネル名用、余白を増やす）
+        plt.subplots_adjust(bottom=0.25)
+
+        # レイアウト調整
+        plt.tight_layout()
+
+        # グラフをメモリ上の画像にする
+        graph_img = _figure_to_image(fig)
+
+        # 背景画像と合成
+        bg_path = os.path.join(
+            os.path.dirname(os.path.dirname(__file__)),
+            "bg/bg_green.png",
+        )
+        if os.path.exists(bg_path):
+            # 背景画像を読み込み
+            bg = asset_cache.image(bg_path)
+
+            # グラフサイズと背景サイズを取得
+            graph_width, graph_height = graph_img.size
+            bg_width, bg_height = bg.size  # 1280x720
+
+            # グラフが背景より大きい場合はリサイズ
+            # 左右の余白を最小限にして横幅を最大化: 左右各40pxの余白で1200px
+            max_graph_width = bg_width - 80  # 1280 - 80 = 1200px (左右各40px余白)
+            max_graph_height = int(
+                bg_height * 0.70,
+            )  # 背景の70%まで（下部に文字用余白確保）
+
+            if graph_width > max_graph_width or graph_height > max_graph_height:
+                # アスペクト比を維持してリサイズ
+                ratio = min(
+                    max_graph_width / graph_width,
+                    max_graph_height / graph_height,
+                )
+                new_width = int(graph_width * ratio)
+                new_height = int(graph_height * ratio)
+                graph_img = graph_img.resize(
+                    (new_width, new_height),
+                    Image.Resampling.LANCZOS,
+                )
+                graph_width, graph_height = new_width, new_height
+
+            # グラフの配置位置を計算（中央やや上部）
+            x_offset = (bg_width - graph_width) // 2
+            y_offset = 101  # 上部に配置
+
+            # 新しい画像を作成
+            final_img = bg.copy()
+            final_img.paste(graph_img, (x_offset, y_offset), graph_img)
+
+            # テキスト追加（ユーザー名と参照ラベル）
+            _draw = ImageDraw.Draw(final_img)
+
+            try:
+                # フォント読み込み
+                title_font = asset_cache.font(title_font_path, 36)
+                label_font = asset_cache.font(normal_font_path, 18)
+                channel_label_font = asset_cache.font(normal_font_path, 14)
+            except Exception:
+                # フォールバック
+                title_font = ImageFont.load_default()
+                label_font = ImageFont.load_default()
+                channel_label_font = ImageFont.load_default()
+
+            # Pilmojiを使用してテキストを描画
+            with Pilmoji(final_img, source=emoji_source()) as pilmoji:
+                # タイトルを左揃えで描画
+                title_text = f"{username} の書き込み先チャンネル"
+                title_x = 50  # 左端から50px
+                title_y = 40
+                pilmoji.text(
+                    (title_x, title_y),
+                    title_text,
+                    font=title_font,
+                    fill="white",
+                )
+
+                # 参照ラベルを左下に描画
+                clean_label = reference_label.replace("-# ", "").replace("-#", "")
+                label_x = 50  # 左端から50px
+                label_y = bg_height - 60  # 下から60px
+                pilmoji.text(
+                    (label_x, label_y),
+                    clean_label,
+                    font=label_font,
+                    fill="white",
+                )
+
+                # 状態テキストを表示（参照ラベルの一行上）
+                if status_text:
+                    status_x = 50
+                    status_y = label_y - 30  # 参照ラベルの30px上
+                    pilmoji.text(
+                        (status_x, status_y),
+                        status_text,
+                        font=label_font,
+                        fill="#AAAAAA",
+                    )
+
+                # X軸のラベルを描画（チャンネル名）
+                # グラフの目盛り・余白を除外してバー表示領域のみで計算
+                graph_left_margin = 80  # グラフ左側の目盛り余白（固定）
+                graph_right_margin = 20  # グラフ右側の余白（固定）
+                usable_width = (
+                    graph_width - graph_left_margin - graph_right_margin
+                )  # 実際のバー表示領域
+                bar_width = usable_width / len(channel_labels)  # 各バーの幅
+
+                # グラフの下部にラベルを配置（余白を増やす）
+                label_y_pos = (
+                    y_offset + graph_height + 15
+                )  # グラフの下15px（10px→15px）
+
+                for i, label in enumerate(channel_labels):
+                    # 各ラベルの位置を計算（左から右へ、目盛り余白を考慮）
+                    label_x_pos = (
+                        x_offset
+                        + graph_left_margin
+                        + int(i * bar_width + bar_width / 2)
+                    )
+
+                    # チャンネル名を描画（「その他」以外で長い場合は省略）
+                    display_label = label
+                    if label != "その他" and len(label) > 10:
+                        display_label = label[:8] + "..."
+
+                    # 中央揃えのためのオフセット計算
+                    bbox = pilmoji.getsize(display_label, font=channel_label_font)
+                    text_width = bbox[0] if bbox else len(display_label) * 7
+                    label_x_pos -= text_width // 2
+
+                    pilmoji.text(
+                        (label_x_pos, label_y_pos),
+                        display_label,
+                        font=channel_label_font,
+                        fill="white",
+                    )
+
+            return _png_bytes(final_img)
+        # 背景画像がない場合はグラフのみ
+        if debug:
+            print("背景画像が見つかりません。グラフのみを使用します。")
+        return _png_bytes(graph_img)
+
+    except Exception as e:
+        if debug:
+            print(f"グラフ生成エラー: {e}")
+        raise
+
+
+def create_reaction_graph(
+    data: list,
+    labels: list,
+    username: str,
+    reference_label: str,
+    status_text: str = "",
+) -> bytes:
+    """リアクションデータから縦棒グラフを生成し、背景画像と合成して画像を作成する。
+
+    引数:
+      data: [(emoji_name, count), ...] のリスト（上位10個 + その他）
+      labels: 各項目のX軸ラベル(Unicode絵文字または"その他")
+      username: ユーザー名
+      reference_label: 参照データのラベル
+      status_text: 状態テキスト（例: "1-10件/50件"）
+
+    返り値:
+      PNG画像のバイト列
+    """
+    try:
+        # フォントパスの設定
+        font_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fonts")
+        normal_font_path = os.path.join(font_dir, "UDShingoL.otf")
+
+        # データの準備(絵文字のUnicode変換は呼び出し側で済ませてある)
+        emoji_labels = list(labels)
+        counts = [count for _, count in data]
+
+        # matplotlibでグラフを作成（縦棒グラフ用の設定）
+        fig, ax = plt.subplots(figsize=(10, 5.5), facecolor="#2C2F33", dpi=100)
+        ax.set_facecolor("#2C2F33")  # グラフエリアの背景色
+
+        # 縦棒グラフを描画
+        x_positions = range(len(emoji_labels))
+        _bars = ax.bar(x_positions, counts, color="#5865F2", width=0.6)
+
+        # X軸のラベル設定（空白にして後でPillowで描画）
+        ax.set_xticks(x_positions)
+        ax.set_xticklabels([""] * len(emoji_labels))
+
+        # フォント設定（Y軸ラベルのみ）
+        try:
+            prop_normal = fm.FontProperties(fname=normal_font_path, size=12)
+            ax.set_ylabel("回数", fontproperties=prop_normal, color="white")
+            ax.tick_params(axis="y", colors="white")  # Y軸の目盛りを白に
+        except Exception as e:
+            if debug:
+                print(f"フォント設定エラー: {e}")
+            ax.set_ylabel("回数", color="white")
+            ax.tick_params(axis="y", colors="white")
+
+        # グリッド追加（暗めに）
+        ax.grid(axis="y", alpha=0.2, color="white")
+
+        # 枠線を削除
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+        ax.spines["bottom"].set_visible(False)
+        ax.spines["left"].set_color("white")
+
+        # X軸の下側にスペースを確保（絵文字用）
+        plt.subplots_adjust(bottom=0.15)
+
+        # レイアウト調整
+        plt.tight_layout()
+
+        # グラフをメモリ上の画像にする
+        graph_img = _figure_to_image(fig)
+
+        # 背景画像と合成
+        bg_path = os.path.join(
+            os.path.dirname(os.path.dirname(__file__)),
+            "bg/bg_blue.png",
+        )
+        if os.path.exists(bg_path):
+            # 背景画像を読み込み
+            bg = asset_cache.image(bg_path)
+
+            # グラフサイズと背景サイズを取得
+            graph_width, graph_height = graph_img.size
+            bg_width, bg_height = bg.size  # 1280x720
+
+            # グラフが背景より大きい場合はリサイズ
+            max_graph_width = int(bg_width * 0.75)  # 背景の75%まで
+            max_graph_height = int(
+                bg_height * 0.75,
+            )  # 背景の75%まで（70%→75%に拡大、さらに36px削る）
+
+            if graph_width > max_graph_width or graph_height > max_graph_height:
+                # アスペクト比を維持してリサイズ
+                ratio = min(
+                    max_graph_width / graph_width,
+                    max_graph_height / graph_height,
+                )
+                new_width = int(graph_width * ratio)
+                new_height = int(graph_height * ratio)
+                graph_img = graph_img.resize(
+                    (new_width, new_height),
+                    Image.Resampling.LANCZOS,
+                )
+                graph_width, graph_height = new_width, new_height
+
+            # グラフの配置位置を計算（中央やや上部）
+            x_offset = (bg_width - graph_width) // 2
+            y_offset = 101  # 上部に配置（161 - 60 = 101に調整）
+
+            # 新しい画像を作成
+            final_img = bg.copy()
+            final_img.paste(graph_img, (x_offset, y_offset), graph_img)
+
+            # テキスト追加（ユーザー名と参照ラベル）
+            _draw = ImageDraw.Draw(final_img)
+
+            try:
+                # フォント読み込み
+                title_font = asset_cache.font(normal_font_path, 36)
+                label_font = asset_cache.font(normal_font_path, 20)
+                emoji_label_font = asset_cache.font(normal_font_path, 28)
+            except Exception:
+                # フォールバック
+                title_font = ImageFont.load_default()
+                label_font = ImageFont.load_default()
+                emoji_label_font = ImageFont.load_default()
+
+            # Pilmojiを使用してテキストを描画
+            with Pilmoji(final_img, source=emoji_source()) as pilmoji:
+                # タイトルを左揃えで描画（枠線なし）
+                title_text = f"{username} のもらったリアクション分布"
+                title_x = 50  # 左端から50px
+                title_y = 40
+                pilmoji.text(
+                    (title_x, title_y),
+                    title_text,
+                    font=title_font,
+                    fill="white",
+                )
+
+                # 参照ラベルを左下に描画（-#を削除、枠線なし）
+                # reference_labelから"-# "を削除
+                clean_label = reference_label.replace("-# ", "").replace("-#", "")
+                label_x = 50  # 左端から50px
+                label_y = bg_height - 60  # 下から60px
+                pilmoji.text(
+                    (label_x, label_y),
+                    clean_label,
+                    font=label_font,
+                    fill="white",
+                )
+
+                # 状態テキストを表示（参照ラベルの一行上）
+                if status_text:
+                    status_x = 50
+                    status_y = label_y - 30  # 参照ラベルの30px上
+                    status_font = asset_cache.font(normal_font_path, 18)
+                    pilmoji.text(
+                        (status_x, status_y),
+                        status_text,
+                        font=status_font,
+                        fill="#AAAAAA",
+                    )
+
+                # X軸のラベルを描画（絵文字または"その他"）縦棒グラフ用
+                # グラフの各列の位置を計算してラベルを配置
+                # グラフの左右のマージンを考慮
+                left_margin = graph_width * 0.08  # 左側8%を除外
+                right_margin = graph_width * 0.02  # 右側2%を除外
+                usable_width = graph_width - left_margin - right_margin  # 使用可能な幅
+                bar_width = usable_width / len(emoji_labels)  # 各バーの幅
+
+                # グラフの下部にラベルを配置
+                label_y_pos = y_offset + graph_height + 10  # グラフの下10px
+
+                for i, label in enumerate(emoji_labels):
+                    # 各ラベルの位置を計算（左から右へ）
+                    label_x_pos = x_offset + int(
+                        left_margin + i * bar_width + bar_width / 2 - 16,
+                    )
+
+                    # "その他"の場合は通常フォント、それ以外は絵文字として扱う
+                    if label == "その他":
+                        # 通常フォントで描画
+                        pilmoji.text(
+                            (label_x_pos, label_y_pos),
+                            label,
+                            font=label_font,
+                            fill="white",
+                        )
+                    else:
+                        # 絵文字を描画（絵文字アトラスからカラー絵文字として描画）
+                        try:
+                            pilmoji.text(
+                                (label_x_pos, label_y_pos),
+                                label,
+                                font=emoji_label_font,
+                                fill="white",
+                                emoji_scale_factor=1.2,
+                            )
+                        except Exception as e:
+                            if debug:
+                                print(f"Pilmoji絵文字描画エラー ({label}): {e}")
+                            # フォールバック: 英名を表示
+                            original_name = data[i][0]
+                            pilmoji.text(
+                                (label_x_pos, label_y_pos),
+                                original_name,
+                                font=label_font,
+                                fill="white",
+                            )
+
+            return _png_bytes(final_img)
+        # 背景画像がない場合はグラフのみ
+        if debug:
+            print("背景画像が見つかりません。グラフのみを使用します。")
+        return _png_bytes(graph_img)
+
+    except Exception as e:
+        if debug:
+            print(f"グラフ生成エラー: {e}")
+        raise
+
+
+def create_grinrank_image(data: dict, username: str, reference_label: str) -> bytes:
+    """grinrankの画像を生成
+
+    Args:
+        data: get_grinrank_data()で取得したデータ
+        username: ユーザー名
+        reference_label: 参照データラベル
+
+    Returns:
+        bytes: PNG画像のバイト列
+
+    """
+    try:
+        import time
+
+        func_start = time.time()
+
+        # フォントパスの設定
+        font_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fonts")
+        normal_font_path = os.path.join(font_dir, "UDShingoL.otf")
+        light_font_path = os.path.join(font_dir, "UDShingoL.otf")
+
+        # グラフを生成
+        graph_start = time.time()
+        graph_img = create_daily_graph(
+            data["daily_data"]["dates"],
+            data["daily_data"]["grin_counts"],
+            data["daily_data"]["batting_avgs"],
+        )
+        graph_end = time.time()
+        print(f"[Timer] - グラフ生成: {graph_end - graph_start:.3f}秒")
+
+        # 背景画像を読み込み
+        bg_load_start = time.time()
+        bg_path = os.path.join(
+            os.path.dirname(os.path.dirname(__file__)),
+            "bg",
+            "bg_grinrank.png",
+        )
+        bg = asset_cache.image(bg_path).copy()
+        bg_width, bg_height = bg.size
+        print(f"[Timer] - 背景画像読込: {time.time() - bg_load_start:.3f}秒")
+
+        # グラフを背景に貼り付け（右上に配置）
+        paste_start = time.time()
+        graph_width, graph_height = graph_img.size
+        graph_x = bg_width - graph_width - 50  # 右端から50pxの余白
+        graph_y = 150  # 上から150pxの位置（より上に配置）
+        bg.paste(graph_img, (graph_x, graph_y), graph_img)
+        print(f"[Timer] - グラフ貼付: {time.time() - paste_start:.3f}秒")
+
+        # テキストを描画
+        _draw = ImageDraw.Draw(bg)
+
+        font_load_start = time.time()
+        try:
+            # フォント読み込み
+            font_title = asset_cache.font(normal_font_path, 36)  # 30 → 36 に拡大
+            font_72 = asset_cache.font(normal_font_path, 72)
+            font_60 = asset_cache.font(normal_font_path, 60)
+            font_48 = asset_cache.font(normal_font_path, 48)
+            font_24 = asset_cache.font(light_font_path, 24)  # 参照データ用に追加
+        except Exception:
+            # フォールバック
+            font_title = ImageFont.load_default()
+            font_72 = ImageFont.load_default()
+            font_60 = ImageFont.load_default()
+            font_48 = ImageFont.load_default()
+            font_24 = ImageFont.load_default()
+        print(f"[Timer] - フォント読込: {time.time() - font_load_start:.3f}秒")
+
+        # Pilmojiを使用してテキストを描画
+        text_start = time.time()
+        with Pilmoji(bg, source=emoji_source()) as pilmoji:
+            # タイトル（上部中央）- サイズを36ptに拡大
+            title_text = f"{username}の:grin:ランキング"
+            pilmoji.text((50, 40), title_text, font=font_title, fill="white")
+
+            # コラム1（左上）- 順位・個数・パーセントのみ（ラベルは背景に含まれている）
+            # 25px左に移動（130 → 105）
+            col1_x = 80 + 50 - 25  # 105
+            col1_y_start = 120 + 15  # 135
+
+            # 順位（ラベルなし）
+            rank_text = f"{data['rank']}位"
+            pilmoji.text(
+                (col1_x, col1_y_start + 50),
+                rank_text,
+                font=font_72,
+                fill="white",
+            )
+
+            # 個数
+            count_text = f"{data['grincount']}個"
+            pilmoji.text(
+                (col1_x, col1_y_start + 140),
+                count_text,
+                font=font_60,
+                fill="white",
+            )
+
+            # パーセントのみ（"上位"は背景に含まれている）
+            # 左上を0として(180, 450)の位置に配置
+            percent_text = f"{data['percent']}%"
+            pilmoji.text((180, 450), percent_text, font=font_60, fill="white")
+
+            # コラム3（左下）- 期間別ランキング（ラベルなし、順位と個数のみ）
+            # 90px右に、12px下に移動
+            col3_x = 80 + 90  # 170
+            col3_y_start = bg_height - 220 + 12  # bg_height - 208
+
+            period_data = data["period_ranks"]
+            daily_text = (
+                f"{period_data['daily']['rank']}位/{period_data['daily']['count']}個"
+            )
+            weekly_text = (
+                f"{period_data['weekly']['rank']}位/{period_data['weekly']['count']}個"
+            )
+            monthly_text = f"{period_data['monthly']['rank']}位/{period_data['monthly']['count']}個"
+
+            pilmoji.text((col3_x, col3_y_start), daily_text, font=font_48, fill="white")
+            pilmoji.text(
+                (col3_x, col3_y_start + 60),
+                weekly_text,
+                font=font_48,
+                fill="white",
+            )
+            pilmoji.text(
+                (col3_x, col3_y_start + 120),
+                monthly_text,
+                font=font_48,
+                fill="white",
+            )
+
+            # コラム4（右中央）- パーセントのみ（"打率"は背景に含まれている）
+            # 30px左に移動（520 → 550）
+            # 右下を0とした時、文字の右上が(550, 140)の位置に
+            col4_x = bg_width - 550  # 730
+            col4_y = bg_height - 140
+
+            batting_text = f"{data['batting_avg']:.1f}%"
+            pilmoji.text(
+                (col4_x, col4_y),
+                batting_text,
+                font=font_72,
+                fill="white",
+                align="right",
+            )
+
+            # コラム5（右下）- 日付のみ（他は背景に含まれている）
+            # サイズを24ptに縮小し、右端に寄せる
+            col5_y_start = bg_height - 140
+
+            # 参照データから日付部分のみを抽出
+            clean_label = reference_label.replace("-# ", "").replace("-#", "")
+            # "参照データ:"を削除
+            if "参照データ:" in clean_label:
+                date_only = clean_label.replace("参照データ:", "")
+            else:
+                date_only = clean_label
+
+            # テキストの幅を計算して右端に配置
+            bbox = pilmoji.getsize(date_only, font=font_24)
+            text_width = bbox[0] if bbox else len(date_only) * 12
+            col5_x = bg_width - text_width - 30  # 右端から30pxの余白
+
+            pilmoji.text(
+                (col5_x, col5_y_start + 70),
+                date_only,
+                font=font_24,
+                fill="white",
+            )
+
+        print(f"[Timer] - テキスト描画: {time.time() - text_start:.3f}秒")
+
+        # 最終画像をPNGにする
+        save_start = time.time()
+        image_bytes = _png_bytes(bg)
+        print(f"[Timer] - 画像保存: {time.time() - save_start:.3f}秒")
+
+        total_image_time = time.time() - func_start
+        print(f"[Timer] - 画像生成関数合計: {total_image_time:.3f}秒")
+
+        return image_bytes
+
+    except Exception as e:
+        if debug:
+            print(f"create_grinrank_imageエラー: {e}")
+            import traceback
+
+            traceback.print_exc()
+        raise
+
+
+def create_daily_graph(
+    dates: list, grin_counts: list, batting_avgs: list
+) -> Image.Image:
+    """過去7日間のグラフを生成
+
+    Args:
+        dates: 日付リスト
+        grin_counts: grin数リスト
+        batting_avgs: 打率リスト
+
+    Returns:
+        Image.Image: グラフ画像(RGBA)
+
+    """
+    try:
+        # フォントパスの設定
+        font_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fonts")
+        font_path = os.path.join(font_dir, "UDShingoL.otf")
+
+        # 日付ラベル作成
+        date_labels = [f"{d.month}/{d.day}" for d in dates]
+
+        # グラフ作成
+        fig, ax1 = plt.subplots(figsize=(8, 4), facecolor="#2C2F33", dpi=100)
+        ax1.set_facecolor("#2C2F33")
+
+        # 棒グラフ（grin数）
+        x_positions = range(len(date_labels))
+        _bars = ax1.bar(
+            x_positions,
+            grin_counts,
+            color="#5865F2",
+            width=0.6,
+            label="Grin数",
+        )
+        ax1.set_xlabel("日付", color="white")
+        ax1.set_ylabel("Grin数", color="#5865F2")
+        ax1.tick_params(axis="y", labelcolor="#5865F2", colors="white")
+        ax1.tick_params(axis="x", colors="white")
+
+        # X軸ラベル設定
+        ax1.set_xticks(x_positions)
+        ax1.set_xticklabels(date_labels)
+
+        # 第2Y軸（打率）
+        ax2 = ax1.twinx()
+        _line = ax2.plot(
+            x_positions,
+            batting_avgs,
+            color="#ED4245",
+            marker="o",
+            linewidth=2,
+            label="打率",
+        )
+        ax2.set_ylabel("打率 (%)", color="#ED4245")
+        ax2.tick_params(axis="y", labelcolor="#ED4245", colors="white")
+        ax2.set_ylim(0, 100)
+
+        # フォント設定
+        try:
+            prop = fm.FontProperties(fname=font_path, size=10)
+            ax1.set_xlabel("日付", fontproperties=prop, color="white")
+            ax1.set_ylabel("Grin数", fontproperties=prop, color="#5865F2")
+            ax2.set_ylabel("打率 (%)", fontproperties=prop, color="#ED4245")
+            for label in ax1.get_xticklabels():
+                label.set_fontproperties(prop)
+        except Exception:
+            pass
+
+        # グリッド
+        ax1.grid(axis="y", alpha=0.2, color="white")
+
+        # 枠線設定
+        ax1.spines["top"].set_visible(False)
+        ax1.spines["bottom"].set_color("white")
+        ax1.spines["left"].set_color("#5865F2")
+        ax1.spines["right"].set_visible(False)
+        ax2.spines["top"].set_visible(False)
+        ax2.spines["bottom"].set_visible(False)
+        ax2.spines["left"].set_visible(False)
+        ax2.spines["right"].set_color("#ED4245")
+
+        # タイトル
+        try:
+            title_prop = fm.FontProperties(fname=font_path, size=12)
+            plt.title(
+                "過去7日間のGrinの数と打率の推移のグラフ",
+                fontproperties=title_prop,
+                color="white",
+                pad=10,
+            )
+        except Exception:
+            plt.title("過去7日間のGrinの数と打率の推移のグラフ", color="white", pad=10)
+
+        # レイアウト調整
+        plt.tight_layout()
+
+        # メモリ上の画像にする
+        return _figure_to_image(fig)
+
+    except Exception as e:
+        if debug:
+            print(f"create_daily_graphエラー: {e}")
+            import traceback
+
+            traceback.print_exc()
+        raise
@@ -0,0 +1,190 @@
+"""
+画像生成プロセスプール
+matplotlib/Pillow の描画をイベントループの外(別プロセス)で行う
+"""
+
+import asyncio
+import importlib
+import multiprocessing
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import RENDER_QUEUE_MAX, RENDER_TIMEOUT, RENDER_WORKERS, debug
+
+# ワーカー起動時に読み込んでおく描画モジュール(matplotlib などもここで読み込まれる、warm() があれば呼ぶ)
+RENDER_MODULES = ("render.graphs", "render.wordcloud")
+
+
+class RenderBusyError(Exception):
+    """描画待ちが上限に達している"""
+
+
+def _init_worker() -> None:
+    # 初期化で例外を出すとプール全体が使えなくなるので、失敗は記録だけして続ける
+    for name in RENDER_MODULES:
+        try:
+            module = importlib.import_module(name)
+            warm = getattr(module, "warm", None)
+            if warm is not None:
+                warm()
+        except Exception as e:
+            if debug:
+                print(f"描画ワーカー初期化エラー: {name}: {e}")
+
+
+def _ping() -> int:
+    return 0
+
+
+def _mp_context():
+    # 親のスレッド(DBプールなど)を引き継がないよう、fork ではなく新しいプロセスから起動する。
+    # forkserver が使える環境では描画モジュールを読み込み済みのサーバーから fork するので、
+    # ワーカーの起動(タイムアウト後の作り直しを含む)で matplotlib などを読み込み直さない
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(list(RENDER_MODULES))
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class RenderPool:
+    """
+    描画用のプロセスプール
+
+    描画関数はモジュールの最上位に定義し、引数は pickle できる素のデータだけを渡す
+    (戻り値は PNG のバイト列)。
+    ワーカーは起動時に matplotlib・フォント・描画モジュールを読み込んでおく。
+    待ちを含めて max_queue 件を超える依頼は RenderBusyError で断り、
+    timeout 秒を超えた描画はプールごと作り直して打ち切る。
+    作り直しの巻き添えで失敗した他の依頼は、新しいプールで1回だけやり直す。
+    """
+
+    def __init__(
+        self,
+        workers: int = RENDER_WORKERS,
+        max_queue: int = RENDER_QUEUE_MAX,
+        timeout: float = RENDER_TIMEOUT,
+    ):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending = 0
+
+        self.jobs = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.total_seconds = 0.0
+
+    @property
+    def pending(self) -> int:
+        """実行中・待ち中の描画の数"""
+        return self._pending
+
+    def _ensure(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=_mp_context(),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    def start(self) -> None:
+        """ワーカーを起動し、初期化を先に済ませておく(起動済みなら何もしない)"""
+        if self._executor is not None:
+            return
+        executor = self._ensure()
+        for _ in range(self.workers):
+            executor.submit(_ping)
+
+    def _restart(self, executor: ProcessPoolExecutor) -> None:
+        # 別の依頼がすでに作り直していたら、新しいプールには触らない
+        if executor is not self._executor:
+            return
+        self._executor = None
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        # 待ち中の依頼はキャンセルせず、BrokenProcessPool で終わらせてやり直させる
+        executor.shutdown(wait=False)
+        for process in processes:
+            try:
+                process.terminate()
+            except Exception:
+                pass
+        self.restarts += 1
+        self.start()
+
+    async def render(self, func: Callable[..., bytes], **spec) -> bytes:
+        """
+        描画関数をワーカーで実行する
+
+        Args:
+            func (Callable[..., bytes]): 描画関数(モジュール最上位の関数)
+            **spec: 描画関数に渡す引数
+
+        Returns:
+            bytes: PNG画像
+
+        Raises:
+            RenderBusyError: 描画待ちが上限に達している
+            TimeoutError: 制限時間内に描画が終わらなかった
+        """
+        if self._pending >= self.max_queue:
+            self.rejected += 1
+            raise RenderBusyError("画像生成が混み合っています")
+
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            for attempt in range(2):
+                # 依頼ごとに投げた先のプールを覚えておき、作り直しはそのプールに対してだけ行う
+                executor = self._ensure()
+                try:
+                    future = executor.submit(func, **spec)
+                    return await asyncio.wait_for(
+                        asyncio.wrap_future(future), self.timeout
+                    )
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    if debug:
+                        print(f"描画タイムアウト: {func.__name__}")
+                    # 実行中のワーカーは止められないので、プールごと作り直す
+                    if not future.cancel():
+                        self._restart(executor)
+                    raise
+                except BrokenProcessPool:
+                    # ワーカーが落ちたか、他の依頼のタイムアウトで作り直された古いプールの巻き添え
+                    # (作り直しはまだ同じプールを使っている場合だけ)、新しいプールで1回だけやり直す
+                    self._restart(executor)
+                    if attempt:
+                        raise
+        finally:
+            self._pending -= 1
+            self.jobs += 1
+            self.total_seconds += time.perf_counter() - start
+
+    def shutdown(self) -> None:
+        """ワーカーを終了する"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "jobs": self.jobs,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "avg_ms": round(self.total_seconds / self.jobs * 1000, 1)
+            if self.jobs
+            else 0.0,
+        }
+
+
+render_pool = RenderPool()
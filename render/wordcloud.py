@@ -0,0 +1,378 @@
+"""
+ワードクラウド画像の描画
+/wordcloud 系の画像を作る(描画プロセスプールのワーカーで実行される)
+"""
+
+import io
+import os
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .assets import asset_cache
+
+try:
+    from wordcloud import WordCloud
+
+    WORDCLOUD_LIBRARY_AVAILABLE = True
+except ImportError:
+    WORDCLOUD_LIBRARY_AVAILABLE = False
+WORDCLOUD_FONT_PATH = "./fonts/NotoSansCJKjp-Regular.otf"
+WORDCLOUD_FALLBACK_FONT_PATH = "./fonts/NotoSansCJKjp-Regular.otf"
+WORDCLOUD_FONT_SIZES = {
+    "huge": 60,
+    "xlarge": 50,
+    "large": 40,
+    "medium": 32,
+    "small": 24,
+    "xsmall": 18,
+    "tiny": 15,
+}
+
+
+def _apply_sekam_watermark(
+    image: Image.Image,
+    watermark_path: str = "bg/sekam2logo.png",
+    opacity: float = 0.2,
+    margin: int = 10,
+) -> Image.Image:
+    try:
+        wm = asset_cache.watermark(int(image.width * 0.18), opacity, watermark_path)
+        if wm is None:
+            return image
+        base_was_rgba = image.mode == "RGBA"
+        base = image.convert("RGBA")
+        pos = (
+            base.width - wm.width - margin,
+            base.height - wm.height - margin,
+        )
+        base.paste(wm, pos, wm)
+        if base_was_rgba:
+            return base
+        return base.convert("RGB")
+    except Exception:
+        return image
+
+
+def warm() -> None:
+    """描画ワーカーの起動時に、ワードクラウド用のフォントと透かし画像を読み込んでおく"""
+    if os.path.exists(WORDCLOUD_FONT_PATH):
+        for size in WORDCLOUD_FONT_SIZES.values():
+            asset_cache.font(WORDCLOUD_FONT_PATH, size)
+    # 既定の画像幅(1000px)の透かし
+    asset_cache.watermark(int(1000 * 0.18))
+
+
+def render_pillow_wordcloud(
+    word_data: list[tuple[str, int]],
+    width: int = 1000,
+    height: int = 700,
+) -> bytes:
+    if not word_data:
+        img = Image.new("RGB", (width, height), color="white")
+        draw = ImageDraw.Draw(img)
+        draw.text((width // 2 - 100, height // 2), "データがありません", fill="gray")
+        output = io.BytesIO()
+        img.save(output, format="PNG")
+        output.seek(0)
+        return output.read()
+    img = Image.new("RGB", (width, height), color="white")
+    draw = ImageDraw.Draw(img)
+    try:
+        font_sizes = {
+            key: asset_cache.font(WORDCLOUD_FONT_PATH, size)
+            for key, size in WORDCLOUD_FONT_SIZES.items()
+        }
+    except Exception:
+        try:
+            font_sizes = {
+                key: asset_cache.font(WORDCLOUD_FALLBACK_FONT_PATH, size)
+                for key, size in WORDCLOUD_FONT_SIZES.items()
+            }
+        except Exception:
+            default_font = ImageFont.load_default()
+            font_sizes = dict.fromkeys(WORDCLOUD_FONT_SIZES, default_font)
+    colors = [
+        "#ff4d6d",
+        "#ff7b00",
+        "#ffb703",
+        "#ffd166",
+        "#06d6a0",
+        "#118ab2",
+        "#073b4c",
+        "#8338ec",
+        "#ff6b6b",
+        "#3a86ff",
+    ]
+    max_count = float(word_data[0][1]) if word_data else 1.0
+    min_count = float(word_data[-1][1]) if word_data else 1.0
+    count_range = max_count - min_count if max_count > min_count else 1.0
+
+    def get_font_size(count: int, index: int) -> tuple[str, any]:
+        """出現回数とインデックスからフォントサイズを決定"""
+        normalized = (
+            (float(count) - min_count) / count_range if count_range > 0 else 0.5
+        )
+        if index < 5:
+            size_key = "huge" if normalized > 0.7 else "xlarge"
+        elif index < 12:
+            size_key = "xlarge" if normalized > 0.6 else "large"
+        elif index < 25:
+            size_key = "large" if normalized > 0.5 else "medium"
+        elif index < 45:
+            size_key = "medium" if normalized > 0.4 else "small"
+        elif index < 70:
+            size_key = "small" if normalized > 0.3 else "xsmall"
+        else:
+            size_key = "xsmall" if normalized > 0.2 else "tiny"
+        return size_key, font_sizes[size_key]
+
+    GRID_COLS = 12
+    GRID_ROWS = 8
+    cell_width = (width - 60) // GRID_COLS
+    cell_height = (height - 60) // GRID_ROWS
+    occupied_cells = set()
+    placed_rects = []
+
+    def check_cell_available(
+        col: int,
+        row: int,
+        cols_needed: int = 1,
+        rows_needed: int = 1,
+    ) -> bool:
+        """指定されたセル範囲が利用可能かチェック"""
+        for c in range(col, min(col + cols_needed, GRID_COLS)):
+            for r in range(row, min(row + rows_needed, GRID_ROWS)):
+                if (c, r) in occupied_cells:
+                    return False
+        return True
+
+    def mark_cells_occupied(
+        col: int,
+        row: int,
+        cols_needed: int = 1,
+        rows_needed: int = 1,
+    ):
+        """指定されたセル範囲を使用済みにマーク"""
+        for c in range(col, min(col + cols_needed, GRID_COLS)):
+            for r in range(row, min(row + rows_needed, GRID_ROWS)):
+                occupied_cells.add((c, r))
+
+    def check_rect_overlap(x: int, y: int, w: int, h: int, margin: int = 5) -> bool:
+        """既存の配置と重なるかチェック（微調整用）"""
+        new_rect = (x - margin, y - margin, x + w + margin, y + h + margin)
+        for rect in placed_rects:
+            if not (
+                new_rect[2] < rect[0]
+                or new_rect[0] > rect[2]
+                or new_rect[3] < rect[1]
+                or new_rect[1] > rect[3]
+            ):
+                return True
+        return False
+
+    def find_grid_position(
+        text: str,
+        font: any,
+        size_key: str,
+    ) -> tuple[int, int] | None:
+        """グリッドベースで配置位置を探す（高速版）"""
+        bbox = draw.textbbox((0, 0), text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        cols_needed = max(1, (text_width + cell_width - 1) // cell_width)
+        rows_needed = max(1, (text_height + cell_height - 1) // cell_height)
+        if size_key in ["huge", "xlarge"]:
+            search_order = [
+                (col, row)
+                for row in range(GRID_ROWS // 2 - 2, GRID_ROWS // 2 + 3)
+                for col in range(GRID_COLS // 2 - 3, GRID_COLS // 2 + 4)
+                if 0 <= row < GRID_ROWS and 0 <= col < GRID_COLS
+            ]
+        else:
+            search_order = [
+                (col, row) for row in range(GRID_ROWS) for col in range(GRID_COLS)
+            ]
+            random.shuffle(search_order)
+        for col, row in search_order:
+            if check_cell_available(col, row, cols_needed, rows_needed):
+                offset_x = random.randint(-15, 15)
+                offset_y = random.randint(-15, 15)
+                x = 30 + col * cell_width + offset_x
+                y = 30 + row * cell_height + offset_y
+                x = max(30, min(x, width - text_width - 30))
+                y = max(30, min(y, height - text_height - 30))
+                if not check_rect_overlap(x, y, text_width, text_height):
+                    mark_cells_occupied(col, row, cols_needed, rows_needed)
+                    return x, y
+        return None
+
+    placed_count = 0
+    max_words = min(100, len(word_data))
+    for idx in range(max_words):
+        word, count = word_data[idx]
+        size_key, font = get_font_size(count, idx)
+        color = colors[idx % len(colors)]
+        position = find_grid_position(word, font, size_key)
+        if position:
+            x, y = position
+            draw.text((x, y), word, fill=color, font=font)
+            bbox = draw.textbbox((x, y), word, font=font)
+            placed_rects.append((bbox[0], bbox[1], bbox[2], bbox[3]))
+            placed_count += 1
+        if placed_count >= 80:
+            break
+    img = _apply_sekam_watermark(img)
+    output = io.BytesIO()
+    img.save(output, format="PNG")
+    output.seek(0)
+    return output.read()
+
+
+def render_wordcloud(
+    word_data: list[tuple[str, int]],
+    width: int = 1000,
+    height: int = 700,
+    max_words: int = 200,
+) -> bytes:
+    """ワードクラウド画像を生成（wordcloudライブラリ使用）
+    「ぎっちり」スタイル：
+    wordcloudライブラリを使用して高密度で単語を配置。
+    カラフルな色合いと日本語フォントに対応。
+    Args:
+        word_data: [(単語, 出現回数), ...] のリスト
+        width: 画像幅
+        height: 画像高さ
+        max_words: 最大単語数（デフォルト200、もっとぎっちりで増加）
+    Returns:
+        PNG画像のバイト列
+    """
+    if not WORDCLOUD_LIBRARY_AVAILABLE:
+        raise ImportError("wordcloudライブラリがインストールされていません")
+    if not word_data:
+        img = Image.new("RGB", (width, height), color="white")
+        draw = ImageDraw.Draw(img)
+        draw.text((width // 2 - 100, height // 2), "データがありません", fill="gray")
+        output = io.BytesIO()
+        img.save(output, format="PNG")
+        output.seek(0)
+        return output.read()
+    word_freq = {word: float(count) for word, count in word_data}
+    font_path = None
+    if os.path.exists(WORDCLOUD_FONT_PATH):
+        font_path = WORDCLOUD_FONT_PATH
+    elif os.path.exists(WORDCLOUD_FALLBACK_FONT_PATH):
+        font_path = WORDCLOUD_FALLBACK_FONT_PATH
+
+    def custom_color_func(
+        word,
+        font_size,
+        position,
+        orientation,
+        random_state=None,
+        **kwargs,
+    ):
+        """カラフルな色を生成"""
+        if random_state is None:
+            random_state = random.Random()
+        hue = random_state.randint(0, 360)
+        saturation = random_state.randint(70, 90)
+        lightness = random_state.randint(35, 55)
+        return f"hsl({hue}, {saturation}%, {lightness}%)"
+
+    wc = WordCloud(
+        width=width,
+        height=height,
+        background_color="white",
+        max_words=max_words,
+        font_path=font_path,
+        min_font_size=10,
+        max_font_size=100,
+        relative_scaling=0.5,
+        color_func=custom_color_func,
+        margin=10,
+        prefer_horizontal=0.7,
+        random_state=42,
+    )
+    wc.generate_from_frequencies(word_freq)
+    img = wc.to_image()
+    img = _apply_sekam_watermark(img)
+    output = io.BytesIO()
+    img.save(output, format="PNG")
+    output.seek(0)
+    return output.read()
+
+
+def render_wordcloud_masked(
+    word_data: list[tuple[str, int]],
+    mask_path: str,
+    cover_path: str,
+    width: int = 1000,
+    height: int = 700,
+) -> bytes:
+    """マスク画像を使用したワードクラウド生成（破壊モード専用）
+    Args:
+        word_data: [(単語, 出現回数), ...] のリスト
+        mask_path: マスク画像のパス（黒い部分に単語を配置）
+        cover_path: カバー画像のパス（最後に合成）
+        width: 画像幅
+        height: 画像高さ
+    Returns:
+        PNG画像のバイト列
+    """
+    if not WORDCLOUD_LIBRARY_AVAILABLE:
+        raise ImportError("wordcloudライブラリがインストールされていません")
+    import numpy as np
+
+    mask_array = np.array(asset_cache.image(mask_path, mode=None))
+    cover_image = asset_cache.image(cover_path)
+    word_freq = {word: float(count) for word, count in word_data}
+    font_path = None
+    if os.path.exists(WORDCLOUD_FONT_PATH):
+        font_path = WORDCLOUD_FONT_PATH
+    elif os.path.exists(WORDCLOUD_FALLBACK_FONT_PATH):
+        font_path = WORDCLOUD_FALLBACK_FONT_PATH
+
+    def destroy_color_func(
+        word,
+        font_size,
+        position,
+        orientation,
+        random_state=None,
+        **kwargs,
+    ):
+        """赤・オレンジ系の破壊的な色を生成"""
+        if random_state is None:
+            random_state = random.Random()
+        hue = random_state.randint(0, 60)
+        saturation = random_state.randint(80, 100)
+        lightness = random_state.randint(40, 60)
+        return f"hsl({hue}, {saturation}%, {lightness}%)"
+
+    wc = WordCloud(
+        width=mask_array.shape[1],
+        height=mask_array.shape[0],
+        background_color=None,
+        mode="RGBA",
+        mask=mask_array,
+        max_words=1600,
+        font_path=font_path,
+        min_font_size=8,
+        max_font_size=80,
+        relative_scaling=0.5,
+        color_func=destroy_color_func,
+        margin=2,
+        prefer_horizontal=0.6,
+        random_state=42,
+        contour_width=0,
+        contour_color="red",
+    )
+    wc.generate_from_frequencies(word_freq)
+    wordcloud_img = wc.to_image().convert("RGBA")
+    cover_resized = cover_image.resize(wordcloud_img.size, Image.LANCZOS)
+    final_image = Image.alpha_composite(wordcloud_img, cover_resized)
+    final_image = _apply_sekam_watermark(final_image)
+    output = io.BytesIO()
+    final_image.save(output, format="PNG")
+    output.seek(0)
+    return output.read()
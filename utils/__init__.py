@@ -6,7 +6,15 @@
 from .cache import (
     load_json_cache,
     save_json_cache,
+    load_binary_cache,
+    save_binary_cache,
+    get_data_version,
+    shard_path,
+    list_shards,
+    CacheRegistry,
+    cache_registry,
     get_reference_data_label,
+    get_reference_data_label_async,
 )
 
 from .emoji import (
@@ -19,7 +27,15 @@ from .emoji import (
 __all__ = [
     "load_json_cache",
     "save_json_cache",
+    "load_binary_cache",
+    "save_binary_cache",
+    "get_data_version",
+    "shard_path",
+    "list_shards",
+    "CacheRegistry",
+    "cache_registry",
     "get_reference_data_label",
+    "get_reference_data_label_async",
     "strip_tone_modifiers",
     "normalize_emoji_name",
     "normalize_emoji_and_variants",
@@ -1,13 +1,27 @@
 """
 キャッシュ管理
-JSONキャッシュファイルの読み書きと管理
+JSON/バイナリキャッシュファイルの読み書きと管理
 """
 
+import asyncio
 import json
+import mmap
 import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Awaitable, Callable
 from datetime import date, datetime
+from urllib.parse import quote, unquote
 
-from config import CACHE_DIR, REFERENCE_DATA_DEFAULT_LABEL, debug
+from config import (
+    CACHE_DIR,
+    DATA_VERSION_CHECK_INTERVAL,
+    REFERENCE_DATA_DEFAULT_LABEL,
+    debug,
+)
 from database.connection import run_db_query
 
 
@@ -19,6 +33,42 @@ def _ensure_cache_dir() -> None:
         pass
 
 
+def shard_path(directory: str, key: str, suffix: str = ".bin") -> str:
+    """
+    キーごとに分けたキャッシュファイルのパス
+    キー(絵文字名など)はファイル名に使える形にエスケープする
+
+    Args:
+        directory (str): cache/ 以下のディレクトリ名
+        key (str): キー
+        suffix (str): 拡張子
+
+    Returns:
+        str: cache/ からの相対パス
+    """
+    return f"{directory}/{quote(key, safe='')}{suffix}"
+
+
+def list_shards(directory: str, suffix: str = ".bin") -> list[str]:
+    """
+    shard_path で保存したキャッシュのキーの一覧
+
+    Args:
+        directory (str): cache/ 以下のディレクトリ名
+        suffix (str): 拡張子
+
+    Returns:
+        list[str]: キーの一覧
+    """
+    try:
+        names = os.listdir(f"cache/{directory}")
+    except OSError:
+        return []
+    return sorted(
+        unquote(name[: -len(suffix)]) for name in names if name.endswith(suffix)
+    )
+
+
 def load_json_cache(path: str, default):
     """
     JSONキャッシュの読み込み
@@ -50,31 +100,309 @@ def save_json_cache(path: str, data) -> bool:
     Returns:
         bool: 成功時True、失敗時False
     """
+    path = f"cache/{path}"
+    tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
     try:
-        path = f"cache/{path}"
         _ensure_cache_dir()
-        with open(path, "w", encoding="utf-8") as f:
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False)
+        # 書き終えてから置き換えるので、読み込み側が途中のファイルを見ることはない
+        os.replace(tmp_path, path)
         return True
     except Exception as e:
         if debug:
             print(f"cache保存失敗: {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
         return False
 
 
-def get_reference_data_label() -> str:
+# バイナリキャッシュ: マジック(4) + ヘッダー長(4) + ヘッダーJSON + 8バイト境界に揃えた int64 列
+_BINARY_MAGIC = b"SKB1"
+_BINARY_PREFIX = struct.Struct("<4sI")
+
+
+def save_binary_cache(
+    path: str, columns: dict[str, array], meta: dict | None = None
+) -> bool:
     """
-    config.dblastupdateの値を参照ラベルとして取得する
+    同じ長さの int64 配列(array("q"))をまとめてバイナリキャッシュに保存する
+    一時ファイルに書き込んでから置き換えるので、読み込み中のプロセスが壊れたファイルを見ることはない
+
+    Args:
+        path (str): ファイルパス
+        columns (dict[str, array]): 列名 -> array("q")
+        meta (dict | None): ヘッダーに保存する追加情報(dblastupdateなど)
 
     Returns:
-        str: 参照データのラベル（例: "-# 参照データ:2025/10/1まで"）
+        bool: 成功時True、失敗時False
     """
+    lengths = {len(col) for col in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"列の長さが揃っていません: {path}")
+    rows = lengths.pop() if lengths else 0
+
+    header = json.dumps(
+        {
+            "rows": rows,
+            "columns": list(columns),
+            "byteorder": sys.byteorder,
+            "meta": meta or {},
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    header += b" " * (-(_BINARY_PREFIX.size + len(header)) % 8)
+
+    path = f"cache/{path}"
+    tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+    try:
+        _ensure_cache_dir()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(_BINARY_PREFIX.pack(_BINARY_MAGIC, len(header)))
+            f.write(header)
+            for col in columns.values():
+                if col.typecode != "q":
+                    col = array("q", col)
+                col.tofile(f)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        if debug:
+            print(f"cache保存失敗: {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def load_binary_cache(path: str) -> tuple[dict, dict[str, memoryview]] | None:
+    """
+    バイナリキャッシュをメモリマップで読み込む
+    各列は int64 の memoryview として返すのでPythonのリストは作られない
+    (numpy.frombuffer にもそのまま渡せる)
+
+    Args:
+        path (str): ファイルパス
+
+    Returns:
+        tuple[dict, dict[str, memoryview]] | None: (meta, 列名 -> memoryview)、
+            読み込めない場合は None
+    """
+    try:
+        with open(f"cache/{path}", "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _BINARY_PREFIX.size:
+                return None
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception:
+        return None
+
+    try:
+        magic, header_len = _BINARY_PREFIX.unpack_from(mapped, 0)
+        if magic != _BINARY_MAGIC:
+            return None
+        offset = _BINARY_PREFIX.size
+        header = json.loads(bytes(mapped[offset : offset + header_len]))
+        if header.get("byteorder") != sys.byteorder:
+            return None
+        offset += header_len
+
+        rows = int(header["rows"])
+        view = memoryview(mapped)
+        columns = {}
+        for name in header["columns"]:
+            columns[name] = view[offset : offset + rows * 8].cast("q")
+            offset += rows * 8
+        return header.get("meta", {}), columns
+    except Exception as e:
+        if debug:
+            print(f"cache読込失敗: {path}: {e}")
+        return None
+
+
+def _read_dblastupdate():
     row = run_db_query(
         "SELECT dblastupdate FROM `config` WHERE id = %s LIMIT 1",
         (1,),
         fetch="one",
     )
-    target = row[0] if row else None
+    return row[0] if row else None
+
+
+def get_data_version() -> str | None:
+    """
+    config.dblastupdate の値を文字列で取得する
+
+    Returns:
+        str | None: dblastupdate、取得できない場合は None
+    """
+    try:
+        target = _read_dblastupdate()
+    except Exception as e:
+        if debug:
+            print(f"dblastupdate取得エラー: {e}")
+        return None
+    return str(target) if target is not None else None
+
+
+class CacheRegistry:
+    """
+    データ世代つきキャッシュの管理
+
+    キャッシュには作成時の dblastupdate を記録しておき、get() のたびに現在の値と比べる。
+    世代が古い場合は古いキャッシュをそのまま返しつつ、裏で作り直しを1回だけ走らせる。
+    キャッシュ自体がない場合だけ呼び出し元で作成を待つ。
+    作成はキーごとに1つしか走らせず、同時に来た同じ世代の呼び出しは同じ作成結果を待つ。
+    古い世代の作成中に新しい世代が求められた場合は、その完了後に新しい世代で作り直す。
+    """
+
+    def __init__(self, check_interval: float = DATA_VERSION_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._version: str | None = None
+        self._checked_at = 0.0
+        # キー -> (作成中の世代, 作成タスク)
+        self._inflight: dict[str, tuple[str | None, asyncio.Task]] = {}
+
+        self.hits = 0
+        self.stale = 0
+        self.builds = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    async def data_version(self, force: bool = False) -> str | None:
+        """
+        現在の dblastupdate を取得する(check_interval 秒はメモリの値を使う)
+
+        Args:
+            force (bool): True の場合は必ずDBから読み直す
+
+        Returns:
+            str | None: dblastupdate、取得できない場合は前回の値
+        """
+        now = time.monotonic()
+        if force or now - self._checked_at >= self.check_interval:
+            version = await asyncio.to_thread(get_data_version)
+            self._checked_at = now
+            if version is not None:
+                self._version = version
+        return self._version
+
+    async def get(
+        self,
+        key: str,
+        load: Callable[[], object | None],
+        build: Callable[[str | None], Awaitable[object]],
+    ):
+        """
+        キャッシュを取得する
+
+        Args:
+            key (str): キャッシュの名前(同じキーの作成は1回にまとめる)
+            load: キャッシュを読み込む関数。ない場合は None を返す。
+                戻り値の version 属性を作成時の dblastupdate とみなす
+            build: dblastupdate を受け取ってキャッシュを作成・保存するコルーチン関数
+
+        Returns:
+            キャッシュの値
+        """
+        version = await self.data_version()
+        value = load()
+        if value is None:
+            # 呼び出し元がキャンセルされても他の待ち手のために作成は続ける
+            return await asyncio.shield(self._build_once(key, build, version))
+
+        if version is not None and getattr(value, "version", None) != version:
+            self.stale += 1
+            self._build_once(key, build, version)
+        else:
+            self.hits += 1
+        return value
+
+    async def ensure(self, key: str, load, build, version: str | None) -> bool:
+        """
+        キャッシュが指定の世代になっていなければ作り直して完了を待つ
+
+        Args:
+            key (str): キャッシュの名前
+            load: キャッシュを読み込む関数
+            build: キャッシュを作成・保存するコルーチン関数
+            version (str | None): 用意したい dblastupdate
+
+        Returns:
+            bool: 作り直した場合 True
+        """
+        value = load()
+        if value is not None and getattr(value, "version", None) == version:
+            return False
+        await asyncio.shield(self._build_once(key, build, version))
+        return True
+
+    def _build_once(self, key: str, build, version: str | None) -> asyncio.Task:
+        previous = None
+        inflight = self._inflight.get(key)
+        if inflight is not None and not inflight[1].done():
+            # 同じ世代か、求められた世代の方が古い(作成中のものの方が新しい)場合は相乗りする
+            if inflight[0] == version or version != self._version:
+                self.coalesced += 1
+                return inflight[1]
+            # 古い世代の作成結果を新しい世代の待ち手に返さないよう、別に作り直す
+            # (同じファイルへの書き込みが前後しないよう、前の作成の完了を待ってから)
+            previous = inflight[1]
+        task = asyncio.get_running_loop().create_task(
+            self._build(key, build, version, previous)
+        )
+        task.add_done_callback(self._build_done)
+        self._inflight[key] = (version, task)
+        return task
+
+    async def _build(
+        self, key: str, build, version: str | None, previous: asyncio.Task | None
+    ):
+        try:
+            if previous is not None:
+                await asyncio.wait({previous})
+            value = await build(version)
+            self.builds += 1
+            if debug:
+                print(f"キャッシュ作成: {key} ({version})")
+            return value
+        except Exception as e:
+            self.failures += 1
+            if debug:
+                print(f"キャッシュ作成エラー: {key}: {e}")
+            raise
+        finally:
+            inflight = self._inflight.get(key)
+            if inflight is not None and inflight[1] is asyncio.current_task():
+                del self._inflight[key]
+
+    @staticmethod
+    def _build_done(task: asyncio.Task) -> None:
+        # 裏での作り直しは誰も結果を待たないので、例外をここで回収する
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """カウンタの値を返す"""
+        return {
+            "version": self._version,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "stale": self.stale,
+            "builds": self.builds,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+        }
+
+
+cache_registry = CacheRegistry()
+
+
+def _format_reference_label(target) -> str:
     if target is None:
         return REFERENCE_DATA_DEFAULT_LABEL
 
@@ -91,3 +419,31 @@ def get_reference_data_label() -> str:
         if debug:
             print(f"参照日付取得エラー: {e}")
         return REFERENCE_DATA_DEFAULT_LABEL
+
+
+def get_reference_data_label() -> str:
+    """
+    config.dblastupdateの値を参照ラベルとして取得する
+
+    Returns:
+        str: 参照データのラベル（例: "-# 参照データ:2025/10/1まで"）、
+            取得できない場合は REFERENCE_DATA_DEFAULT_LABEL
+    """
+    try:
+        target = _read_dblastupdate()
+    except Exception as e:
+        if debug:
+            print(f"参照日付取得エラー: {e}")
+        return REFERENCE_DATA_DEFAULT_LABEL
+    return _format_reference_label(target)
+
+
+async def get_reference_data_label_async() -> str:
+    """
+    get_reference_data_label の非同期版
+    cache_registry が持っている dblastupdate を使うので、毎回はDBに問い合わせない
+
+    Returns:
+        str: 参照データのラベル（例: "-# 参照データ:2025/10/1まで"）
+    """
+    return _format_reference_label(await cache_registry.data_version())
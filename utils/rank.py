@@ -0,0 +1,249 @@
+"""
+ランキング表
+[[author_id, count], ...] 形式の集計結果から順位と割合を O(log n) で求める
+ランキングは int64 配列のバイナリキャッシュとして保存する(絵文字ごとの表は1絵文字1ファイル)
+"""
+
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import NamedTuple
+
+from config import RANK_TABLE_CACHE_BYTES
+
+from .cache import load_binary_cache, save_binary_cache
+
+
+class RankEntry(NamedTuple):
+    """1ユーザー分の順位情報"""
+
+    count: int
+    rank: int
+    percent: int
+    total: int
+
+
+class RankTable:
+    """
+    ランキング表
+
+    ユーザーID昇順の配列と同じ並びの件数配列、件数の昇順配列の3列を持つ。
+    各列は array("q") またはバイナリキャッシュの memoryview で、どちらも bisect で引ける。
+    順位は同率飛び番(自分より多い人数 + 1)、
+    割合は自分より少ない人数 / 全体 の切り捨てパーセント。
+    """
+
+    __slots__ = ("_counts", "_ids", "_sorted", "version")
+
+    def __init__(self, ids, counts, sorted_counts, version: str | None = None):
+        self._ids = ids
+        self._counts = counts
+        self._sorted = sorted_counts
+        self.version = version
+
+    @classmethod
+    def from_rows(cls, rows, version: str | None = None) -> "RankTable":
+        """
+        集計結果の行から作成する
+
+        Args:
+            rows: [[author_id, count], ...] または DB の行タプル
+            version (str | None): 集計元データの dblastupdate
+
+        Returns:
+            RankTable: 作成したランキング表
+        """
+        counts = {}
+        for r in rows or []:
+            try:
+                uid = int(r[0]) if r[0] is not None else 0
+                cnt = int(r[1]) if r[1] is not None else 0
+            except Exception:
+                continue
+            counts[uid] = cnt
+        ids = sorted(counts)
+        return cls(
+            array("q", ids),
+            array("q", (counts[uid] for uid in ids)),
+            array("q", sorted(counts.values())),
+            version,
+        )
+
+    @classmethod
+    def from_columns(cls, columns: dict, version: str | None = None) -> "RankTable":
+        """バイナリキャッシュの列から作成する"""
+        return cls(columns["ids"], columns["counts"], columns["sorted"], version)
+
+    def to_columns(self) -> dict:
+        """バイナリキャッシュ用の列"""
+        return {"ids": self._ids, "counts": self._counts, "sorted": self._sorted}
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    @property
+    def nbytes(self) -> int:
+        """列の合計バイト数"""
+        return sum(memoryview(col).nbytes for col in self.to_columns().values())
+
+    def _index(self, uid: int) -> int | None:
+        i = bisect_left(self._ids, uid)
+        if i < len(self._ids) and self._ids[i] == uid:
+            return i
+        return None
+
+    def __contains__(self, uid: int) -> bool:
+        return self._index(uid) is not None
+
+    def count(self, uid: int) -> int | None:
+        """ユーザーの件数(いなければ None)"""
+        i = self._index(uid)
+        return None if i is None else self._counts[i]
+
+    def rank_of(self, count: int) -> int:
+        """件数に対する順位"""
+        return len(self._sorted) - bisect_right(self._sorted, count) + 1
+
+    def percent_of(self, count: int) -> int:
+        """件数が上回っているユーザーの割合(%)"""
+        if not len(self._sorted):
+            return 0
+        return int(bisect_left(self._sorted, count) * 100 / len(self._sorted))
+
+    def lookup(self, uid: int) -> RankEntry | None:
+        """
+        ユーザーの順位情報を取得する
+
+        Args:
+            uid (int): ユーザーID
+
+        Returns:
+            RankEntry | None: 順位情報、ランキングにいない場合は None
+        """
+        count = self.count(uid)
+        if count is None:
+            return None
+        return RankEntry(
+            count, self.rank_of(count), self.percent_of(count), len(self._sorted)
+        )
+
+    def items(self):
+        """(author_id, count) をユーザーID順に返す"""
+        return zip(self._ids, self._counts)
+
+    def to_rows(self) -> list[list[int]]:
+        """件数の降順の [[author_id, count], ...] に変換する"""
+        return sorted(
+            ([uid, cnt] for uid, cnt in self.items()),
+            key=lambda x: -x[1],
+        )
+
+
+# ファイル名 -> (更新時刻, 表)
+# 絵文字ごとの表が増えても RANK_TABLE_CACHE_BYTES を超えないよう、古く使われたものから捨てる
+# (RankTable のほか、nbytes を持つ絵文字ごとの表も同じ上限で持つ)
+_TABLES: OrderedDict[str, tuple[float, object]] = OrderedDict()
+_TABLES_BYTES = 0
+_TABLES_LOCK = threading.Lock()
+
+
+def _mtime(path: str) -> float | None:
+    try:
+        return os.path.getmtime(f"cache/{path}")
+    except OSError:
+        return None
+
+
+def remember_table(path: str, mtime: float | None, table) -> None:
+    """
+    キャッシュファイルから読み込んだ表をメモリに置く
+
+    Args:
+        path (str): キャッシュファイル名
+        mtime (float | None): ファイルの更新時刻
+        table: nbytes 属性を持つ表
+    """
+    global _TABLES_BYTES
+    with _TABLES_LOCK:
+        old = _TABLES.pop(path, None)
+        if old is not None:
+            _TABLES_BYTES -= old[1].nbytes
+        _TABLES[path] = (mtime, table)
+        _TABLES_BYTES += table.nbytes
+        while _TABLES_BYTES > RANK_TABLE_CACHE_BYTES and len(_TABLES) > 1:
+            _, (_, evicted) = _TABLES.popitem(last=False)
+            _TABLES_BYTES -= evicted.nbytes
+
+
+def recall_table(path: str, mtime: float):
+    """
+    メモリ上の表を取得する
+
+    Args:
+        path (str): キャッシュファイル名
+        mtime (float): ファイルの現在の更新時刻
+
+    Returns:
+        remember_table した表、ないかファイルが更新されている場合は None
+    """
+    with _TABLES_LOCK:
+        memo = _TABLES.get(path)
+        if memo is None or memo[0] != mtime:
+            return None
+        _TABLES.move_to_end(path)
+        return memo[1]
+
+
+def load_rank_table(path: str) -> RankTable | None:
+    """
+    キャッシュ(メモリマップしたバイナリ)からランキング表を取得する
+    ファイルが更新されていなければメモリ上の表をそのまま返す
+
+    Args:
+        path (str): キャッシュファイル名
+
+    Returns:
+        RankTable | None: ランキング表(0件の場合も含む)、キャッシュがないか読めない場合は None
+    """
+    mtime = _mtime(path)
+    if mtime is None:
+        return None
+
+    table = recall_table(path, mtime)
+    if table is not None:
+        return table
+
+    loaded = load_binary_cache(path)
+    if loaded is None:
+        return None
+    meta, columns = loaded
+    # 0件の表も集計済みの結果なので、ないものとして扱わずそのまま使う
+    table = RankTable.from_columns(columns, meta.get("dblastupdate"))
+    remember_table(path, mtime, table)
+    return table
+
+
+def save_rank_table(path: str, rows, version: str | None = None) -> RankTable:
+    """
+    集計結果からランキング表を作成し、キャッシュにも保存する
+    保存は一時ファイルからの置き換えなので、読み込み中の表には影響しない
+
+    Args:
+        path (str): キャッシュファイル名
+        rows: [[author_id, count], ...] または DB の行タプル
+        version (str | None): 集計元データの dblastupdate
+
+    Returns:
+        RankTable: 作成したランキング表
+    """
+    table = RankTable.from_rows(rows, version)
+    if save_binary_cache(path, table.to_columns(), {"dblastupdate": version}):
+        remember_table(path, _mtime(path), table)
+    return table
+
+
+def rank_table_stats() -> dict:
+    """メモリ上の表の数と合計サイズ"""
+    return {"tables": len(_TABLES), "bytes": _TABLES_BYTES}